@@ -3,6 +3,33 @@ const axios = require('axios');
 // FIX 1: Use 127.0.0.1 instead of localhost to prevent IPv6 connection errors
 const ML_SERVICE_URL = process.env.ML_SERVICE_URL || 'http://127.0.0.1:5001';
 
+/**
+ * Hospital whose model may score this request, taken from the authenticated
+ * token (hospital accounts only). A caller-supplied X-Hospital-Id header is
+ * ignored, so no one can score against another hospital's model.
+ */
+const principalHospitalId = (user) =>
+  user && user.role === 'hospital' && user.id ? String(user.id) : null;
+
+/**
+ * Forward the caller's hospital so the ML service can use that hospital's model,
+ * and our timeout so it drops work we have already given up on
+ */
+const mlHeaders = (req, timeoutMs) => {
+  const headers = { 'X-Request-Timeout-Ms': String(timeoutMs) };
+  const hospitalId = principalHospitalId(req.user);
+  if (hospitalId) {
+    headers['X-Hospital-Id'] = hospitalId;
+  }
+  return headers;
+};
+
+/**
+ * ML service shed the request (503) or its deadline passed (504)
+ */
+const isMLOverloaded = (error) =>
+  error.response && (error.response.status === 503 || error.response.status === 504);
+
 /**
  * Analyze patient report using ML model
  */
@@ -20,6 +47,7 @@ const analyzeReport = async (req, res) => {
 
     // Call ML service
     const response = await axios.post(`${ML_SERVICE_URL}/predict`, reportData, {
+      headers: mlHeaders(req, 30000),
       timeout: 30000 // 30 seconds timeout
     });
 
@@ -55,6 +83,14 @@ const analyzeReport = async (req, res) => {
       });
     }
 
+    if (isMLOverloaded(error)) {
+      return res.status(503).json({
+        success: false,
+        message: 'ML Service is busy. Please try again shortly.',
+        error: 'Service overloaded'
+      });
+    }
+
     res.status(500).json({
       success: false,
       message: 'Error analyzing patient report',
@@ -80,7 +116,7 @@ const analyzeBatchReports = async (req, res) => {
     const response = await axios.post(
       `${ML_SERVICE_URL}/predict/batch`,
       { reports },
-      { timeout: 60000 }
+      { headers: mlHeaders(req, 60000), timeout: 60000 }
     );
 
     res.json({
@@ -91,6 +127,9 @@ const analyzeBatchReports = async (req, res) => {
 
   } catch (error) {
     console.error('Batch Analysis Error:', error.message);
+    if (isMLOverloaded(error)) {
+      return res.status(503).json({ success: false, message: 'ML Service is busy. Please try again shortly.' });
+    }
     res.status(500).json({ success: false, message: error.message });
   }
 };
@@ -0,0 +1,149 @@
+"""
+Request Deadlines and Admission Control
+Callers send their deadline with each prediction request; work whose
+caller has given up is dropped before preprocessing and before inference.
+Requests beyond the in-flight limit, or arriving while latency is over
+target, are shed up front.
+"""
+
+import contextvars
+import math
+import threading
+import time
+
+# Absolute deadline as Unix time in seconds, or a relative budget in milliseconds
+DEADLINE_HEADER = 'X-Request-Deadline'
+TIMEOUT_HEADER = 'X-Request-Timeout-Ms'
+
+# Weight of the newest request in the latency moving average
+LATENCY_EWMA_ALPHA = 0.2
+
+_deadline = contextvars.ContextVar('request_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The caller's deadline passed before a stage of the request started"""
+
+    def __init__(self, stage):
+        super().__init__(f"Request deadline exceeded before {stage}")
+        self.stage = stage
+
+
+def parse_deadline(headers, now=None):
+    """
+    Deadline from request headers as a time.time() value, or None
+    Raises:
+        ValueError for a malformed, non-finite or non-positive header
+    """
+    now = time.time() if now is None else now
+    deadline = headers.get(DEADLINE_HEADER)
+    if deadline:
+        try:
+            deadline = float(deadline)
+        except ValueError:
+            deadline = math.nan
+        # float() accepts 'nan' and 'inf', which would never expire
+        if not math.isfinite(deadline) or deadline <= 0:
+            raise ValueError(f"{DEADLINE_HEADER} must be Unix time in seconds")
+        return deadline
+    timeout = headers.get(TIMEOUT_HEADER)
+    if timeout:
+        try:
+            timeout = float(timeout)
+        except ValueError:
+            timeout = math.nan
+        if not math.isfinite(timeout) or timeout <= 0:
+            raise ValueError(f"{TIMEOUT_HEADER} must be a positive number of milliseconds")
+        return now + timeout / 1000.0
+    return None
+
+
+def set_deadline(deadline):
+    """Set the current request's deadline; returns a token for reset_deadline"""
+    return _deadline.set(deadline)
+
+
+def reset_deadline(token):
+    _deadline.reset(token)
+
+
+def check_deadline(stage):
+    """Raise DeadlineExceeded if the current request's deadline has passed"""
+    deadline = _deadline.get()
+    if deadline is not None and time.time() >= deadline:
+        raise DeadlineExceeded(stage)
+
+
+class AdmissionController:
+    """
+    Admission control for prediction requests.
+
+    A request is shed (the service answers 503 with Retry-After) when
+    max_in_flight requests are already running, or when the moving average
+    of request latency is above max_latency_ms while others are in flight.
+    When nothing is in flight, a request is always admitted, so the latency
+    average keeps updating and shedding ends once latency recovers.
+    Either limit is off when 0. Counters record admitted, shed and expired
+    requests.
+    """
+
+    def __init__(self, max_in_flight=0, max_latency_ms=0.0):
+        self.max_in_flight = max_in_flight
+        self.max_latency = max_latency_ms / 1000.0
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.latency_ewma = 0.0
+        self.stats = {
+            'admitted': 0,
+            'shed_in_flight': 0,
+            'shed_latency': 0,
+            'expired_on_arrival': 0,
+            'expired_before_preprocess': 0,
+            'expired_before_inference': 0,
+        }
+
+    def admit(self, deadline=None):
+        """
+        Decide whether to run a request
+        Returns:
+            (None, start time) if admitted (call release() when it ends),
+            else ('shed_in_flight' | 'shed_latency' | 'expired_on_arrival', None)
+        """
+        with self._lock:
+            if deadline is not None and time.time() >= deadline:
+                reason = 'expired_on_arrival'
+            elif self.max_in_flight and self.in_flight >= self.max_in_flight:
+                reason = 'shed_in_flight'
+            elif self.max_latency and self.in_flight and self.latency_ewma > self.max_latency:
+                reason = 'shed_latency'
+            else:
+                self.in_flight += 1
+                self.stats['admitted'] += 1
+                return None, time.perf_counter()
+            self.stats[reason] += 1
+            return reason, None
+
+    def release(self, start):
+        """Mark an admitted request finished and fold in its latency"""
+        seconds = time.perf_counter() - start
+        with self._lock:
+            self.in_flight -= 1
+            self.latency_ewma += LATENCY_EWMA_ALPHA * (seconds - self.latency_ewma)
+
+    def expired(self, stage):
+        with self._lock:
+            self.stats[f'expired_before_{stage}'] += 1
+
+    def retry_after(self):
+        """Suggested Retry-After in whole seconds"""
+        return max(1, int(round(self.latency_ewma)))
+
+    def describe(self):
+        with self._lock:
+            return dict(
+                self.stats,
+                in_flight=self.in_flight,
+                latency_ewma_ms=round(self.latency_ewma * 1000, 3),
+                max_in_flight=self.max_in_flight,
+                max_latency_ms=self.max_latency * 1000,
+            )
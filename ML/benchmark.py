@@ -0,0 +1,420 @@
+"""
+Performance Benchmarks for the ML Service
+Times the prediction service end to end through the Flask test client
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+TARGET_COLUMN = 'Disease'
+
+
+def load_reports(dataset, n_rows, seed=42):
+    """Sample n_rows feature rows (with replacement) from the dataset"""
+    df = pd.read_csv(dataset)
+    df = df.drop(columns=[TARGET_COLUMN], errors='ignore')
+    return df.sample(n=n_rows, replace=True, random_state=seed).reset_index(drop=True)
+
+
+def load_service(model_dir):
+    """Import the Flask app with MODEL_DIR pointing at model_dir"""
+    os.environ['MODEL_DIR'] = model_dir
+    import ml_service
+    if ml_service.predictor is None:
+        print(f"[ERROR] No model could be loaded from {model_dir}")
+        sys.exit(1)
+    return ml_service
+
+
+def time_request(client, repeat, path='/predict/batch', **kwargs):
+    """Best-of-repeat wall time for one POST request"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.post(path, **kwargs)
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f"Request failed ({response.status_code}): {response.get_data(as_text=True)[:200]}")
+        best = min(best, elapsed)
+    return best
+
+
+def encode_batch_payloads(df, service):
+    """Encode the same batch in every format the service accepts"""
+    records = df.to_dict(orient='records')
+    columns = {col: df[col].tolist() for col in df.columns}
+
+    payloads = {
+        'records (json)': dict(
+            data=json.dumps({'reports': records}),
+            content_type='application/json'
+        ),
+        'columnar (json)': dict(
+            data=json.dumps({'columns': list(df.columns), 'data': columns}),
+            content_type='application/json'
+        ),
+    }
+
+    if service.HAS_MSGPACK:
+        payloads['columnar (msgpack)'] = dict(
+            data=service.msgpack.packb({'columns': list(df.columns), 'data': columns}),
+            content_type='application/msgpack'
+        )
+
+    buffer = io.BytesIO()
+    np.save(buffer, df.to_records(index=False, column_dtypes={
+        col: f'U{df[col].astype(str).str.len().max()}'
+        for col in df.select_dtypes(include=['object']).columns
+    }), allow_pickle=False)
+    payloads['structured (npy)'] = dict(
+        data=buffer.getvalue(),
+        content_type='application/x-npy'
+    )
+
+    return payloads
+
+
+def benchmark_batch_formats(args):
+    """Compare /predict/batch request formats at several batch sizes"""
+    service = load_service(args.model_dir)
+    client = service.app.test_client()
+
+    print(f"{'rows':>8}  {'format':<20} {'body':>10} {'seconds':>9} {'rows/s':>10}")
+    for n_rows in args.rows:
+        df = load_reports(args.dataset, n_rows)
+        for name, payload in encode_batch_payloads(df, service).items():
+            seconds = time_request(client, args.repeat, **payload)
+            size_kb = len(payload['data']) / 1024
+            print(f"{n_rows:>8}  {name:<20} {size_kb:>8.0f}KB {seconds:>9.3f} {n_rows / seconds:>10.0f}")
+
+
+def benchmark_response_formats(args):
+    """Compare /predict/batch response encodings at several batch sizes"""
+    service = load_service(args.model_dir)
+    client = service.app.test_client()
+    encoder = 'orjson' if service.HAS_ORJSON else 'json (stdlib)'
+    print(f"JSON encoder: {encoder}")
+
+    print(f"{'rows':>8}  {'response':<20} {'body':>10} {'seconds':>9} {'rows/s':>10}")
+    for n_rows in args.rows:
+        df = load_reports(args.dataset, n_rows)
+        body = json.dumps({'columns': list(df.columns), 'data': {c: df[c].tolist() for c in df.columns}})
+        for name, query in [('full', ''), ('top_k=3', '?top_k=3'), ('top_k=1', '?top_k=1'), ('matrix', '?format=matrix')]:
+            response = client.post(f'/predict/batch{query}', data=body, content_type='application/json')
+            size_kb = len(response.get_data()) / 1024
+            seconds = time_request(client, args.repeat, path=f'/predict/batch{query}',
+                                   data=body, content_type='application/json')
+            print(f"{n_rows:>8}  {name:<20} {size_kb:>8.0f}KB {seconds:>9.3f} {n_rows / seconds:>10.0f}")
+
+
+def benchmark_explain(args):
+    """Overhead of per-prediction explanations at several batch sizes"""
+    from predict import ReportPredictor
+    predictor = ReportPredictor(model_dir=args.model_dir)
+
+    start = time.perf_counter()
+    explainer = predictor.bundle.explainer
+    print(f"Explainer tables: {time.perf_counter() - start:.3f}s to build, "
+          f"{explainer.memory_bytes / 1e6:.1f} MB")
+
+    # Bias + contributions must reproduce predict_proba for the predicted class
+    df = load_reports(args.dataset, 1000)
+    X = predictor.preprocess_input(df)
+    probabilities = predictor.model.predict_proba(X)
+    best = probabilities.argmax(axis=1)
+    contributions, bias = explainer.explain(X, best)
+    error = np.abs(bias + contributions.sum(axis=1) - probabilities[np.arange(len(best)), best]).max()
+    print(f"Max |bias + sum(contributions) - probability|: {error:.2e}")
+
+    print(f"{'rows':>8}  {'plain (s)':>10} {'explain (s)':>12} {'overhead':>9}")
+    for n_rows in args.rows:
+        df = load_reports(args.dataset, n_rows)
+        timings = []
+        for explain in (False, True):
+            best = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                predictor.predict_frame(df, explain=explain)
+                best = min(best, time.perf_counter() - start)
+            timings.append(best)
+        print(f"{n_rows:>8}  {timings[0]:>10.4f} {timings[1]:>12.4f} {timings[1] / timings[0]:>8.2f}x")
+
+
+def benchmark_float32(args):
+    """
+    Check the float32 inference path against float64 on the full dataset,
+    then compare latency and feature-matrix size at several batch sizes.
+    Exits non-zero if predictions disagree on more than --max-disagreement.
+    """
+    from predict import ReportPredictor
+    predictors = {
+        'float64': ReportPredictor(model_dir=args.model_dir, dtype='float64'),
+        'float32': ReportPredictor(model_dir=args.model_dir, dtype='float32'),
+    }
+
+    # Equivalence check over every row of the dataset
+    df = pd.read_csv(args.dataset).drop(columns=[TARGET_COLUMN], errors='ignore')
+    scores = {name: p.score_frame(df) for name, p in predictors.items()}
+    labels64, _, proba64, _ = scores['float64']
+    labels32, _, proba32, _ = scores['float32']
+    disagreements = sum(a != b for a, b in zip(labels64, labels32))
+    disagreement = disagreements / len(df)
+    print(f"Equivalence on {len(df)} rows: {disagreements} prediction disagreements "
+          f"({disagreement:.4%}), max |probability difference| {np.abs(proba64 - proba32).max():.2e}")
+
+    print(f"{'rows':>8}  {'dtype':<8} {'matrix':>10} {'preprocess (s)':>15} {'predict (s)':>12} {'total (s)':>10}")
+    for n_rows in args.rows:
+        df = load_reports(args.dataset, n_rows)
+        for name, predictor in predictors.items():
+            best_pre, best_total = float('inf'), float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                X = predictor.preprocess_input(df)
+                preprocessed = time.perf_counter()
+                predictor.model.predict_proba(X)
+                done = time.perf_counter()
+                best_pre = min(best_pre, preprocessed - start)
+                best_total = min(best_total, done - start)
+            print(f"{n_rows:>8}  {name:<8} {X.nbytes / 1e6:>8.2f}MB {best_pre:>15.4f} "
+                  f"{best_total - best_pre:>12.4f} {best_total:>10.4f}")
+
+    if disagreement > args.max_disagreement:
+        print(f"[ERROR] float32 disagreement {disagreement:.4%} exceeds {args.max_disagreement:.4%}")
+        sys.exit(1)
+    print("[OK] float32 path is equivalent within tolerance")
+
+
+def benchmark_dedup(args):
+    """
+    Compare training on every row with training on collapsed duplicate rows
+    weighted by their counts. Both models are scored on the same held-out
+    rows, so the metric difference is like for like.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score, f1_score
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import LabelEncoder
+
+    from features import PatientFeatureTransformer
+    from train_model import balanced_sample_weight, collapse_duplicates
+
+    df = pd.read_csv(args.dataset)
+    if args.rows:
+        # Resampling with replacement mimics extracts with many repeated rows
+        df = df.sample(n=args.rows, replace=True, random_state=42).reset_index(drop=True)
+    train_df, test_df = train_test_split(df, test_size=0.2, random_state=42, stratify=df[TARGET_COLUMN])
+
+    transformer = PatientFeatureTransformer()
+    encoder = LabelEncoder().fit(df[TARGET_COLUMN])
+    X_train = transformer.fit_transform(train_df.drop(columns=[TARGET_COLUMN]))
+    X_test = transformer.transform(test_df.drop(columns=[TARGET_COLUMN]))
+    y_train = encoder.transform(train_df[TARGET_COLUMN])
+    y_test = encoder.transform(test_df[TARGET_COLUMN])
+    X_unique, y_unique, counts = collapse_duplicates(X_train, y_train)
+
+    runs = {
+        'all rows': (X_train, y_train, None, 'balanced'),
+        'collapsed': (X_unique, y_unique, balanced_sample_weight(y_unique, counts), None),
+    }
+    results = {}
+    for name, (X, y, weight, class_weight) in runs.items():
+        best = float('inf')
+        for _ in range(args.repeat):
+            model = RandomForestClassifier(
+                n_estimators=200, max_depth=20, random_state=42, n_jobs=-1, class_weight=class_weight
+            )
+            start = time.perf_counter()
+            model.fit(X, y, sample_weight=weight)
+            best = min(best, time.perf_counter() - start)
+        y_pred = model.predict(X_test)
+        results[name] = {
+            'rows': len(X),
+            'seconds': best,
+            'accuracy': accuracy_score(y_test, y_pred),
+            'f1': f1_score(y_test, y_pred, average='weighted'),
+        }
+
+    print(f"Training rows: {len(X_train)}, unique rows: {len(X_unique)}, "
+          f"compression ratio {len(X_train) / len(X_unique):.2f}")
+    print(f"{'training':<12} {'rows':>8} {'fit (s)':>9} {'accuracy':>9} {'f1':>8}")
+    for name, result in results.items():
+        print(f"{name:<12} {result['rows']:>8} {result['seconds']:>9.3f} "
+              f"{result['accuracy']:>9.4f} {result['f1']:>8.4f}")
+    full, collapsed = results['all rows'], results['collapsed']
+    print(f"Speedup: {full['seconds'] / collapsed['seconds']:.2f}x, "
+          f"accuracy difference {collapsed['accuracy'] - full['accuracy']:+.4f}, "
+          f"f1 difference {collapsed['f1'] - full['f1']:+.4f}")
+
+
+def run_clients(predictor, reports, clients, requests_per_client):
+    """
+    clients threads each send requests_per_client predict_batch calls, as a
+    threaded Flask server would run them
+    Returns:
+        (wall seconds, list of per-request latencies)
+    """
+    import threading
+    barrier = threading.Barrier(clients + 1)
+    latencies = [[] for _ in range(clients)]
+
+    def client(i):
+        barrier.wait()
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            predictor.predict_batch(reports)
+            latencies[i].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, [t for client_times in latencies for t in client_times]
+
+
+def benchmark_concurrency(args):
+    """
+    Throughput and latency under concurrent clients, for the inference
+    threading policy (n_jobs=1, parallel row chunks on a shared pool for
+    large batches) against the model's own n_jobs=-1 fan-out on every call
+    """
+    from inference_threads import InferencePolicy, limit_native_threads
+    from predict import ReportPredictor
+    from telemetry import thread_info
+
+    limit_native_threads(1)
+    policy = ReportPredictor(model_dir=args.model_dir)
+    per_call = ReportPredictor(
+        model_dir=args.model_dir, inference_policy=InferencePolicy(parallel_threshold=float('inf'))
+    )
+    per_call.model.n_jobs = -1
+    predictors = {'policy': policy, 'n_jobs=-1': per_call}
+    print(f"CPU count: {os.cpu_count()}, parallel threshold: {policy.inference_policy.parallel_threshold} rows, "
+          f"pool workers: {policy.inference_policy.max_workers}")
+    print(f"Native thread pools: {thread_info().get('threadpools')}")
+
+    print(f"{'rows':>6} {'clients':>8}  {'mode':<10} {'req/s':>9} {'rows/s':>10} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for n_rows in args.rows:
+        reports = load_reports(args.dataset, n_rows).to_dict(orient='records')
+        for clients in args.clients:
+            # Roughly the same total work at every concurrency level
+            requests_per_client = max(1, args.requests // clients)
+            for name, predictor in predictors.items():
+                predictor.predict_batch(reports)  # warm up
+                wall, latencies = run_clients(predictor, reports, clients, requests_per_client)
+                p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+                print(f"{n_rows:>6} {clients:>8}  {name:<10} {len(latencies) / wall:>9.1f} "
+                      f"{len(latencies) * n_rows / wall:>10.0f} {p50:>9.2f} {p99:>9.2f}")
+
+
+def benchmark_baseline(args):
+    """Record an inference performance baseline (see perf_baseline.py)"""
+    from perf_baseline import run_benchmark, save_baseline
+
+    document = run_benchmark(args.dataset)
+    save_baseline(document, args.output)
+    for metric, value in sorted(document['metrics'].items()):
+        print(f"{metric:<24} {value:>14.3f}")
+    print(f"[OK] Baseline saved to {args.output}")
+
+
+def benchmark_compare(args):
+    """
+    Measure the current code and compare it with a stored baseline; exits
+    with status 1 if any metric is worse by more than --threshold, missing
+    from the run, or the baseline cannot be read
+    """
+    from perf_baseline import (
+        compare, environment_differences, load_baseline, print_comparison, run_benchmark, save_baseline
+    )
+
+    try:
+        baseline = load_baseline(args.baseline)
+    except FileNotFoundError:
+        print(f"[ERROR] Baseline {args.baseline} not found; record one with 'benchmark.py baseline'")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    current = run_benchmark(args.dataset)
+    if args.output:
+        save_baseline(current, args.output)
+    for key, (before, after) in environment_differences(baseline, current).items():
+        print(f"[WARNING] {key} differs from the baseline: {before} -> {after}")
+    if not print_comparison(compare(baseline, current, args.threshold), args.threshold):
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ML service performance benchmarks')
+    parser.add_argument('--model-dir', type=str, default='models', help='Directory containing model files')
+    parser.add_argument('--dataset', type=str, default='New_dataset.csv', help='CSV to sample reports from')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetitions per measurement (best is reported)')
+
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    batch_formats = subparsers.add_parser('batch-formats', help='Compare /predict/batch request formats')
+    batch_formats.add_argument('--rows', type=int, nargs='+', default=[1000, 100000],
+                               help='Batch sizes to benchmark')
+    batch_formats.set_defaults(func=benchmark_batch_formats)
+
+    response_formats = subparsers.add_parser('response-formats', help='Compare /predict/batch response encodings')
+    response_formats.add_argument('--rows', type=int, nargs='+', default=[1000, 100000],
+                                  help='Batch sizes to benchmark')
+    response_formats.set_defaults(func=benchmark_response_formats)
+
+    explain = subparsers.add_parser('explain', help='Overhead of ?explain=true explanations')
+    explain.add_argument('--rows', type=int, nargs='+', default=[1, 32, 1024, 10000],
+                         help='Batch sizes to benchmark')
+    explain.set_defaults(func=benchmark_explain)
+
+    float32 = subparsers.add_parser('float32', help='Check and time the float32 inference path')
+    float32.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000],
+                         help='Batch sizes to benchmark')
+    float32.add_argument('--max-disagreement', type=float, default=0.0,
+                         help='Largest allowed fraction of differing predictions')
+    float32.set_defaults(func=benchmark_float32)
+
+    dedup = subparsers.add_parser('dedup', help='Training speedup from collapsing duplicate rows')
+    dedup.add_argument('--rows', type=int, default=None,
+                       help='Resample the dataset to this many rows (with replacement) first')
+    dedup.set_defaults(func=benchmark_dedup)
+
+    concurrency = subparsers.add_parser('concurrency', help='Throughput at several concurrent client counts')
+    concurrency.add_argument('--clients', type=int, nargs='+', default=[1, 8, 64],
+                             help='Concurrent client counts')
+    concurrency.add_argument('--rows', type=int, nargs='+', default=[1, 32, 4096],
+                             help='Reports per request')
+    concurrency.add_argument('--requests', type=int, default=128,
+                             help='Total requests per measurement, split across clients')
+    concurrency.set_defaults(func=benchmark_concurrency)
+
+    baseline = subparsers.add_parser('baseline', help='Record an inference latency / memory baseline')
+    baseline.add_argument('--output', type=str, default='baselines/inference.json',
+                          help='Baseline file to write')
+    baseline.set_defaults(func=benchmark_baseline)
+
+    compare = subparsers.add_parser('compare', help='Fail if inference performance regressed against a baseline')
+    compare.add_argument('--baseline', type=str, default='baselines/inference.json',
+                         help='Baseline file to compare against')
+    compare.add_argument('--threshold', type=float, default=0.2,
+                         help='Largest allowed relative regression per metric (0.2 = 20%%)')
+    compare.add_argument('--output', type=str, default=None,
+                         help='Also save this run as a baseline file')
+    compare.set_defaults(func=benchmark_compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Shared fixtures: a small trained model and the service running it"""
+
+import os
+import threading
+
+import pandas as pd
+import pytest
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'New_dataset.csv')
+
+
+class KeepAliveHandler(WSGIRequestHandler):
+    # The development server defaults to HTTP/1.0, which closes every connection
+    protocol_version = 'HTTP/1.1'
+
+
+def serve(app):
+    """Run a WSGI app on an ephemeral port in a background thread"""
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def train_small_model(model_dir):
+    """Train a small forest on part of the dataset and save it as a bundle"""
+    from sklearn.ensemble import RandomForestClassifier
+    from train_model import ImprovedPatientReportAnalyzer
+
+    analyzer = ImprovedPatientReportAnalyzer()
+    X, y = analyzer.preprocess_data(pd.read_csv(DATASET).head(2000), target_column='Disease')
+    analyzer.model = RandomForestClassifier(n_estimators=20, random_state=0).fit(X, y)
+    analyzer.save_model(model_dir)
+
+
+@pytest.fixture(scope='session')
+def dataset():
+    return DATASET
+
+
+@pytest.fixture(scope='session')
+def small_model_dir(tmp_path_factory):
+    model_dir = str(tmp_path_factory.mktemp('model'))
+    train_small_model(model_dir)
+    return model_dir
+
+
+@pytest.fixture(scope='session')
+def reports():
+    return pd.read_csv(DATASET).drop(columns=['Disease']).head(50).to_dict(orient='records')
+
+
+@pytest.fixture(scope='session')
+def ml_service(small_model_dir):
+    """The service module, loaded with the small model"""
+    os.environ['MODEL_DIR'] = small_model_dir
+    import ml_service
+    return ml_service
+
+
+@pytest.fixture(scope='session')
+def service(ml_service):
+    """The service module and the URL it is served on"""
+    server, url = serve(ml_service.app)
+    yield ml_service, url
+    server.shutdown()
+
+
+@pytest.fixture
+def serve_app():
+    """Serve any WSGI app for one test; returns its URL"""
+    servers = []
+
+    def start(app):
+        server, url = serve(app)
+        servers.append(server)
+        return url
+
+    yield start
+    for server in servers:
+        server.shutdown()
@@ -0,0 +1,253 @@
+"""
+Input Drift Monitoring
+Fixed-bin histograms and category frequencies of the raw input fields,
+saved with the model as a reference and accumulated over recent service
+traffic in constant memory, compared with PSI and (binned) KS scores
+"""
+
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Numeric fields get up to DEFAULT_BINS equal-frequency bins over the
+# reference data (fewer for discrete fields, whose quantiles repeat)
+DEFAULT_BINS = 10
+EDGE_QUANTILES = np.linspace(0, 1, DEFAULT_BINS + 1)[1:-1]
+
+# Conventional PSI bands: below 0.1 stable, 0.1-0.25 moderate, above significant
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+# Floor for empty bins, so PSI stays finite
+PSI_EPSILON = 1e-4
+
+
+def bin_edges(quantiles):
+    """Interior bin edges from a field's reference quantiles"""
+    quantiles = np.asarray(quantiles, dtype=np.float64)
+    return np.unique(quantiles[np.isfinite(quantiles)]).tolist()
+
+
+def population_stability_index(expected, actual):
+    """PSI between two count vectors over the same bins"""
+    expected = np.maximum(expected / max(expected.sum(), 1), PSI_EPSILON)
+    actual = np.maximum(actual / max(actual.sum(), 1), PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def binned_ks(expected, actual):
+    """Largest gap between the two binned CDFs (a lower bound on the KS statistic)"""
+    if expected.sum() == 0 or actual.sum() == 0:
+        return None
+    gap = np.cumsum(expected) / expected.sum() - np.cumsum(actual) / actual.sum()
+    return float(np.abs(gap).max())
+
+
+class DriftProfile:
+    """
+    Counts of raw input values per field.
+
+    A numeric field with interior edges e_0 < ... < e_m has m + 1 value
+    bins (x < e_0, e_0 <= x < e_1, ..., x >= e_m) plus a missing bin. A
+    categorical field has one bin per class, an 'other' bin for unseen
+    values and a missing bin. Memory depends only on the number of bins.
+    """
+
+    def __init__(self, numeric_edges, categorical_classes):
+        self.numeric_edges = {col: np.asarray(edges, dtype=np.float64) for col, edges in numeric_edges.items()}
+        self.categorical_classes = {col: np.asarray(sorted(classes), dtype=str)
+                                    for col, classes in categorical_classes.items()}
+        self.n_rows = 0
+        self.counts = {col: np.zeros(len(edges) + 2, dtype=np.int64) for col, edges in self.numeric_edges.items()}
+        self.counts.update({col: np.zeros(len(classes) + 2, dtype=np.int64)
+                            for col, classes in self.categorical_classes.items()})
+
+    @classmethod
+    def from_columns(cls, columns, n_rows, numeric_fields, categorical_fields):
+        """Profile a reference dataset (a DataFrame or mapping of column -> values)"""
+        numeric_edges = {}
+        for col in numeric_fields:
+            if col in columns:
+                values = _numeric(columns[col])
+                finite = values[~np.isnan(values)]
+                numeric_edges[col] = bin_edges(np.quantile(finite, EDGE_QUANTILES)) if len(finite) else []
+        categorical_classes = {col: classes for col, classes in categorical_fields.items() if col in columns}
+        profile = cls(numeric_edges, categorical_classes)
+        profile.update(columns, n_rows)
+        return profile
+
+    def bin_counts(self, columns, unseen=None):
+        """
+        Per-field counts for a batch, without touching this profile
+        unseen optionally maps a categorical field to a mask of rows whose
+        value was replaced by None for not being a known class (see
+        input_schema.ValidatedBatch); those rows count as 'other', not missing.
+        """
+        unseen = unseen or {}
+        counts = {}
+        for col, edges in self.numeric_edges.items():
+            if col not in columns:
+                continue
+            values = _numeric(columns[col])
+            missing = np.isnan(values)
+            bins = np.searchsorted(edges, values, side='right')
+            bins[missing] = len(edges) + 1
+            counts[col] = np.bincount(bins, minlength=len(edges) + 2)
+        for col, classes in self.categorical_classes.items():
+            if col not in columns:
+                continue
+            values = np.asarray(columns[col].to_numpy(dtype=object) if hasattr(columns[col], 'to_numpy')
+                                else columns[col], dtype=object)
+            missing = pd.isna(values)
+            strings = np.where(missing, '', values).astype(str)
+            bins = np.searchsorted(classes, strings)
+            if len(classes):
+                known = classes[np.minimum(bins, len(classes) - 1)] == strings
+            else:
+                known = np.zeros(len(strings), dtype=bool)
+            bins[~known] = len(classes)
+            bins[missing] = len(classes) + 1
+            if col in unseen:
+                bins[unseen[col]] = len(classes)
+            counts[col] = np.bincount(bins, minlength=len(classes) + 2)
+        return counts
+
+    def add(self, counts, n_rows):
+        for col, delta in counts.items():
+            self.counts[col] += delta
+        self.n_rows += n_rows
+
+    def update(self, columns, n_rows):
+        self.add(self.bin_counts(columns), n_rows)
+
+    def copy(self):
+        profile = DriftProfile.__new__(DriftProfile)
+        profile.numeric_edges = self.numeric_edges
+        profile.categorical_classes = self.categorical_classes
+        profile.n_rows = self.n_rows
+        profile.counts = {col: counts.copy() for col, counts in self.counts.items()}
+        return profile
+
+    def to_dict(self):
+        """JSON-serializable form, as stored in the model metadata"""
+        return {
+            'n_rows': int(self.n_rows),
+            'numeric': {
+                col: {'edges': edges.tolist(), 'counts': self.counts[col].tolist()}
+                for col, edges in self.numeric_edges.items()
+            },
+            'categorical': {
+                col: {'classes': classes.tolist(), 'counts': self.counts[col].tolist()}
+                for col, classes in self.categorical_classes.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        profile = cls(
+            {col: field['edges'] for col, field in data['numeric'].items()},
+            {col: field['classes'] for col, field in data['categorical'].items()}
+        )
+        for kind in ('numeric', 'categorical'):
+            for col, field in data[kind].items():
+                profile.counts[col] = np.asarray(field['counts'], dtype=np.int64)
+        profile.n_rows = data['n_rows']
+        return profile
+
+    def empty_like(self):
+        return DriftProfile(self.numeric_edges, self.categorical_classes)
+
+
+def _numeric(values):
+    if hasattr(values, 'to_numpy'):
+        return values.to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.asarray(values, dtype=np.float64)
+
+
+class DriftMonitor:
+    """
+    Recent-traffic profile compared against a reference profile.
+
+    Traffic is counted into a current window; when it reaches window_rows
+    it becomes the previous window and counting starts afresh, so reports
+    cover the last window_rows to 2 * window_rows rows in fixed memory.
+    observe() bins a batch outside the lock and only holds it to add the
+    per-field count vectors.
+    """
+
+    def __init__(self, reference, window_rows=10000, min_rows=100):
+        self.reference = reference if isinstance(reference, DriftProfile) else DriftProfile.from_dict(reference)
+        self.window_rows = window_rows
+        self.min_rows = min_rows
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._current = self.reference.empty_like()
+            self._previous = None
+            self.observed_rows = 0
+            self.window_started_at = datetime.now().isoformat()
+
+    def observe(self, columns, n_rows, unseen=None):
+        """Count a batch of validated input columns (unseen: see DriftProfile.bin_counts)"""
+        if n_rows == 0:
+            return
+        counts = self.reference.bin_counts(columns, unseen)
+        with self._lock:
+            self._current.add(counts, n_rows)
+            self.observed_rows += n_rows
+            if self._current.n_rows >= self.window_rows:
+                self._previous = self._current
+                self._current = self.reference.empty_like()
+                self.window_started_at = datetime.now().isoformat()
+
+    def window(self):
+        """Snapshot of the traffic currently covered (previous + current window)"""
+        with self._lock:
+            recent = self._current.copy()
+            previous = self._previous
+        if previous is not None:
+            recent.add(previous.counts, previous.n_rows)
+        return recent
+
+    def report(self):
+        """Per-field PSI, binned KS and missing rates against the reference"""
+        recent = self.window()
+        fields = {}
+        for kind in ('numeric', 'categorical'):
+            columns = self.reference.numeric_edges if kind == 'numeric' else self.reference.categorical_classes
+            for col in columns:
+                expected, actual = self.reference.counts[col], recent.counts[col]
+                # The last bin counts missing values
+                field = {
+                    'type': kind,
+                    'psi': population_stability_index(expected, actual) if actual.sum() else None,
+                    'missing_rate': float(actual[-1] / actual.sum()) if actual.sum() else None,
+                    'reference_missing_rate': float(expected[-1] / max(expected.sum(), 1)),
+                }
+                if kind == 'numeric':
+                    field['ks'] = binned_ks(expected[:-1], actual[:-1])
+                field['status'] = self._status(field['psi'], recent.n_rows)
+                fields[col] = field
+
+        scores = [f['psi'] for f in fields.values() if f['psi'] is not None]
+        return {
+            'window_rows': int(recent.n_rows),
+            'observed_rows': int(self.observed_rows),
+            'window_size': self.window_rows,
+            'reference_rows': int(self.reference.n_rows),
+            'max_psi': max(scores) if scores else None,
+            'status': self._status(max(scores) if scores else None, recent.n_rows),
+            'fields': fields,
+        }
+
+    def _status(self, psi, n_rows):
+        if psi is None or n_rows < self.min_rows:
+            return 'insufficient_data'
+        if psi >= PSI_SIGNIFICANT:
+            return 'significant'
+        if psi >= PSI_MODERATE:
+            return 'moderate'
+        return 'stable'
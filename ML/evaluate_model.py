@@ -15,6 +15,7 @@ from sklearn.metrics import (
     confusion_matrix, classification_report
 )
 from sklearn.model_selection import train_test_split
+from model_bundle import load_model_dir
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -35,40 +36,31 @@ class ModelEvaluator:
     def __init__(self, model_dir='models'):
         self.model_dir = model_dir
         self.model = None
-        self.scaler = None
+        self.transformer = None
         self.label_encoders = None
         self.feature_names = []
         self.load_model()
     
     def load_model(self):
-        """Load trained model and preprocessors"""
-        model_path = os.path.join(self.model_dir, 'patient_report_model.joblib')
-        self.model = joblib.load(model_path)
-        
-        scaler_path = os.path.join(self.model_dir, 'scaler.joblib')
-        self.scaler = joblib.load(scaler_path)
-        
-        encoders_path = os.path.join(self.model_dir, 'label_encoders.joblib')
-        self.label_encoders = joblib.load(encoders_path)
-        
-        metadata_path = os.path.join(self.model_dir, 'model_metadata.json')
-        if os.path.exists(metadata_path):
-            with open(metadata_path, 'r') as f:
-                metadata = json.load(f)
-                self.feature_names = metadata.get('feature_names', [])
+        """Load trained model bundle (or legacy model files)"""
+        bundle = load_model_dir(self.model_dir)
+        self.model = bundle.model
+        self.transformer = bundle.transformer
+        self.label_encoders = bundle.label_encoders
+        self.feature_names = bundle.feature_names
         
         logger.info("Model loaded successfully")
     
     def preprocess_data(self, df, target_column=None):
-        """Preprocess data similar to training"""
-        from train_model import ImprovedPatientReportAnalyzer
-        
-        analyzer = ImprovedPatientReportAnalyzer()
-        analyzer.scaler = self.scaler
-        analyzer.label_encoders = self.label_encoders
-        analyzer.feature_names = self.feature_names
+        """Preprocess data with the transformer fitted at training time"""
+        if target_column and target_column in df.columns:
+            X, y = df.drop(columns=[target_column]), df[target_column]
+        else:
+            X, y = df.iloc[:, :-1], df.iloc[:, -1]
         
-        X, y = analyzer.preprocess_data(df, target_column=target_column, fit=False)
+        X = self.transformer.transform(X)
+        if 'target' in self.label_encoders and y.dtype == 'object':
+            y = self.label_encoders['target'].transform(y)
         return X, y
     
     def evaluate(self, X, y, output_dir='evaluation_results'):
@@ -0,0 +1,287 @@
+"""
+Patient Report Feature Transformer
+A single fitted preprocessing step (outlier capping, feature engineering,
+imputation, categorical encoding and scaling) shared by training,
+evaluation and inference
+"""
+
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.preprocessing import LabelEncoder, RobustScaler
+
+from telemetry import NULL_TELEMETRY
+
+TRANSFORMER_FILE = 'feature_transformer.joblib'
+
+# Bump whenever fitting or transform semantics change, so cached results
+# computed on the old preprocessing (e.g. grid search scores) are not reused
+PREPROCESSING_VERSION = 1
+
+# Engineered features and the raw columns each one needs
+ENGINEERED_FEATURES = {
+    'Age_BP_Interaction': ('Age', 'BloodPressure'),
+    'BMI_Cholesterol_Interaction': ('BMI', 'Cholesterol'),
+    'Cardiovascular_Risk': ('BloodPressure', 'Cholesterol', 'Glucose'),
+}
+
+
+def as_frame(data):
+    """Convert a dict, list of dicts or DataFrame to a DataFrame"""
+    if isinstance(data, dict):
+        return pd.DataFrame([data])
+    if isinstance(data, list):
+        return pd.DataFrame.from_records(data)
+    return data
+
+
+def _as_array(values, dtype):
+    """A DataFrame column or array-like as a numpy array of dtype"""
+    if hasattr(values, 'to_numpy'):
+        if dtype is object:
+            return values.to_numpy(dtype=object)
+        return values.to_numpy(dtype=dtype, na_value=np.nan)
+    return np.asarray(values, dtype=dtype)
+
+
+def engineer_features(columns):
+    """
+    Create interaction and risk score features
+    Args:
+        columns: dict of column name -> numeric numpy array
+    Returns:
+        dict of engineered feature name -> numpy array, for every
+        engineered feature whose inputs are present
+    """
+    engineered = {}
+
+    # Create interaction features
+    if 'Age' in columns and 'BloodPressure' in columns:
+        engineered['Age_BP_Interaction'] = columns['Age'] * columns['BloodPressure']
+
+    if 'BMI' in columns and 'Cholesterol' in columns:
+        engineered['BMI_Cholesterol_Interaction'] = columns['BMI'] * columns['Cholesterol']
+
+    # Create risk score features (missing values count as not elevated)
+    if all(col in columns for col in ['BloodPressure', 'Cholesterol', 'Glucose']):
+        with np.errstate(invalid='ignore'):
+            engineered['Cardiovascular_Risk'] = (
+                (columns['BloodPressure'] > 140).astype(int) +
+                (columns['Cholesterol'] > 200).astype(int) +
+                (columns['Glucose'] > 100).astype(int)
+            )
+
+    return engineered
+
+
+class PatientFeatureTransformer(BaseEstimator, TransformerMixin):
+    """
+    Turns raw patient report features into the scaled model matrix.
+
+    fit() learns IQR outlier bounds for the raw numeric columns, median fill
+    values for numeric features, a fallback category and LabelEncoder for
+    each categorical feature, and a RobustScaler. transform() applies all of
+    them in one pass over numpy columns and returns a float64 (or, on
+    request, float32) array whose columns follow feature_names_.
+    """
+
+    def __init__(self, cap_outliers=True):
+        self.cap_outliers = cap_outliers
+
+    def fit(self, X, y=None, telemetry=None):
+        self._fit_transform(as_frame(X), telemetry or NULL_TELEMETRY)
+        return self
+
+    def fit_transform(self, X, y=None, telemetry=None):
+        return self._fit_transform(as_frame(X), telemetry or NULL_TELEMETRY)
+
+    def _fit_transform(self, df, telemetry):
+        self.numeric_inputs_ = df.select_dtypes(include=[np.number]).columns.tolist()
+        self.categorical_features_ = df.select_dtypes(include=['object']).columns.tolist()
+
+        with telemetry.stage('outlier_capping'):
+            numeric = {col: df[col].to_numpy(dtype=np.float64, na_value=np.nan) for col in self.numeric_inputs_}
+
+            # Outlier bounds (IQR method); outliers are capped, not removed
+            self.lower_bounds_ = {}
+            self.upper_bounds_ = {}
+            if self.cap_outliers:
+                for col, values in numeric.items():
+                    q1, q3 = np.nanquantile(values, [0.25, 0.75])
+                    iqr = q3 - q1
+                    self.lower_bounds_[col] = float(q1 - 1.5 * iqr)
+                    self.upper_bounds_[col] = float(q3 + 1.5 * iqr)
+            numeric = self._cap(numeric)
+
+        with telemetry.stage('feature_engineering'):
+            numeric.update(engineer_features(numeric))
+
+            self.feature_names_ = [
+                col for col in df.columns
+                if col in numeric or col in self.categorical_features_
+            ] + [col for col in ENGINEERED_FEATURES if col in numeric]
+
+        with telemetry.stage('encoding'):
+            # Imputation values: medians for numeric features, and for categorical
+            # features 'Unknown' when training saw it, else the most frequent value
+            self.fill_values_ = {}
+            for col, values in numeric.items():
+                self.fill_values_[col] = float(np.nanmedian(values))
+
+            self.encoders_ = {}
+            for col in self.categorical_features_:
+                values = df[col].fillna('Unknown').astype(str)
+                counts = values.value_counts()
+                self.fill_values_[col] = 'Unknown' if 'Unknown' in counts.index else counts.idxmax()
+                self.encoders_[col] = LabelEncoder().fit(values)
+
+            X = self._assemble(numeric, df, len(df))
+
+        with telemetry.stage('scaling'):
+            self.scaler_ = RobustScaler().fit(X)  # More robust to outliers than StandardScaler
+            return self._scale(X)
+
+    def transform(self, X, dtype=np.float64):
+        """
+        Transform raw reports into the scaled feature matrix
+        Args:
+            X: dict, list of dicts or DataFrame of raw features
+            dtype: np.float64 (default) or np.float32; with float32 every
+                   step, including scaling, runs in single precision
+        """
+        df = as_frame(X)
+        return self.transform_columns(df, len(df), dtype)
+
+    def transform_columns(self, columns, n_rows, dtype=np.float64):
+        """
+        Transform raw features held as columns (a DataFrame, or a mapping of
+        input name -> array such as a validated input batch) without
+        building a DataFrame
+        """
+        numeric = {}
+        for col in self.numeric_inputs_:
+            if col in columns:
+                numeric[col] = _as_array(columns[col], dtype)
+            else:
+                numeric[col] = np.full(n_rows, np.nan, dtype=dtype)
+        numeric = self._cap(numeric)
+        numeric.update(engineer_features(numeric))
+
+        return self._scale(self._assemble(numeric, columns, n_rows, dtype))
+
+    def _cap(self, numeric):
+        for col, lower in self.lower_bounds_.items():
+            if col in numeric:
+                numeric[col] = np.clip(numeric[col], lower, self.upper_bounds_[col])
+        return numeric
+
+    def _assemble(self, numeric, columns, n_rows, dtype=np.float64):
+        """Build the imputed, encoded feature matrix in feature_names_ order"""
+        X = np.empty((n_rows, len(self.feature_names_)), dtype=dtype)
+        for i, col in enumerate(self.feature_names_):
+            if col in self.encoders_:
+                X[:, i] = self._encode(col, columns, n_rows)
+            else:
+                values = numeric[col]
+                X[:, i] = np.where(np.isnan(values), self.fill_values_[col], values)
+        return X
+
+    def _encode(self, col, columns, n_rows):
+        """Encode a categorical column; missing and unseen values use the fallback"""
+        classes = self.encoders_[col].classes_
+        fallback = self.fill_values_[col]
+        if col not in columns:
+            return np.full(n_rows, np.searchsorted(classes, fallback))
+        values = _as_array(columns[col], object)
+        values = np.where(pd.isna(values), fallback, values).astype(str)
+        values[~np.isin(values, classes)] = fallback
+        return np.searchsorted(classes, values)
+
+    def _scale(self, X):
+        # Scaler parameters are cast to X's dtype so float32 stays float32
+        if self.scaler_.center_ is not None:
+            X -= self.scaler_.center_.astype(X.dtype, copy=False)
+        if self.scaler_.scale_ is not None:
+            X /= self.scaler_.scale_.astype(X.dtype, copy=False)
+        return X
+
+    def select_features(self, feature_names):
+        """
+        Restrict the output to a subset of feature_names_ (kept in their
+        current order), e.g. after importance-based pruning. The scaler is
+        sliced to match, and only raw inputs still needed by a kept feature,
+        directly or through an engineered feature, are read.
+        """
+        unknown = set(feature_names) - set(self.feature_names_)
+        if unknown:
+            raise ValueError(f"Unknown features: {sorted(unknown)}")
+
+        keep = [i for i, col in enumerate(self.feature_names_) if col in feature_names]
+        self.feature_names_ = [self.feature_names_[i] for i in keep]
+        if self.scaler_.center_ is not None:
+            self.scaler_.center_ = self.scaler_.center_[keep]
+        if self.scaler_.scale_ is not None:
+            self.scaler_.scale_ = self.scaler_.scale_[keep]
+        self.scaler_.n_features_in_ = len(keep)
+
+        needed = set(self.feature_names_)
+        for col in self.feature_names_:
+            needed.update(ENGINEERED_FEATURES.get(col, ()))
+        self.numeric_inputs_ = [col for col in self.numeric_inputs_ if col in needed]
+        self.encoders_ = {col: enc for col, enc in self.encoders_.items() if col in needed}
+        return keep
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray(self.feature_names_, dtype=object)
+
+    @classmethod
+    def from_legacy(cls, scaler, label_encoders, feature_names, fill_values=None):
+        """
+        Build a transformer from the separate scaler / label encoder files
+        written before the shared transformer existed. Like the old
+        inference code, it does not cap outliers.
+        """
+        fill_values = fill_values or {}
+        transformer = cls(cap_outliers=False)
+        transformer.categorical_features_ = [
+            col for col in feature_names if col in label_encoders and col != 'target'
+        ]
+        transformer.numeric_inputs_ = [
+            col for col in feature_names
+            if col not in ENGINEERED_FEATURES and col not in transformer.categorical_features_
+        ]
+        transformer.feature_names_ = list(feature_names)
+        transformer.lower_bounds_ = {}
+        transformer.upper_bounds_ = {}
+        transformer.encoders_ = {col: label_encoders[col] for col in transformer.categorical_features_}
+        transformer.scaler_ = scaler
+
+        transformer.fill_values_ = {}
+        for col in feature_names:
+            if col in transformer.encoders_:
+                classes = transformer.encoders_[col].classes_
+                fallback = fill_values.get(col, 'Unknown')
+                # Old models mapped unseen categories to code 0
+                transformer.fill_values_[col] = fallback if fallback in classes else classes[0]
+            else:
+                transformer.fill_values_[col] = fill_values.get(col, 0.0)
+        return transformer
+
+
+def load_feature_transformer(model_dir, feature_names=None, fill_values=None):
+    """
+    Load the fitted transformer from model_dir, falling back to the legacy
+    scaler.joblib / label_encoders.joblib files for older models
+    """
+    path = os.path.join(model_dir, TRANSFORMER_FILE)
+    if os.path.exists(path):
+        return joblib.load(path)
+
+    scaler = joblib.load(os.path.join(model_dir, 'scaler.joblib'))
+    label_encoders = joblib.load(os.path.join(model_dir, 'label_encoders.joblib'))
+    return PatientFeatureTransformer.from_legacy(
+        scaler, label_encoders, feature_names or [], fill_values
+    )
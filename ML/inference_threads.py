@@ -0,0 +1,83 @@
+"""
+Inference Threading Policy
+Tree evaluation runs single-threaded for small batches and is split by rows
+over one persistent, process-wide thread pool for large ones, with native
+BLAS / OpenMP pools capped, so concurrent requests do not oversubscribe
+the CPU
+"""
+
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Batches smaller than this are scored on the request's own thread
+DEFAULT_PARALLEL_THRESHOLD = 1024
+# Smallest row chunk handed to a pool thread
+MIN_CHUNK_ROWS = 256
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def shared_executor(max_workers):
+    """The process-wide inference pool, created on first use and then kept"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='inference')
+        return _executor
+
+
+def limit_native_threads(n_threads=1):
+    """
+    Cap the BLAS / OpenMP thread pools loaded in this process (via
+    threadpoolctl, which ships with scikit-learn). Request threads already
+    provide the concurrency, so each native pool would only add contention.
+    Returns the limiter, or None if threadpoolctl is unavailable.
+    """
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return None
+    return threadpool_limits(limits=n_threads)
+
+
+class InferencePolicy:
+    """
+    How predict_proba uses threads.
+
+    Models are scored with n_jobs=1, so a call never fans out on its own.
+    Batches of at least parallel_threshold rows are split into up to
+    max_workers row chunks scored on the shared pool (tree evaluation
+    releases the GIL); the pool is bounded, so concurrent large batches
+    queue for it instead of multiplying threads. Results are identical to
+    a single call, since every row is scored independently.
+    """
+
+    def __init__(self, parallel_threshold=DEFAULT_PARALLEL_THRESHOLD, max_workers=None):
+        self.parallel_threshold = parallel_threshold
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def prepare(self, model):
+        """Make a loaded model score single-threaded"""
+        if hasattr(model, 'n_jobs'):
+            model.n_jobs = 1
+        return model
+
+    def predict_proba(self, model, X):
+        n_chunks = min(self.max_workers, math.ceil(len(X) / MIN_CHUNK_ROWS))
+        if len(X) < self.parallel_threshold or n_chunks <= 1:
+            return model.predict_proba(X)
+
+        executor = shared_executor(self.max_workers)
+        return np.vstack(list(executor.map(model.predict_proba, np.array_split(X, n_chunks))))
+
+    def describe(self):
+        return {
+            'parallel_threshold': self.parallel_threshold,
+            'max_workers': self.max_workers,
+            'pool_started': _executor is not None,
+        }
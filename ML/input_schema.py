@@ -0,0 +1,326 @@
+"""
+Input Schema Validation
+A validator compiled from a fitted transformer's raw inputs and encoder
+classes. It checks and coerces whole columns of incoming reports, with
+per-field errors, before any DataFrame or feature matrix is built.
+"""
+
+import math
+from collections.abc import Mapping
+
+import numpy as np
+
+# Errors sent back in a response; validation itself checks every row
+MAX_REPORTED_ERRORS = 50
+
+# String values treated as a missing field (compared after strip().lower())
+MISSING_STRINGS = frozenset(['', 'nan', 'null', 'none', 'n/a', 'na'])
+
+
+def _normalize(value):
+    return str(value).strip().lower()
+
+
+def _is_missing(value):
+    if value is None:
+        return True
+    if isinstance(value, float):
+        return math.isnan(value)
+    if isinstance(value, str):
+        return value.strip().lower() in MISSING_STRINGS
+    # pandas.NA / NaT from object columns
+    return type(value).__name__ in ('NAType', 'NaTType')
+
+
+class SchemaError(ValueError):
+    """Invalid input, with one {'row', 'field', 'message'} dict per problem"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        first = errors[0]
+        where = f"{first['field']}: " if first['field'] else ''
+        more = f" (and {len(errors) - 1} more)" if len(errors) > 1 else ''
+        super().__init__(f"Invalid input: {where}{first['message']}{more}")
+
+    def to_dict(self):
+        """Error details for a response body, capped at MAX_REPORTED_ERRORS"""
+        return {'errors': self.errors[:MAX_REPORTED_ERRORS], 'error_count': len(self.errors)}
+
+
+class ValidatedBatch:
+    """
+    Reports that passed validation, as columns: float64 arrays (NaN for
+    missing) for numeric fields and object arrays holding a known class or
+    None for categorical fields. Fields the model does not read are dropped.
+    unseen maps a categorical field to a boolean mask of the rows whose
+    value was given but is not one of the classes (and became None); fields
+    without such values are left out.
+    """
+
+    __slots__ = ('columns', 'n_rows', 'unseen')
+
+    def __init__(self, columns, n_rows, unseen=None):
+        self.columns = columns
+        self.n_rows = n_rows
+        self.unseen = unseen or {}
+
+    def __len__(self):
+        return self.n_rows
+
+    def take(self, mask):
+        """The rows selected by a boolean mask"""
+        return ValidatedBatch(
+            {col: values[mask] for col, values in self.columns.items()}, int(mask.sum()),
+            {col: values[mask] for col, values in self.unseen.items()}
+        )
+
+    def rows(self, start, stop):
+        """Rows start to stop - 1, as views of the same arrays"""
+        stop = min(stop, self.n_rows)
+        return ValidatedBatch(
+            {col: values[start:stop] for col, values in self.columns.items()}, max(stop - start, 0),
+            {col: values[start:stop] for col, values in self.unseen.items()}
+        )
+
+
+def check_batch_body(body):
+    """
+    Check the shape of a batch request body, {"reports": [{...}, ...]} or
+    {"columns": [...], "data": {field: [...]}}, before anything is scored
+    Raises:
+        SchemaError
+    """
+    def invalid(field, message, row=None):
+        return {'row': row, 'field': field, 'message': message}
+
+    if not isinstance(body, Mapping) or ('reports' not in body and 'data' not in body):
+        raise SchemaError([invalid(None, 'No reports array or columnar data provided')])
+    if 'reports' in body:
+        reports = body['reports']
+        if not isinstance(reports, list):
+            raise SchemaError([invalid('reports', 'Must be an array of report objects')])
+        errors = [invalid('reports', 'Report must be a JSON object', row=i)
+                  for i, report in enumerate(reports) if not isinstance(report, Mapping)]
+    else:
+        data, columns = body['data'], body.get('columns')
+        if isinstance(data, np.ndarray):
+            errors = []
+        elif not isinstance(data, Mapping):
+            raise SchemaError([invalid('data', 'Must be an object mapping field names to arrays of values')])
+        else:
+            errors = [invalid(name, 'Column must be a list of values')
+                      for name, values in data.items() if not isinstance(values, (list, tuple))]
+        if columns is not None and (not isinstance(columns, list) or
+                                    not all(isinstance(name, str) for name in columns)):
+            errors.append(invalid('columns', 'Must be an array of field names'))
+    if errors:
+        raise SchemaError(errors)
+
+
+class InputSchema:
+    """
+    Expected raw input fields of one fitted model.
+
+    Numeric fields accept numbers, booleans and numeric strings; categorical
+    fields accept their encoder's classes, matched ignoring case and
+    surrounding whitespace. Missing values are left for the transformer to
+    impute, and unseen categories fall back to its default category, unless
+    strict is set, in which case both are errors. Fields the model does not
+    use are ignored, but a report must carry at least one expected field.
+    Each column is checked in one vectorized pass, with a per-value pass
+    only for columns that fail it.
+    """
+
+    def __init__(self, numeric_fields, categorical_fields):
+        self.numeric_fields = list(numeric_fields)
+        self.categorical_fields = {col: [str(c) for c in classes] for col, classes in categorical_fields.items()}
+        self._classes = {col: frozenset(classes) for col, classes in self.categorical_fields.items()}
+        self._lookup = {
+            col: {_normalize(c): c for c in classes} for col, classes in self.categorical_fields.items()
+        }
+
+    @classmethod
+    def from_transformer(cls, transformer):
+        return cls(
+            transformer.numeric_inputs_,
+            {col: encoder.classes_.tolist() for col, encoder in transformer.encoders_.items()}
+        )
+
+    @property
+    def fields(self):
+        return self.numeric_fields + list(self.categorical_fields)
+
+    def describe(self):
+        return {'numeric': self.numeric_fields, 'categorical': self.categorical_fields}
+
+    def validate(self, data, strict=False, partial=False):
+        """
+        Validate and coerce reports
+        Args:
+            data: a report dict, a list of report dicts, a DataFrame or a
+                  structured numpy array with named fields
+            strict: missing values and unseen categories are errors
+            partial: instead of raising, return only the valid rows
+        Returns:
+            a ValidatedBatch, or with partial=True a (ValidatedBatch of the
+            valid rows, errors) pair
+        Raises:
+            SchemaError listing every invalid field (unless partial)
+        """
+        if isinstance(data, dict):
+            data = [data]
+        if isinstance(data, (list, tuple)):
+            batch, errors = self._validate_records(data, strict)
+        else:
+            batch, errors = self._validate_columns(data, None, strict)
+        return self._result(batch, errors, partial)
+
+    def validate_columns(self, data, columns=None, strict=False, partial=False):
+        """
+        Validate a columnar batch: a mapping of field name -> list of
+        values, a DataFrame or a structured numpy array. If columns is
+        given, only those columns are read.
+        """
+        batch, errors = self._validate_columns(data, columns, strict)
+        return self._result(batch, errors, partial)
+
+    @staticmethod
+    def _result(batch, errors, partial):
+        if partial:
+            if errors:
+                bad = np.zeros(len(batch), dtype=bool)
+                bad[[e['row'] for e in errors]] = True
+                batch = batch.take(~bad)
+            return batch, errors
+        if errors:
+            raise SchemaError(errors)
+        return batch
+
+    def _validate_records(self, records, strict):
+        errors = []
+        rows = []
+        fields = self.fields
+        for i, record in enumerate(records):
+            if not isinstance(record, dict):
+                errors.append({'row': i, 'field': None, 'message': 'Report must be a JSON object'})
+                record = {}
+            elif not any(field in record for field in fields):
+                errors.append({'row': i, 'field': None, 'message': f'Report has none of the fields {fields}'})
+            rows.append(record)
+
+        columns, unseen = {}, {}
+        for field in self.numeric_fields:
+            columns[field] = self._numeric([row.get(field) for row in rows], field, strict, errors)
+        for field in self.categorical_fields:
+            columns[field] = self._categorical([row.get(field) for row in rows], field, strict, errors, unseen)
+        return ValidatedBatch(columns, len(rows), unseen), errors
+
+    def _validate_columns(self, data, columns, strict):
+        errors = []
+        if isinstance(data, np.ndarray):
+            names = data.dtype.names
+        elif isinstance(data, Mapping) or hasattr(data, 'columns'):
+            names = list(data.keys())
+        else:
+            names = None
+        if names is None:
+            raise SchemaError([{'row': None, 'field': None, 'message': 'Columnar data must have named fields'}])
+        present = [name for name in names if columns is None or name in columns]
+        if not any(name in present for name in self.fields):
+            raise SchemaError([{'row': None, 'field': None, 'message': f'Data has none of the fields {self.fields}'}])
+
+        def values(field):
+            column = data[field]
+            return column.to_numpy() if hasattr(column, 'to_numpy') else column
+
+        lengths = {}
+        for name in present:
+            column = values(name)
+            if isinstance(column, (str, bytes, Mapping)) or not hasattr(column, '__len__'):
+                errors.append({'row': None, 'field': name, 'message': 'Column must be a list of values'})
+            else:
+                lengths[name] = len(column)
+        n_rows = max(lengths.values(), default=0)
+        for name, length in lengths.items():
+            if length != n_rows:
+                errors.append({
+                    'row': None, 'field': name,
+                    'message': f'Column has {length} values, expected {n_rows}'
+                })
+        if errors:
+            raise SchemaError(errors)
+
+        result, unseen = {}, {}
+        for field in self.numeric_fields:
+            column = values(field) if field in lengths else [None] * n_rows
+            result[field] = self._numeric(column, field, strict, errors)
+        for field in self.categorical_fields:
+            column = values(field) if field in lengths else [None] * n_rows
+            result[field] = self._categorical(column, field, strict, errors, unseen)
+        return ValidatedBatch(result, n_rows, unseen), errors
+
+    def _numeric(self, values, field, strict, errors):
+        # Fast path: numbers, None and numeric strings convert in one call
+        try:
+            array = np.asarray(values, dtype=np.float64)
+            if array.ndim == 1 and np.isfinite(array[~np.isnan(array)]).all():
+                if strict and np.isnan(array).any():
+                    for i in np.flatnonzero(np.isnan(array)).tolist():
+                        errors.append({'row': i, 'field': field, 'message': 'Required field is missing'})
+                return array
+        except (TypeError, ValueError):
+            pass
+
+        array = np.empty(len(values), dtype=np.float64)
+        for i, value in enumerate(values):
+            message = None
+            if _is_missing(value):
+                array[i] = np.nan
+                if strict:
+                    message = 'Required field is missing'
+            elif isinstance(value, (bool, int, float, np.number, str)):
+                try:
+                    array[i] = float(value.strip() if isinstance(value, str) else value)
+                    if not math.isfinite(array[i]):
+                        message = 'Expected a finite number'
+                except ValueError:
+                    message = f'Expected a number, got {value!r}'
+            else:
+                message = f'Expected a number, got {type(value).__name__}'
+            if message:
+                array[i] = np.nan
+                errors.append({'row': i, 'field': field, 'message': message})
+        return array
+
+    def _categorical(self, values, field, strict, errors, unseen):
+        classes = self._classes[field]
+        # Fast path: every value is already one of the encoder's classes
+        try:
+            if classes.issuperset(values):
+                return np.asarray(values, dtype=object)
+        except TypeError:  # unhashable values
+            pass
+
+        lookup = self._lookup[field]
+        array = np.empty(len(values), dtype=object)
+        unknown = np.zeros(len(values), dtype=bool)
+        for i, value in enumerate(values):
+            message = None
+            if _is_missing(value):
+                array[i] = None
+                if strict:
+                    message = 'Required field is missing'
+            elif isinstance(value, (str, int, float, np.number)) and not isinstance(value, bool):
+                array[i] = lookup.get(_normalize(value))
+                if array[i] is None:
+                    unknown[i] = True
+                    if strict:
+                        message = f"Unknown category {value!r}, expected one of {self.categorical_fields[field]}"
+            else:
+                array[i] = None
+                message = f'Expected a string, got {type(value).__name__}'
+            if message:
+                errors.append({'row': i, 'field': field, 'message': message})
+        if unknown.any():
+            unseen[field] = unknown
+        return array
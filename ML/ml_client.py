@@ -0,0 +1,366 @@
+"""
+Python Client for the ML Service
+A synchronous client with a keep-alive connection pool, and an asyncio
+client that coalesces individual predict calls into /predict/batch
+requests. Both retry with backoff when the service answers 503.
+"""
+
+import asyncio
+import functools
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+DEFAULT_BASE_URL = 'http://localhost:5001'
+
+
+class MLServiceError(Exception):
+    """Error response from the ML service (or a failed report in a batch)"""
+
+    def __init__(self, message, status_code=None, payload=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.payload = payload
+
+
+def _query(top_k=None, explain=False, response_format=None):
+    params = {}
+    if top_k is not None:
+        params['top_k'] = int(top_k)
+    if explain:
+        params['explain'] = 'true'
+    if response_format:
+        params['format'] = response_format
+    return params
+
+
+def _columnar(data, columns=None):
+    """Columnar payload from a DataFrame or a mapping of column -> values"""
+    if hasattr(data, 'to_dict') and hasattr(data, 'columns'):
+        columns = columns or [str(col) for col in data.columns]
+        data = {col: data[col].tolist() for col in columns}
+    else:
+        columns = columns or list(data)
+        data = {col: list(data[col]) for col in columns}
+    return {'columns': columns, 'data': data}
+
+
+class MLServiceClient:
+    """
+    Synchronous ML service client.
+
+    Requests share one keep-alive connection pool (pool_size connections),
+    and a 503 (model loading, overload) is retried up to max_retries times
+    with exponential backoff, honouring Retry-After. Error responses raise
+    MLServiceError. The client is safe to share between threads.
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, timeout=30.0, pool_size=10,
+                 max_retries=3, backoff_factor=0.5, use_msgpack=False):
+        if use_msgpack and not HAS_MSGPACK:
+            raise ValueError('use_msgpack requires the msgpack package')
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.use_msgpack = use_msgpack
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            status=max_retries,
+            status_forcelist=[503],
+            allowed_methods=None,  # predictions are safe to repeat, so POST retries too
+            backoff_factor=backoff_factor,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _send(self, method, path, model_version=None, **kwargs):
+        headers = kwargs.pop('headers', {})
+        # The service drops work once this client would have given up on it
+        headers.setdefault('X-Request-Timeout-Ms', str(max(1, int(self.timeout * 1000))))
+        if model_version:
+            headers['X-Model-Version'] = model_version
+        response = self.session.request(
+            method, f'{self.base_url}{path}', headers=headers, timeout=self.timeout, **kwargs
+        )
+        if response.status_code >= 400:
+            try:
+                payload = response.json()
+            except ValueError:
+                payload = {'message': response.text}
+            raise MLServiceError(
+                payload.get('message', f'HTTP {response.status_code}'),
+                status_code=response.status_code, payload=payload
+            )
+        return response
+
+    def _request(self, method, path, model_version=None, **kwargs):
+        response = self._send(method, path, model_version=model_version, **kwargs)
+        try:
+            return response.json()
+        except ValueError:
+            return {'message': response.text}
+
+    def _stream(self, body, model_version=None, top_k=None, explain=False):
+        """Results of an NDJSON /predict/batch response, read line by line"""
+        response = self._send(
+            'POST', '/predict/batch', model_version=model_version, stream=True,
+            params=_query(top_k, explain, 'ndjson'), **body
+        )
+        with response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                result = json.loads(line)
+                if result.get('aborted'):
+                    raise MLServiceError(result.get('message', 'Batch aborted'), payload=result)
+                yield result
+
+    def health(self):
+        return self._request('GET', '/health')
+
+    def model_info(self, model_version=None):
+        return self._request('GET', '/model/info', model_version=model_version)
+
+    def models(self):
+        return self._request('GET', '/models')
+
+    def drift(self, model_version=None):
+        """Input drift of recent traffic against the model's training data"""
+        return self._request('GET', '/drift', model_version=model_version)
+
+    def predict(self, report, top_k=None, explain=False, model_version=None):
+        """Score one report; returns the service's prediction dict"""
+        result = self._request(
+            'POST', '/predict', model_version=model_version,
+            params=_query(top_k, explain), json=report
+        )
+        if result.get('status') == 'error':
+            raise MLServiceError(result.get('message', 'Prediction failed'), payload=result)
+        return result
+
+    def predict_batch(self, reports, top_k=None, explain=False, model_version=None,
+                      response_format='records'):
+        """
+        Score a list of report dicts in one request
+        Returns:
+            list of result dicts, or the matrix payload for response_format='matrix'
+        """
+        payload = self._request(
+            'POST', '/predict/batch', model_version=model_version,
+            params=_query(top_k, explain, response_format), json={'reports': list(reports)}
+        )
+        return payload if response_format == 'matrix' else payload['results']
+
+    def predict_columns(self, data, columns=None, top_k=None, explain=False,
+                        model_version=None, response_format='records'):
+        """
+        Score a columnar batch (a DataFrame or a mapping of column -> values),
+        sent as MessagePack when use_msgpack is set, else as JSON
+        """
+        body = _columnar(data, columns)
+        kwargs = {'json': body}
+        if self.use_msgpack:
+            kwargs = {
+                'data': msgpack.packb(body, use_bin_type=True),
+                'headers': {'Content-Type': 'application/msgpack'},
+            }
+        payload = self._request(
+            'POST', '/predict/batch', model_version=model_version,
+            params=_query(top_k, explain, response_format), **kwargs
+        )
+        return payload if response_format == 'matrix' else payload['results']
+
+    def stream_batch(self, reports, top_k=None, explain=False, model_version=None):
+        """
+        Score a list of report dicts in one streamed request, yielding each
+        result as soon as the service has scored its chunk. Raises
+        MLServiceError if the service aborts the batch part way.
+        """
+        return self._stream({'json': {'reports': list(reports)}}, model_version, top_k, explain)
+
+    def stream_columns(self, data, columns=None, top_k=None, explain=False, model_version=None):
+        """Like stream_batch(), for a columnar batch (see predict_columns())"""
+        body = _columnar(data, columns)
+        kwargs = {'json': body}
+        if self.use_msgpack:
+            kwargs = {
+                'data': msgpack.packb(body, use_bin_type=True),
+                'headers': {'Content-Type': 'application/msgpack'},
+            }
+        return self._stream(kwargs, model_version, top_k, explain)
+
+    def iter_predictions(self, reports, chunk_size=1000, **options):
+        """
+        Stream results for an iterable of reports of any length, one batch
+        request per chunk_size reports, so neither side holds the whole set
+        """
+        chunk = []
+        for report in reports:
+            chunk.append(report)
+            if len(chunk) == chunk_size:
+                yield from self.predict_batch(chunk, **options)
+                chunk = []
+        if chunk:
+            yield from self.predict_batch(chunk, **options)
+
+
+class AsyncMLServiceClient:
+    """
+    asyncio ML service client.
+
+    predict() calls made close together are coalesced: they queue for up to
+    max_delay seconds (or until max_batch_size reports are waiting) and are
+    then sent as one /predict/batch request, each caller receiving its own
+    result. Calls with different top_k / explain / model_version options
+    are batched separately. At most max_concurrency requests are in flight;
+    they run on a pooled MLServiceClient in worker threads, so 503 retries
+    and keep-alive behave as in the sync client. stream_batch() and
+    stream_columns() read NDJSON responses as async iterators.
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, max_concurrency=8, max_batch_size=256,
+                 max_delay=0.005, **client_options):
+        client_options.setdefault('pool_size', max_concurrency)
+        self.client = MLServiceClient(base_url, **client_options)
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='ml-client')
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._pending = {}
+        self._timers = {}
+        self._tasks = set()
+        self.stats = {'predict_calls': 0, 'batch_requests': 0}
+
+    async def close(self):
+        for key in list(self._pending):
+            self._flush(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+        self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _call(self, method, *args, **kwargs):
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(method, *args, **kwargs))
+
+    async def predict(self, report, top_k=None, explain=False, model_version=None):
+        """Score one report, batched with other concurrent predict() calls"""
+        loop = asyncio.get_running_loop()
+        key = (top_k, explain, model_version)
+        future = loop.create_future()
+        batch = self._pending.setdefault(key, [])
+        batch.append((report, future))
+        self.stats['predict_calls'] += 1
+
+        if len(batch) >= self.max_batch_size:
+            self._flush(key)
+        elif len(batch) == 1:
+            self._timers[key] = loop.call_later(self.max_delay, self._flush, key)
+        return await future
+
+    def _flush(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if batch:
+            task = asyncio.ensure_future(self._send(key, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, key, batch):
+        top_k, explain, model_version = key
+        self.stats['batch_requests'] += 1
+        try:
+            results = await self._call(
+                self.client.predict_batch, [report for report, _ in batch],
+                top_k=top_k, explain=explain, model_version=model_version
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if result.get('status') == 'error':
+                future.set_exception(MLServiceError(result.get('message', 'Prediction failed'), payload=result))
+            else:
+                future.set_result(result)
+
+    async def predict_batch(self, reports, **options):
+        """Send reports as one batch request, without coalescing"""
+        return await self._call(self.client.predict_batch, reports, **options)
+
+    async def predict_columns(self, data, columns=None, **options):
+        return await self._call(self.client.predict_columns, data, columns, **options)
+
+    async def _iterate(self, results):
+        """
+        Yield from a blocking result iterator, each step run in a worker
+        thread; the request holds a concurrency slot until it is read to
+        the end or the async iterator is closed
+        """
+        done = object()
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            try:
+                while True:
+                    result = await loop.run_in_executor(self._executor, next, results, done)
+                    if result is done:
+                        return
+                    yield result
+            finally:
+                # Closes the streamed response if the caller stopped early
+                await loop.run_in_executor(self._executor, results.close)
+
+    def stream_batch(self, reports, **options):
+        """
+        Async iterator over the results of one streamed (NDJSON) batch
+        request, each yielded as soon as the service has scored its chunk
+        (see MLServiceClient.stream_batch())
+        """
+        return self._iterate(self.client.stream_batch(reports, **options))
+
+    def stream_columns(self, data, columns=None, **options):
+        """Like stream_batch(), for a columnar batch"""
+        return self._iterate(self.client.stream_columns(data, columns, **options))
+
+    async def health(self):
+        return await self._call(self.client.health)
+
+    async def model_info(self, model_version=None):
+        return await self._call(self.client.model_info, model_version)
@@ -3,25 +3,106 @@ Flask service for ML model inference
 This service exposes the trained model via HTTP API for the Node.js backend to call
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, stream_with_context
 from flask_cors import CORS
-from predict import ReportPredictor
+from admission import (
+    AdmissionController, DeadlineExceeded, check_deadline, parse_deadline, reset_deadline, set_deadline
+)
+from inference_threads import InferencePolicy, limit_native_threads
+from input_schema import SchemaError, check_batch_body
+from model_registry import ModelRegistry
+from profiling import RequestProfiler
+from telemetry import thread_info
+from tenant_pool import TenantModelError, TenantModelPool
+import hmac
+import io
+import json
+import logging
 import os
+import time
+import numpy as np
 from dotenv import load_dotenv
 
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+NUMPY_MIMETYPES = ('application/x-npy', 'application/octet-stream')
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
 load_dotenv()
 
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
 app = Flask(__name__)
 CORS(app)
 
 # Initialize predictor
+# MODEL_VERSIONS ("name=dir,name=dir") loads several versions side by side;
+# otherwise MODEL_DIR is loaded as the single "default" version
 MODEL_DIR = os.getenv('MODEL_DIR', 'models')
+MODEL_VERSIONS = os.getenv('MODEL_VERSIONS', '')
+# float32 opts into the reduced-precision inference path (see benchmark.py float32)
+INFERENCE_DTYPE = os.getenv('INFERENCE_DTYPE', 'float64')
+# Strict input validation rejects reports with missing fields or unseen
+# categories; by default they are imputed as in training
+STRICT_INPUT_SCHEMA = os.getenv('STRICT_INPUT_SCHEMA', 'false').lower() in ('1', 'true', 'yes')
+# Drift monitoring counts validated inputs against the reference histograms
+# saved with each model; see GET /drift
+DRIFT_MONITORING = os.getenv('DRIFT_MONITORING', 'true').lower() in ('1', 'true', 'yes')
+DRIFT_WINDOW_ROWS = int(os.getenv('DRIFT_WINDOW_ROWS', 10000))
+# Largest chunk of a streamed (NDJSON) batch scored and sent at a time
+STREAM_CHUNK_ROWS = int(os.getenv('STREAM_CHUNK_ROWS', 1000))
+# Inference threading: requests score single-threaded; batches of at least
+# PARALLEL_THRESHOLD_ROWS are split over one shared pool of INFERENCE_WORKERS
+# threads. Native BLAS / OpenMP pools are capped at NATIVE_THREADS.
+native_threads = limit_native_threads(int(os.getenv('NATIVE_THREADS', 1)))
+inference_policy = InferencePolicy(
+    parallel_threshold=int(os.getenv('PARALLEL_THRESHOLD_ROWS', 1024)),
+    max_workers=int(os.getenv('INFERENCE_WORKERS', 0)) or None
+)
+PREDICTOR_OPTIONS = {
+    'inference_policy': inference_policy,
+    'dtype': INFERENCE_DTYPE,
+    'strict_schema': STRICT_INPUT_SCHEMA,
+    'monitor_drift': DRIFT_MONITORING,
+    'drift_window': DRIFT_WINDOW_ROWS,
+}
+registry = ModelRegistry(max_pending_shadow=int(os.getenv('SHADOW_MAX_PENDING', 64)))
 predictor = None
 
 try:
-    predictor = ReportPredictor(model_dir=MODEL_DIR)
+    if MODEL_VERSIONS:
+        for spec in MODEL_VERSIONS.split(','):
+            version, _, version_dir = spec.strip().partition('=')
+            registry.load(version, version_dir, **PREDICTOR_OPTIONS)
+    else:
+        registry.load('default', MODEL_DIR, **PREDICTOR_OPTIONS)
+    
+    registry.set_routing(
+        primary=os.getenv('PRIMARY_MODEL_VERSION') or None,
+        canary=os.getenv('CANARY_MODEL_VERSION') or None,
+        canary_percent=float(os.getenv('CANARY_PERCENT', 0)),
+        shadow=os.getenv('SHADOW_MODEL_VERSION') or None
+    )
+    predictor = registry.get(registry.primary)
+    
+    # Build the per-node explanation tables now rather than on the first ?explain=true request
+    if os.getenv('PRELOAD_EXPLAINER', 'true').lower() in ('1', 'true', 'yes'):
+        for version in registry.versions():
+            registry.get(version).bundle.explainer
     print("[OK] ML Service started successfully")
     print(f"[OK] Predictor initialized: {predictor is not None}")
+    print(f"[OK] Model versions loaded: {registry.versions()} (primary: {registry.primary})")
     if predictor.model is not None:
         print("[OK] Model is loaded and ready")
     else:
@@ -32,6 +113,186 @@ except Exception as e:
     traceback.print_exc()
     print("[WARNING] Service will start but predictions will fail until model is trained")
 
+# Per-hospital models (off by default): with TENANT_MODEL_ROOT set, a request
+# carrying "X-Hospital-Id: <id>" is scored by the model in
+# TENANT_MODEL_ROOT/<id>/ if there is one, else by the global model.
+# Hospital models are loaded on first use and evicted least recently used
+# first once their trees and explainer tables exceed TENANT_POOL_MAX_MB. A
+# failed load is retried after TENANT_POOL_RETRY_FAILED_SECONDS.
+TENANT_HEADER = 'X-Hospital-Id'
+TENANT_MODEL_ROOT = os.getenv('TENANT_MODEL_ROOT', '')
+tenant_pool = None
+if TENANT_MODEL_ROOT:
+    tenant_pool = TenantModelPool(
+        TENANT_MODEL_ROOT,
+        max_bytes=int(float(os.getenv('TENANT_POOL_MAX_MB', 512)) * 1024 ** 2),
+        max_models=int(os.getenv('TENANT_POOL_MAX_MODELS', 0)) or None,
+        retry_failed_after=float(os.getenv('TENANT_POOL_RETRY_FAILED_SECONDS', 60)),
+        **PREDICTOR_OPTIONS
+    )
+    print(f"[OK] Hospital models served from {TENANT_MODEL_ROOT}")
+
+# Admission control: prediction requests beyond MAX_IN_FLIGHT running ones,
+# or arriving while the latency average is above SHED_LATENCY_MS (0 = off),
+# get 503 with Retry-After. Callers may send X-Request-Deadline (Unix time)
+# or X-Request-Timeout-Ms; requests whose deadline has passed are dropped
+# with 504 on arrival, before preprocessing and before inference.
+admission = AdmissionController(
+    max_in_flight=int(os.getenv('MAX_IN_FLIGHT', 64)),
+    max_latency_ms=float(os.getenv('SHED_LATENCY_MS', 0))
+)
+
+@app.before_request
+def admit_request():
+    if not request.path.startswith('/predict'):
+        return None
+    try:
+        deadline = parse_deadline(request.headers)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    reason, start = admission.admit(deadline)
+    if reason == 'expired_on_arrival':
+        return jsonify({
+            'status': 'error',
+            'message': 'Request deadline exceeded before it was started'
+        }), 504
+    if reason is not None:
+        response = jsonify({
+            'status': 'error',
+            'message': 'Service overloaded, retry later',
+            'reason': reason
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(admission.retry_after())
+        return response
+    g.admitted_at = start
+    g.deadline_token = set_deadline(deadline)
+    return None
+
+@app.teardown_request
+def release_request(exc):
+    start = g.pop('admitted_at', None)
+    if start is not None:
+        admission.release(start)
+        reset_deadline(g.pop('deadline_token'))
+
+@app.errorhandler(DeadlineExceeded)
+def deadline_exceeded(e):
+    admission.expired(e.stage)
+    return jsonify({
+        'status': 'error',
+        'message': str(e)
+    }), 504
+
+# Request profiling (off by default): PROFILE_SAMPLE_EVERY=N profiles one
+# prediction request in N, PROFILE_ON_HEADER=true profiles requests sent
+# with "X-Profile: 1". Results are downloaded from /admin/profile, which
+# is only served when PROFILE_ADMIN_TOKEN is set.
+profiler = RequestProfiler(
+    sample_every=int(os.getenv('PROFILE_SAMPLE_EVERY', 0)),
+    allow_header=os.getenv('PROFILE_ON_HEADER', 'false').lower() in ('1', 'true', 'yes'),
+    mode=os.getenv('PROFILER_MODE', 'cprofile'),
+    interval_ms=float(os.getenv('PROFILE_INTERVAL_MS', 1.0))
+)
+PROFILE_ADMIN_TOKEN = os.getenv('PROFILE_ADMIN_TOKEN')
+
+# Hooks are only installed when profiling is on, so it costs nothing otherwise
+if profiler.enabled:
+    @app.before_request
+    def start_profile():
+        if request.path.startswith('/predict'):
+            g.profile = profiler.start(request.headers)
+    
+    @app.teardown_request
+    def stop_profile(exc):
+        profiler.stop(g.pop('profile', None))
+
+def _json_default(obj):
+    """Fallback serializer for numpy values when orjson is not installed"""
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(payload):
+    """Serialize a prediction payload, using orjson when it is available"""
+    if HAS_ORJSON:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, default=_json_default).encode()
+
+def json_response(payload, status=200):
+    return app.response_class(dumps(payload), status=status, mimetype='application/json')
+
+def ndjson_stream(chunks):
+    """
+    Send batches of results as newline-delimited JSON, one result per line,
+    each chunk as soon as it is scored. If scoring fails part way, a last
+    line {"status": "error", "aborted": true, "completed": n, ...} says how
+    many results were sent. A client disconnect stops the scoring.
+    """
+    completed = 0
+    try:
+        for results in chunks:
+            yield b''.join(dumps(result) + b'\n' for result in results)
+            completed += len(results)
+    except DeadlineExceeded as e:
+        admission.expired(e.stage)
+        yield dumps({'status': 'error', 'aborted': True, 'completed': completed, 'message': str(e)}) + b'\n'
+    except Exception as e:
+        yield dumps({'status': 'error', 'aborted': True, 'completed': completed, 'message': str(e)}) + b'\n'
+
+def response_options():
+    """
+    Parse response options from the query string:
+      ?top_k=N        only return the N most probable classes per report
+      ?format=matrix  (batch only) send the class list once and a
+                      column-indexed probability matrix
+      ?format=ndjson  (batch only) stream one result per line as chunks
+                      are scored; also chosen by "Accept: application/x-ndjson"
+      ?explain=true   add per-feature contributions to the predicted class
+    """
+    top_k = request.args.get('top_k')
+    if top_k is not None:
+        if not top_k.isdigit() or int(top_k) < 1:
+            raise ValueError('top_k must be a positive integer')
+        top_k = int(top_k)
+    
+    response_format = request.args.get('format')
+    if response_format is None:
+        response_format = 'ndjson' if request.accept_mimetypes.best == NDJSON_MIMETYPE else 'records'
+    if response_format not in ('records', 'matrix', 'ndjson'):
+        raise ValueError("format must be 'records', 'matrix' or 'ndjson'")
+    
+    explain = request.args.get('explain', 'false').lower() in ('1', 'true', 'yes')
+    
+    return top_k, response_format, explain
+
+def route_request():
+    """
+    Pick the model version for this request: the X-Model-Version header if
+    present, then the hospital's own model for X-Hospital-Id if it has one,
+    otherwise the registry's canary / primary traffic split
+    """
+    requested = request.headers.get('X-Model-Version')
+    hospital_id = request.headers.get(TENANT_HEADER)
+    if hospital_id and not requested and tenant_pool is not None:
+        model = tenant_pool.get(hospital_id)
+        if model is not None:
+            return f'hospital/{hospital_id}', model
+    return registry.route(requested)
+
+def model_response(payload, version, score, result, seconds):
+    """Send a prediction response and hand the request to the shadow model"""
+    # Shadow scoring compares registry versions; hospital models are not compared
+    if not version.startswith('hospital/'):
+        registry.submit_shadow(score, version, result, seconds)
+    response = json_response(payload)
+    response.headers['X-Model-Version'] = version
+    return response
+
 @app.route('/', methods=['GET'])
 def root():
     """Root endpoint - provides service information"""
@@ -43,7 +304,10 @@ def root():
             'health': '/health',
             'predict': '/predict (POST)',
             'batch_predict': '/predict/batch (POST)',
-            'model_info': '/model/info (GET)'
+            'model_info': '/model/info (GET)',
+            'models': '/models (GET)',
+            'drift': '/drift (GET, DELETE)',
+            'admin_profile': '/admin/profile (GET, DELETE)'
         },
         'model_loaded': predictor is not None
     })
@@ -53,7 +317,8 @@ def health():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
-        'model_loaded': predictor is not None
+        'model_loaded': predictor is not None,
+        'admission': admission.describe()
     })
 
 @app.route('/predict', methods=['POST'])
@@ -67,6 +332,25 @@ def predict():
             'message': 'Model not loaded. Please train the model first.'
         }), 500
     
+    try:
+        top_k, _, explain = response_options()
+        version, model = route_request()
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except KeyError as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Unknown model version: {e}'
+        }), 404
+    except TenantModelError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+    
     try:
         data = request.get_json()
         
@@ -75,21 +359,65 @@ def predict():
                 'status': 'error',
                 'message': 'No data provided'
             }), 400
+        if not isinstance(data, dict):
+            return jsonify({
+                'status': 'error',
+                'message': 'Expected a JSON object with one report (use /predict/batch for lists)'
+            }), 400
+        
+        # Drop work the caller has given up on, and reject malformed reports,
+        # before any preprocessing
+        check_deadline('preprocess')
+        try:
+            report = model.validate(data)
+        except SchemaError as e:
+            return jsonify(dict(e.to_dict(), status='error', message=str(e))), 400
         
         # Make prediction
-        result = predictor.predict(data)
+        start = time.perf_counter()
+        result = model.predict(report, top_k=top_k, explain=explain)
+        seconds = time.perf_counter() - start
         
-        return jsonify(result)
+        return model_response(
+            result, version, lambda shadow: shadow.predict(data, top_k=top_k), result, seconds
+        )
         
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         return jsonify({
             'status': 'error',
             'message': str(e)
         }), 500
 
+def read_batch_payload():
+    """
+    Decode a batch request body.
+    JSON and MessagePack bodies decode to a dict; a NumPy .npy body must be
+    a structured array whose field names are the feature names.
+    """
+    if request.mimetype in MSGPACK_MIMETYPES:
+        if not HAS_MSGPACK:
+            raise ValueError('MessagePack bodies require the msgpack package')
+        return msgpack.unpackb(request.get_data(), raw=False)
+    
+    if request.mimetype in NUMPY_MIMETYPES:
+        array = np.load(io.BytesIO(request.get_data()), allow_pickle=False)
+        if array.dtype.names is None:
+            raise ValueError('NumPy body must be a structured array with named fields')
+        return {'data': array}
+    
+    return request.get_json(silent=True)
+
 @app.route('/predict/batch', methods=['POST'])
 def predict_batch():
-    """Batch prediction endpoint"""
+    """
+    Batch prediction endpoint
+    Accepts either row records {"reports": [{...}, ...]} or a columnar
+    batch {"columns": [...], "data": {"Age": [...], ...}}
+    With ?format=ndjson the results are streamed in chunks of up to
+    STREAM_CHUNK_ROWS rows instead of sent as one JSON body
+    """
     if predictor is None:
         return jsonify({
             'status': 'error',
@@ -97,28 +425,108 @@ def predict_batch():
         }), 500
     
     try:
-        data = request.get_json()
+        top_k, response_format, explain = response_options()
+        version, model = route_request()
+        data = read_batch_payload()
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except KeyError as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Unknown model version: {e}'
+        }), 404
+    except TenantModelError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+    
+    try:
+        # Reject a body of the wrong shape before scoring (or streaming) starts
+        try:
+            check_batch_body(data)
+        except SchemaError as e:
+            return jsonify(dict(e.to_dict(), status='error', message=str(e))), 400
         
-        if not data or 'reports' not in data:
+        if 'reports' in data:
+            reports = data['reports']
+            if response_format == 'matrix':
+                def score(m, explain=False):
+                    return m.predict_matrix(m.validate(reports), explain=explain)
+            else:
+                # Make batch predictions
+                def score(m, explain=False):
+                    return m.predict_batch(reports, top_k=top_k, explain=explain)
+        else:
+            columns = data.get('columns')
+            if response_format == 'matrix':
+                def score(m, explain=False):
+                    return m.predict_matrix(m.validate_columns(data['data'], columns), explain=explain)
+            else:
+                def score(m, explain=False):
+                    return m.predict_columns(data['data'], columns=columns, top_k=top_k, explain=explain)
+        
+        check_deadline('preprocess')
+        if response_format == 'ndjson':
+            return stream_batch(model, version, data, top_k, explain)
+        start = time.perf_counter()
+        try:
+            result = score(model, explain)
+        except SchemaError as e:
+            return jsonify(dict(e.to_dict(), status='error', message=f'Invalid batch: {e}')), 400
+        except ValueError as e:
             return jsonify({
                 'status': 'error',
-                'message': 'No reports array provided'
+                'message': f'Invalid batch: {e}'
             }), 400
+        seconds = time.perf_counter() - start
         
-        # Make batch predictions
-        results = predictor.predict_batch(data['reports'])
-        
-        return jsonify({
-            'status': 'success',
-            'results': results
-        })
+        if response_format == 'matrix':
+            payload = dict(result, status='success')
+        else:
+            payload = {
+                'status': 'success',
+                'results': result
+            }
+        return model_response(payload, version, score, result, seconds)
         
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         return jsonify({
             'status': 'error',
             'message': str(e)
         }), 500
 
+def stream_batch(model, version, data, top_k, explain):
+    """
+    NDJSON response for /predict/batch. Only one chunk of results is held
+    at a time. A columnar batch is validated as a whole before the response
+    starts, so invalid input still gets a 400; invalid reports get an error
+    line each, as in a records response. Streamed batches are not shadow
+    scored.
+    """
+    if 'reports' in data:
+        chunks = model.iter_batch(data['reports'], chunk_rows=STREAM_CHUNK_ROWS, top_k=top_k, explain=explain)
+    else:
+        try:
+            chunks = model.iter_columns(data['data'], columns=data.get('columns'),
+                                        chunk_rows=STREAM_CHUNK_ROWS, top_k=top_k, explain=explain)
+        except SchemaError as e:
+            return jsonify(dict(e.to_dict(), status='error', message=f'Invalid batch: {e}')), 400
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': f'Invalid batch: {e}'
+            }), 400
+    
+    response = app.response_class(stream_with_context(ndjson_stream(chunks)), mimetype=NDJSON_MIMETYPE)
+    response.headers['X-Model-Version'] = version
+    return response
+
 @app.route('/model/info', methods=['GET'])
 def model_info():
     """Get model metadata and information"""
@@ -129,36 +537,22 @@ def model_info():
         }), 500
     
     try:
-        import json
-        import os
-        
-        metadata_path = os.path.join(MODEL_DIR, 'model_metadata.json')
-        if os.path.exists(metadata_path):
-            with open(metadata_path, 'r') as f:
-                metadata = json.load(f)
-        else:
-            metadata = {}
+        version = request.headers.get('X-Model-Version') or registry.primary
+        model = registry.get(version)
         
-        # Get feature importance if available
-        feature_importance = {}
-        if hasattr(predictor.model, 'feature_importances_'):
-            feature_importance = dict(zip(
-                predictor.feature_names,
-                predictor.model.feature_importances_.tolist()
-            ))
-            # Sort by importance
-            feature_importance = dict(sorted(
-                feature_importance.items(),
-                key=lambda x: x[1],
-                reverse=True
-            ))
+        # Metadata and sorted importances are held in memory by the predictor
+        metadata = model.metadata
+        feature_importance = model.feature_importance
         
-        return jsonify({
+        return json_response({
             'status': 'success',
             'model_loaded': True,
             'metadata': metadata,
+            'version': version,
+            'manifest': model.bundle.manifest,
             'feature_importance': feature_importance,
-            'n_features': len(predictor.feature_names) if predictor.feature_names else 0
+            'input_schema': model.schema.describe(),
+            'n_features': len(model.feature_names) if model.feature_names else 0
         })
         
     except Exception as e:
@@ -167,6 +561,118 @@ def model_info():
             'message': str(e)
         }), 500
 
+@app.route('/models', methods=['GET'])
+def models():
+    """
+    Loaded model versions, their memory use, routing and shadow comparison
+    stats, plus the hospital model pool (models, bytes, hits, loads,
+    evictions) when it is enabled
+    """
+    payload = registry.describe()
+    payload['inference'] = dict(inference_policy.describe(), threads=thread_info())
+    if tenant_pool is not None:
+        payload['hospital_models'] = tenant_pool.describe()
+    return jsonify(dict(payload, status='success'))
+
+@app.route('/drift', methods=['GET', 'DELETE'])
+def drift():
+    """
+    Input drift of recent traffic against the model's training data: per
+    field PSI, binned KS and missing rates (X-Model-Version or
+    X-Hospital-Id pick the model, default primary). DELETE starts a fresh window.
+    """
+    try:
+        version = request.headers.get('X-Model-Version') or registry.primary
+        hospital_id = request.headers.get(TENANT_HEADER)
+        model = None
+        if hospital_id and tenant_pool is not None:
+            model = tenant_pool.get(hospital_id)
+            version = f'hospital/{hospital_id}' if model is not None else version
+        model = model or registry.get(version)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except KeyError as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Unknown model version: {e}'
+        }), 404
+    except TenantModelError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+    
+    if model.drift is None:
+        reason = ('it was trained without a drift reference' if DRIFT_MONITORING
+                  else 'DRIFT_MONITORING is off')
+        return jsonify({
+            'status': 'error',
+            'message': f'Drift monitoring is unavailable for model {version}: {reason}'
+        }), 404
+    
+    if request.method == 'DELETE':
+        model.drift.reset()
+    return json_response(dict(model.drift.report(), status='success', version=version))
+
+@app.route('/admin/profile', methods=['GET', 'DELETE'])
+def admin_profile():
+    """
+    Download the aggregated request profile (?format=pstats|collapsed|text),
+    or reset it with DELETE. Disabled unless PROFILE_ADMIN_TOKEN is set;
+    callers send it as X-Admin-Token.
+    """
+    if not PROFILE_ADMIN_TOKEN:
+        return jsonify({
+            'status': 'error',
+            'message': 'Profile endpoint is disabled. Set PROFILE_ADMIN_TOKEN.'
+        }), 404
+    token = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(token.encode('utf-8'), PROFILE_ADMIN_TOKEN.encode('utf-8')):
+        return jsonify({
+            'status': 'error',
+            'message': 'Invalid admin token'
+        }), 403
+    if not profiler.enabled:
+        return jsonify({
+            'status': 'error',
+            'message': 'Profiling is disabled. Set PROFILE_SAMPLE_EVERY or PROFILE_ON_HEADER.'
+        }), 404
+    
+    if request.method == 'DELETE':
+        profiler.reset()
+        return jsonify({'status': 'success', 'profiler': profiler.describe()})
+    
+    profile_format = request.args.get('format', 'pstats')
+    if profile_format == 'pstats':
+        body = profiler.pstats_bytes()
+        if body is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'No requests profiled yet (pstats needs PROFILER_MODE=cprofile)'
+            }), 404
+        response = app.response_class(body, mimetype='application/octet-stream')
+        response.headers['Content-Disposition'] = 'attachment; filename=ml_service.pstats'
+        return response
+    if profile_format == 'collapsed':
+        try:
+            return app.response_class(profiler.collapsed(), mimetype='text/plain')
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+    if profile_format == 'text':
+        return app.response_class(profiler.text(), mimetype='text/plain')
+    if profile_format == 'summary':
+        return jsonify({'status': 'success', 'profiler': profiler.describe()})
+    return jsonify({
+        'status': 'error',
+        'message': "format must be 'pstats', 'collapsed', 'text' or 'summary'"
+    }), 400
+
 if __name__ == '__main__':
     port = int(os.getenv('ML_SERVICE_PORT', 5001))
     app.run(host='0.0.0.0', port=port, debug=False)
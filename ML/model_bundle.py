@@ -0,0 +1,240 @@
+"""
+Versioned Model Bundle
+A trained model, its feature transformer, label encoders and metadata in a
+single zip file with a manifest, SHA-256 checksums and a schema version
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import tempfile
+import zipfile
+from datetime import datetime
+from functools import cached_property
+
+import joblib
+
+from explain import TreeContributionExplainer
+from features import load_feature_transformer
+from input_schema import InputSchema
+
+BUNDLE_FILE = 'patient_report_model.bundle'
+BUNDLE_FORMAT = 'healthbridge-model-bundle'
+BUNDLE_SCHEMA_VERSION = 1
+
+MANIFEST_MEMBER = 'manifest.json'
+MODEL_MEMBER = 'model.joblib'
+TRANSFORMER_MEMBER = 'feature_transformer.joblib'
+ENCODERS_MEMBER = 'label_encoders.joblib'
+METADATA_MEMBER = 'metadata.json'
+
+
+def _dump(obj):
+    buffer = io.BytesIO()
+    joblib.dump(obj, buffer)
+    return buffer.getvalue()
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def serialize_payload(model, transformer, label_encoders):
+    """The pickled model, transformer and label encoders, by bundle member name"""
+    return {
+        MODEL_MEMBER: _dump(model),
+        TRANSFORMER_MEMBER: _dump(transformer),
+        ENCODERS_MEMBER: _dump(label_encoders),
+    }
+
+
+def write_bundle(path, model, transformer, label_encoders, metadata):
+    """Serialize a model with its transformer and encoders and write it as a bundle"""
+    return write_bundle_members(path, serialize_payload(model, transformer, label_encoders), metadata)
+
+
+def write_bundle_members(path, payload, metadata):
+    """
+    Write a model bundle from a serialize_payload() result and the metadata,
+    atomically: the archive is built in a temporary file in the same
+    directory and renamed over path once complete, so readers only ever see
+    the old bundle or the new one
+    """
+    members = dict(payload)
+    members[METADATA_MEMBER] = json.dumps(metadata, indent=2).encode('utf-8')
+    files = {name: {'sha256': _sha256(data), 'size': len(data)} for name, data in members.items()}
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'schema_version': BUNDLE_SCHEMA_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'bundle_id': _sha256(''.join(f['sha256'] for f in files.values()).encode('ascii'))[:12],
+        'files': files,
+    }
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.bundle-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            # Stored, not deflated: joblib payloads load faster uncompressed
+            with zipfile.ZipFile(f, 'w', compression=zipfile.ZIP_STORED) as archive:
+                archive.writestr(MANIFEST_MEMBER, json.dumps(manifest, indent=2))
+                for name, data in members.items():
+                    archive.writestr(name, data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return manifest
+
+
+class ModelBundle:
+    """
+    A loaded model with everything needed to score reports.
+    Metadata is parsed once at load; derived views such as the sorted
+    feature importance are computed on first use and then kept in memory.
+    """
+
+    def __init__(self, model, transformer, label_encoders, metadata, manifest=None, path=None):
+        self.model = model
+        self.transformer = transformer
+        self.label_encoders = label_encoders
+        self.metadata = metadata
+        self.manifest = manifest or {}
+        self.path = path
+
+    @property
+    def feature_names(self):
+        return list(self.transformer.feature_names_)
+
+    @property
+    def bundle_id(self):
+        return self.manifest.get('bundle_id')
+
+    @cached_property
+    def classes(self):
+        """Class names in predict_proba column order"""
+        if 'target' in self.label_encoders:
+            return [str(cls) for cls in self.label_encoders['target'].classes_]
+        return [f"Class_{i}" for i in range(len(self.model.classes_))]
+
+    @cached_property
+    def feature_importance(self):
+        """Feature importances sorted from most to least important"""
+        if not hasattr(self.model, 'feature_importances_'):
+            return {}
+        importance = dict(zip(self.feature_names, self.model.feature_importances_.tolist()))
+        return dict(sorted(importance.items(), key=lambda x: x[1], reverse=True))
+
+    @cached_property
+    def schema(self):
+        """Validator for raw input reports, compiled from the transformer once"""
+        return InputSchema.from_transformer(self.transformer)
+
+    @cached_property
+    def explainer(self):
+        """Per-node contribution tables, built on first use and kept for this model"""
+        return TreeContributionExplainer(self.model)
+
+    @property
+    def loaded_bytes(self):
+        """Tree arrays plus the explainer tables, once they have been built"""
+        explainer = self.__dict__.get('explainer')
+        return self.memory_bytes + (explainer.memory_bytes if explainer is not None else 0)
+
+    @cached_property
+    def memory_bytes(self):
+        """Approximate in-memory size of the model's tree arrays"""
+        total = 0
+        for estimator in getattr(self.model, 'estimators_', [self.model]):
+            tree = getattr(estimator, 'tree_', None)
+            if tree is not None:
+                state = tree.__getstate__()
+                total += state['nodes'].nbytes + state['values'].nbytes
+        return total
+
+    @classmethod
+    def load(cls, path):
+        """Load a bundle file, verifying its schema version and checksums"""
+        with zipfile.ZipFile(path, 'r') as archive:
+            manifest = json.loads(archive.read(MANIFEST_MEMBER))
+            if manifest.get('format') != BUNDLE_FORMAT:
+                raise ValueError(f"{path} is not a model bundle")
+            if manifest.get('schema_version', 0) > BUNDLE_SCHEMA_VERSION:
+                raise ValueError(
+                    f"Bundle schema version {manifest['schema_version']} is newer than "
+                    f"supported version {BUNDLE_SCHEMA_VERSION}"
+                )
+
+            members = {}
+            for name, expected in manifest['files'].items():
+                data = archive.read(name)
+                if _sha256(data) != expected['sha256']:
+                    raise ValueError(f"Checksum mismatch for {name} in {path}")
+                members[name] = data
+
+        return cls(
+            model=joblib.load(io.BytesIO(members[MODEL_MEMBER])),
+            transformer=joblib.load(io.BytesIO(members[TRANSFORMER_MEMBER])),
+            label_encoders=joblib.load(io.BytesIO(members[ENCODERS_MEMBER])),
+            metadata=json.loads(members[METADATA_MEMBER]),
+            manifest=manifest,
+            path=path,
+        )
+
+    @classmethod
+    def load_legacy(cls, model_dir):
+        """Load a model saved as separate files before bundles existed"""
+        model_path = os.path.join(model_dir, 'patient_report_model.joblib')
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model file not found: {model_path}")
+
+        metadata = {}
+        metadata_path = os.path.join(model_dir, 'model_metadata.json')
+        if os.path.exists(metadata_path):
+            with open(metadata_path, 'r') as f:
+                metadata = json.load(f)
+
+        return cls(
+            model=joblib.load(model_path),
+            transformer=load_feature_transformer(
+                model_dir, metadata.get('feature_names', []), metadata.get('fill_values')
+            ),
+            label_encoders=joblib.load(os.path.join(model_dir, 'label_encoders.joblib')),
+            metadata=metadata,
+            path=model_dir,
+        )
+
+
+def load_model_dir(model_dir):
+    """Load the bundle in model_dir, or the legacy separate files if there is none"""
+    bundle_path = os.path.join(model_dir, BUNDLE_FILE)
+    if os.path.exists(bundle_path):
+        return ModelBundle.load(bundle_path)
+    return ModelBundle.load_legacy(model_dir)
+
+
+def main():
+    """Verify a bundle and print its manifest and metadata"""
+    parser = argparse.ArgumentParser(description='Inspect a model bundle')
+    parser.add_argument('path', type=str, help='Bundle file or model directory')
+    args = parser.parse_args()
+
+    path = args.path
+    if os.path.isdir(path):
+        path = os.path.join(path, BUNDLE_FILE)
+
+    bundle = ModelBundle.load(path)
+    print(f"[OK] Bundle verified: {path}")
+    print(json.dumps({'manifest': bundle.manifest, 'metadata': bundle.metadata}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""
+Model Registry
+Holds several ReportPredictor versions in memory, routes requests between
+them and scores a shadow version in the background for comparison
+"""
+
+import copy
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from predict import ReportPredictor
+
+logger = logging.getLogger(__name__)
+
+
+def _predictions(output):
+    """Predicted labels from a predict / predict_batch / predict_matrix result"""
+    if isinstance(output, list):
+        return [result.get('prediction') for result in output]
+    if 'predictions' in output:
+        return list(output['predictions'])
+    return [output.get('prediction')]
+
+
+class ModelRegistry:
+    """
+    Loaded model versions plus the routing policy between them.
+
+    Requests go to the version named in the request if there is one,
+    otherwise to the canary for canary_percent of traffic, otherwise to the
+    primary. If a shadow version is set, each request is re-scored by it on
+    a background thread after the primary has answered; predictions and
+    latency are compared and logged, never returned.
+    """
+
+    def __init__(self, max_pending_shadow=64):
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.primary = None
+        self.canary = None
+        self.canary_percent = 0.0
+        self.shadow = None
+
+        # Shadow work is bounded: when the shadow falls behind, requests
+        # are dropped from comparison instead of queueing without limit
+        self.max_pending_shadow = max_pending_shadow
+        self._pending_shadow = 0
+        self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shadow-model')
+        self.shadow_stats = {
+            'compared': 0,
+            'agreed': 0,
+            'dropped': 0,
+            'errors': 0,
+            'primary_seconds': 0.0,
+            'shadow_seconds': 0.0,
+        }
+
+    def load(self, version, model_dir, **predictor_options):
+        """Load model_dir as version; the first version loaded becomes primary"""
+        predictor = ReportPredictor(model_dir=model_dir, **predictor_options)
+        # Shadow scoring goes through a copy without the drift monitor, so
+        # mirrored traffic is not reported as traffic this version served
+        shadow_predictor = copy.copy(predictor)
+        shadow_predictor.drift = None
+        with self._lock:
+            self._versions[version] = {
+                'predictor': predictor,
+                'shadow_predictor': shadow_predictor,
+                'model_dir': model_dir,
+                'loaded_at': datetime.now().isoformat(),
+            }
+            if self.primary is None:
+                self.primary = version
+        logger.info(f"Model version {version} loaded from {model_dir}")
+        return predictor
+
+    def unload(self, version):
+        """Drop a version from memory; the primary cannot be unloaded"""
+        with self._lock:
+            if version == self.primary:
+                raise ValueError(f"Cannot unload primary model version {version}")
+            self._versions.pop(version)
+            if self.canary == version:
+                self.canary, self.canary_percent = None, 0.0
+            if self.shadow == version:
+                self.shadow = None
+
+    def get(self, version):
+        """ReportPredictor for a loaded version (KeyError if not loaded)"""
+        return self._versions[version]['predictor']
+
+    def versions(self):
+        return list(self._versions)
+
+    def set_routing(self, primary=None, canary=None, canary_percent=0.0, shadow=None):
+        """Set the primary, canary (with its traffic share) and shadow versions"""
+        for version in (primary, canary, shadow):
+            if version is not None and version not in self._versions:
+                raise KeyError(f"Model version {version} is not loaded")
+        if not 0.0 <= canary_percent <= 100.0:
+            raise ValueError('canary_percent must be between 0 and 100')
+
+        with self._lock:
+            self.primary = primary or self.primary
+            self.canary = canary
+            self.canary_percent = float(canary_percent) if canary else 0.0
+            self.shadow = shadow
+
+    def route(self, requested_version=None):
+        """
+        Pick the version for one request
+        Returns:
+            (version, ReportPredictor)
+        """
+        if requested_version:
+            return requested_version, self.get(requested_version)
+        if self.canary and random.random() * 100.0 < self.canary_percent:
+            return self.canary, self.get(self.canary)
+        return self.primary, self.get(self.primary)
+
+    def submit_shadow(self, score, version, output, seconds):
+        """
+        Re-score a request with the shadow version in the background
+        Args:
+            score: callable taking a ReportPredictor and returning its output
+            version: version that produced the primary output
+            output: primary output, compared against the shadow's
+            seconds: primary scoring latency
+        """
+        shadow = self.shadow
+        if shadow is None or shadow == version:
+            return
+
+        with self._lock:
+            if self._pending_shadow >= self.max_pending_shadow:
+                self.shadow_stats['dropped'] += 1
+                return
+            self._pending_shadow += 1
+
+        self._shadow_executor.submit(self._run_shadow, score, shadow, version, output, seconds)
+
+    def _run_shadow(self, score, shadow, version, output, seconds):
+        try:
+            start = time.perf_counter()
+            shadow_output = score(self._versions[shadow]['shadow_predictor'])
+            shadow_seconds = time.perf_counter() - start
+
+            primary_labels = _predictions(output)
+            shadow_labels = _predictions(shadow_output)
+            agreed = sum(a == b for a, b in zip(primary_labels, shadow_labels))
+
+            with self._lock:
+                self.shadow_stats['compared'] += len(primary_labels)
+                self.shadow_stats['agreed'] += agreed
+                self.shadow_stats['primary_seconds'] += seconds
+                self.shadow_stats['shadow_seconds'] += shadow_seconds
+
+            logger.info(
+                f"Shadow comparison: primary={version} shadow={shadow} "
+                f"reports={len(primary_labels)} agreed={agreed} "
+                f"primary_ms={seconds * 1000:.2f} shadow_ms={shadow_seconds * 1000:.2f}"
+            )
+        except Exception as e:
+            with self._lock:
+                self.shadow_stats['errors'] += 1
+            logger.warning(f"Shadow scoring with {shadow} failed: {e}")
+        finally:
+            with self._lock:
+                self._pending_shadow -= 1
+
+    def describe(self):
+        """Loaded versions (with memory use) and the current routing"""
+        with self._lock:
+            versions = {
+                version: {
+                    'model_dir': entry['model_dir'],
+                    'bundle_id': entry['predictor'].bundle.bundle_id,
+                    'loaded_at': entry['loaded_at'],
+                    'memory_bytes': entry['predictor'].bundle.memory_bytes,
+                }
+                for version, entry in self._versions.items()
+            }
+            stats = dict(self.shadow_stats)
+
+        if stats['compared']:
+            stats['agreement'] = stats['agreed'] / stats['compared']
+        return {
+            'versions': versions,
+            'routing': {
+                'primary': self.primary,
+                'canary': self.canary,
+                'canary_percent': self.canary_percent,
+                'shadow': self.shadow,
+            },
+            'shadow_stats': stats,
+        }
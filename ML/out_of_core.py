@@ -0,0 +1,258 @@
+"""
+Out-of-Core Training Data Preparation
+Fits the feature transformer from streaming statistics and builds the
+scaled training matrix in chunks into memory-mapped files, so datasets
+larger than RAM can be trained with bounded memory
+"""
+
+import logging
+import math
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder, RobustScaler
+
+from drift import EDGE_QUANTILES, DriftProfile, bin_edges
+from features import ENGINEERED_FEATURES, PatientFeatureTransformer, engineer_features
+
+logger = logging.getLogger(__name__)
+
+# Rough in-memory cost of one CSV cell while a chunk is parsed and
+# transformed (pandas objects, string columns, temporary arrays)
+BYTES_PER_CELL = 96
+
+
+class QuantileSketch:
+    """
+    KLL-style mergeable quantile sketch.
+
+    Values are kept in compactors; an item at level h stands for 2**h
+    inputs. A full compactor is sorted and every other item is promoted
+    (from a random offset), so memory stays O(k) however many values are
+    added, and two sketches over different chunks merge into one.
+    """
+
+    def __init__(self, k=2048, seed=0):
+        self.k = k
+        self.compactors = [np.empty(0)]
+        self.count = 0
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+    def update(self, values):
+        """Add an array of values (NaNs are ignored)"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+        self.compactors[0] = np.concatenate([self.compactors[0], values])
+        self._compress()
+
+    def merge(self, other):
+        """Fold another sketch into this one"""
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append(np.empty(0))
+        for level, items in enumerate(other.compactors):
+            self.compactors[level] = np.concatenate([self.compactors[level], items])
+        self.count += other.count
+        self._compress()
+
+    def _compress(self):
+        level = 0
+        while level < len(self.compactors):
+            items = self.compactors[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append(np.empty(0))
+                items = np.sort(items)
+                offset = int(self._rng.integers(2))
+                # An odd item out stays at this level
+                keep = items[-1:] if len(items) % 2 else items[:0]
+                paired = items[:len(items) - len(keep)]
+                self.compactors[level + 1] = np.concatenate([self.compactors[level + 1], paired[offset::2]])
+                self.compactors[level] = keep
+            level += 1
+
+    def quantiles(self, qs):
+        """Approximate quantiles (linear interpolation, like np.quantile)"""
+        if self.count == 0:
+            return np.full(len(qs), np.nan)
+        items = np.concatenate(self.compactors)
+        weights = np.concatenate([
+            np.full(len(c), 2.0 ** level) for level, c in enumerate(self.compactors)
+        ])
+        order = np.argsort(items, kind='stable')
+        items, weights = items[order], weights[order]
+        # Compaction preserves total weight, so each item's estimated rank
+        # in the full sorted input is the middle of its weight span
+        positions = np.cumsum(weights) - (weights + 1) / 2.0
+        return np.interp(np.asarray(qs) * (self.count - 1), positions, items)
+
+
+def chunk_rows(csv_path, memory_budget_mb):
+    """Rows per CSV chunk so one chunk and its transforms fit the budget"""
+    n_columns = len(pd.read_csv(csv_path, nrows=1).columns)
+    budget = memory_budget_mb * 1024 * 1024
+    # Half the budget goes to the chunk, the rest to sketches and the model
+    return max(1000, int(budget / 2 / (n_columns * BYTES_PER_CELL)))
+
+
+def _read_chunks(csv_path, rows):
+    return pd.read_csv(csv_path, chunksize=rows)
+
+
+def fit_streaming_transformer(csv_path, target_column, rows, sketch_k=2048):
+    """
+    Fit a PatientFeatureTransformer and target encoder without loading
+    the dataset: one streaming pass collects raw quantile sketches, row
+    count and category / target vocabularies; a second pass sketches the
+    engineered features (which need the outlier bounds from the first) and
+    counts the raw input histograms saved as the drift reference
+    """
+    raw_sketches, categories, targets = {}, {}, {}
+    n_rows = 0
+    columns = None
+
+    # Pass 1: outlier bounds, medians and vocabularies
+    logger.info("Streaming pass 1: quantile sketches and category vocabularies...")
+    for chunk in _read_chunks(csv_path, rows):
+        if columns is None:
+            columns = chunk.columns.tolist()
+            if target_column is None:
+                target_column = columns[-1]
+            elif target_column not in columns:
+                raise ValueError(f"Target column '{target_column}' not found in dataset columns {columns}")
+        y = chunk[target_column]
+        X = chunk.drop(columns=[target_column])
+        n_rows += len(chunk)
+
+        for col in X.select_dtypes(include=[np.number]).columns:
+            raw_sketches.setdefault(col, QuantileSketch(k=sketch_k)).update(X[col].to_numpy(dtype=np.float64))
+        for col in X.select_dtypes(include=['object']).columns:
+            counts = X[col].fillna('Unknown').astype(str).value_counts()
+            categories[col] = categories.get(col, pd.Series(dtype=np.int64)).add(counts, fill_value=0)
+        counts = y.astype(str).value_counts()
+        targets['values'] = targets.get('values', pd.Series(dtype=np.int64)).add(counts, fill_value=0)
+
+    if n_rows == 0:
+        raise ValueError("Dataset is empty")
+
+    transformer = PatientFeatureTransformer()
+    feature_columns = [col for col in columns if col != target_column]
+    transformer.numeric_inputs_ = [col for col in feature_columns if col in raw_sketches]
+    transformer.categorical_features_ = [col for col in feature_columns if col in categories]
+
+    transformer.lower_bounds_, transformer.upper_bounds_, transformer.fill_values_ = {}, {}, {}
+    for col in transformer.numeric_inputs_:
+        q1, median, q3 = raw_sketches[col].quantiles([0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        transformer.lower_bounds_[col] = float(q1 - 1.5 * iqr)
+        transformer.upper_bounds_[col] = float(q3 + 1.5 * iqr)
+        # Capping is monotone, so the capped median is the capped raw median
+        transformer.fill_values_[col] = float(np.clip(median, q1 - 1.5 * iqr, q3 + 1.5 * iqr))
+
+    transformer.encoders_ = {}
+    for col in transformer.categorical_features_:
+        counts = categories[col]
+        transformer.fill_values_[col] = 'Unknown' if 'Unknown' in counts.index else counts.idxmax()
+        transformer.encoders_[col] = LabelEncoder().fit(counts.index.to_numpy(dtype=str))
+
+    target_encoder = LabelEncoder().fit(targets['values'].index.to_numpy(dtype=str))
+
+    engineered = [col for col, inputs in ENGINEERED_FEATURES.items()
+                  if all(c in transformer.numeric_inputs_ for c in inputs)]
+    transformer.feature_names_ = [
+        col for col in feature_columns
+        if col in transformer.numeric_inputs_ or col in transformer.categorical_features_
+    ] + engineered
+
+    # Pass 2: medians of engineered features computed from capped inputs
+    logger.info("Streaming pass 2: engineered feature medians and drift reference...")
+    engineered_sketches = {col: QuantileSketch(k=sketch_k) for col in engineered}
+    # Drift reference bin edges come from the raw sketches; counts from this pass
+    reference = DriftProfile(
+        {col: bin_edges(raw_sketches[col].quantiles(EDGE_QUANTILES)) for col in transformer.numeric_inputs_},
+        {col: encoder.classes_.tolist() for col, encoder in transformer.encoders_.items()}
+    )
+    for chunk in _read_chunks(csv_path, rows):
+        reference.update(chunk, len(chunk))
+        numeric = {col: chunk[col].to_numpy(dtype=np.float64, na_value=np.nan)
+                   for col in transformer.numeric_inputs_}
+        for col, values in engineer_features(transformer._cap(numeric)).items():
+            engineered_sketches[col].update(values)
+    for col, sketch in engineered_sketches.items():
+        transformer.fill_values_[col] = float(sketch.quantiles([0.5])[0])
+
+    return transformer, target_encoder, target_column, n_rows, reference
+
+
+def build_memmap_dataset(csv_path, transformer, target_encoder, target_column, n_rows,
+                         rows, workdir, test_size=0.2, random_state=42, sketch_k=2048):
+    """
+    Write the scaled feature matrix into float32 memory-mapped train / test
+    files, chunk by chunk. Rows are assigned to the test split at random as
+    they stream past, so no in-memory split copy is ever made. The scaler is
+    fitted from sketches of the unscaled matrix, then applied in place.
+    Returns:
+        (X_train, y_train, X_test, y_test) as read-only memmaps
+    """
+    os.makedirs(workdir, exist_ok=True)
+    n_features = len(transformer.feature_names_)
+    rng = np.random.default_rng(random_state)
+    is_test = rng.random(n_rows) < test_size
+    n_test = int(is_test.sum())
+    n_train = n_rows - n_test
+
+    paths = {name: os.path.join(workdir, f'{name}.dat') for name in ('X_train', 'y_train', 'X_test', 'y_test')}
+    X_train = np.lib.format.open_memmap(paths['X_train'], mode='w+', dtype=np.float32, shape=(n_train, n_features))
+    X_test = np.lib.format.open_memmap(paths['X_test'], mode='w+', dtype=np.float32, shape=(n_test, n_features))
+    y_train = np.lib.format.open_memmap(paths['y_train'], mode='w+', dtype=np.int64, shape=(n_train,))
+    y_test = np.lib.format.open_memmap(paths['y_test'], mode='w+', dtype=np.int64, shape=(n_test,))
+
+    # Pass 3: unscaled matrix, sketching every column for the scaler
+    logger.info(f"Streaming pass 3: writing {n_train} train / {n_test} test rows to {workdir}...")
+    column_sketches = [QuantileSketch(k=sketch_k) for _ in range(n_features)]
+    start, train_pos, test_pos = 0, 0, 0
+    for chunk in _read_chunks(csv_path, rows):
+        y = target_encoder.transform(chunk[target_column].astype(str))
+        numeric = {col: chunk[col].to_numpy(dtype=np.float64, na_value=np.nan)
+                   for col in transformer.numeric_inputs_}
+        numeric = transformer._cap(numeric)
+        numeric.update(engineer_features(numeric))
+        X = transformer._assemble(numeric, chunk, len(chunk))
+        for i, sketch in enumerate(column_sketches):
+            sketch.update(X[:, i])
+
+        test_mask = is_test[start:start + len(chunk)]
+        n_chunk_test = int(test_mask.sum())
+        n_chunk_train = len(chunk) - n_chunk_test
+        X_train[train_pos:train_pos + n_chunk_train] = X[~test_mask]
+        y_train[train_pos:train_pos + n_chunk_train] = y[~test_mask]
+        X_test[test_pos:test_pos + n_chunk_test] = X[test_mask]
+        y_test[test_pos:test_pos + n_chunk_test] = y[test_mask]
+        start += len(chunk)
+        train_pos += n_chunk_train
+        test_pos += n_chunk_test
+
+    # RobustScaler parameters from the sketches (median, interquartile range)
+    quantiles = np.array([sketch.quantiles([0.25, 0.5, 0.75]) for sketch in column_sketches])
+    scaler = RobustScaler()
+    scaler.center_ = quantiles[:, 1]
+    scale = quantiles[:, 2] - quantiles[:, 0]
+    scaler.scale_ = np.where(scale == 0.0, 1.0, scale)
+    scaler.n_features_in_ = n_features
+    transformer.scaler_ = scaler
+
+    # Pass 4 (over the memmaps, not the CSV): scale in place
+    logger.info("Scaling memory-mapped matrices in place...")
+    for X in (X_train, X_test):
+        for i in range(0, len(X), rows):
+            X[i:i + rows] = transformer._scale(np.asarray(X[i:i + rows], dtype=np.float64))
+        X.flush()
+    y_train.flush()
+    y_test.flush()
+
+    return tuple(np.load(paths[name], mmap_mode='r') for name in ('X_train', 'y_train', 'X_test', 'y_test'))
@@ -0,0 +1,226 @@
+"""
+Inference Performance Baselines
+Measures ReportPredictor latency, throughput and worker memory on a model
+trained deterministically from the dataset, saves the results as versioned
+JSON baselines and compares later runs against them
+"""
+
+import json
+import multiprocessing
+import os
+import platform
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+# Bump when metric names or their meaning change; baselines of another
+# version are refused rather than compared
+SCHEMA_VERSION = 1
+
+# A metric regresses when it is this much worse than the baseline (0.2 = 20%)
+DEFAULT_THRESHOLD = 0.2
+
+# Workloads: (name, reports per call, timed calls)
+WORKLOADS = (
+    ('single_row', 1, 300),
+    ('batch_32', 32, 100),
+    ('batch_1024', 1024, 20),
+)
+WARMUP_CALLS = 5
+# Each metric is the median over this many rounds of every workload
+ROUNDS = 3
+RANDOM_STATE = 42
+
+
+def train_reference_model(dataset, model_dir, random_state=RANDOM_STATE):
+    """
+    Train the default production forest (no CV or grid search) on the
+    dataset with a fixed random_state and save it to model_dir, so every
+    run measures the same model unless the training code changes
+    """
+    import pandas as pd
+    from train_model import ImprovedPatientReportAnalyzer
+
+    analyzer = ImprovedPatientReportAnalyzer()
+    X, y = analyzer.preprocess_data(pd.read_csv(dataset), target_column='Disease')
+    analyzer.train(X, y, use_cv=False, tune_hyperparams=False, random_state=random_state)
+    analyzer.save_model(model_dir)
+
+
+def measure_model(model_dir, dataset):
+    """
+    Time each workload on a ReportPredictor as the service configures it
+    Meant to run in a fresh worker process, so rss_bytes is what one
+    service worker holds after loading the model and serving these calls.
+    Returns:
+        dict of metric name -> value
+    """
+    from benchmark import load_reports
+    from inference_threads import limit_native_threads
+    from predict import ReportPredictor
+    from telemetry import current_rss_bytes
+
+    limit_native_threads(1)
+    predictor = ReportPredictor(model_dir=model_dir)
+    reports = load_reports(dataset, max(size for _, size, _ in WORKLOADS), seed=RANDOM_STATE)
+    reports = reports.to_dict(orient='records')
+
+    rounds = []
+    for _ in range(ROUNDS):
+        timings = {}
+        for name, size, calls in WORKLOADS:
+            timings.update(time_workload(predictor, reports, name, size, calls))
+        rounds.append(timings)
+
+    metrics = {metric: float(np.median([timings[metric] for timings in rounds])) for metric in rounds[0]}
+    metrics['model_bytes'] = predictor.bundle.memory_bytes
+    metrics['rss_bytes'] = current_rss_bytes()
+    return metrics
+
+
+def time_workload(predictor, reports, name, size, calls):
+    """p50 / p95 latency and throughput over calls predict() (size 1) or predict_batch() calls"""
+    batch = reports[:size]
+    if size == 1:
+        def call():
+            predictor.predict(batch[0])
+    else:
+        def call():
+            predictor.predict_batch(batch)
+    for _ in range(WARMUP_CALLS):
+        call()
+
+    latencies = np.empty(calls)
+    for i in range(calls):
+        start = time.perf_counter()
+        call()
+        latencies[i] = time.perf_counter() - start
+    p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+    return {
+        f'{name}.p50_ms': p50,
+        f'{name}.p95_ms': p95,
+        f'{name}.rows_per_s': size * calls / latencies.sum(),
+    }
+
+
+def environment():
+    """Where a run was measured; numbers are only comparable on the same setup"""
+    import sklearn
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def run_benchmark(dataset):
+    """
+    Train the reference model in a temporary directory and measure it in
+    a fresh process
+    Returns:
+        a baseline document
+    """
+    dataset = os.path.abspath(dataset)
+    with tempfile.TemporaryDirectory() as model_dir:
+        train_reference_model(dataset, model_dir)
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as worker:
+            metrics = worker.submit(measure_model, model_dir, dataset).result()
+    return {
+        'schema_version': SCHEMA_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'dataset': os.path.basename(dataset),
+        'random_state': RANDOM_STATE,
+        'environment': environment(),
+        'metrics': metrics,
+    }
+
+
+def save_baseline(document, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def load_baseline(path):
+    """
+    Read a baseline document
+    Raises:
+        ValueError if it was written with another schema version
+    """
+    with open(path) as f:
+        document = json.load(f)
+    version = document.get('schema_version')
+    if version != SCHEMA_VERSION:
+        raise ValueError(
+            f"Baseline {path} has schema version {version}, expected {SCHEMA_VERSION}; record a new baseline"
+        )
+    return document
+
+
+def higher_is_better(metric):
+    return metric.endswith('_per_s')
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare the metrics of two baseline documents
+    Returns:
+        list of dicts (metric, baseline, current, change, regressed), where
+        change is the relative change in the metric's bad direction
+        (positive = worse) and regressed means change > threshold. A
+        baseline metric the current run did not report (a renamed or dropped
+        workload) has current and change None and counts as regressed.
+    """
+    rows = []
+    for metric, base in sorted(baseline['metrics'].items()):
+        value = current['metrics'].get(metric)
+        if value is None:
+            rows.append({'metric': metric, 'baseline': base, 'current': None, 'change': None, 'regressed': True})
+            continue
+        if not base:
+            continue
+        change = (base - value) / base if higher_is_better(metric) else (value - base) / base
+        rows.append({
+            'metric': metric,
+            'baseline': base,
+            'current': value,
+            'change': change,
+            'regressed': change > threshold,
+        })
+    return rows
+
+
+def environment_differences(baseline, current):
+    """Environment keys whose values differ between two runs"""
+    before, after = baseline.get('environment', {}), current.get('environment', {})
+    return {key: (before.get(key), after.get(key)) for key in sorted(set(before) | set(after))
+            if before.get(key) != after.get(key)}
+
+
+def print_comparison(rows, threshold):
+    print(f"{'metric':<24} {'baseline':>14} {'current':>14} {'worse by':>9}")
+    for row in rows:
+        if row['current'] is None:
+            print(f"{row['metric']:<24} {row['baseline']:>14.3f} {'missing':>14} {'':>9}  MISSING")
+            continue
+        flag = '  REGRESSION' if row['regressed'] else ''
+        print(f"{row['metric']:<24} {row['baseline']:>14.3f} {row['current']:>14.3f} "
+              f"{row['change']:>+9.1%}{flag}")
+    missing = [row['metric'] for row in rows if row['current'] is None]
+    regressions = [row['metric'] for row in rows if row['regressed'] and row['current'] is not None]
+    if missing:
+        print(f"[ERROR] {len(missing)} baseline metric(s) missing from this run: {', '.join(missing)}; "
+              f"record a new baseline if workloads changed")
+    if regressions:
+        print(f"[ERROR] {len(regressions)} metric(s) regressed by more than {threshold:.0%}: {', '.join(regressions)}")
+    if not missing and not regressions:
+        print(f"[OK] No metric regressed by more than {threshold:.0%}")
+    return not missing and not regressions
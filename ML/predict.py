@@ -5,168 +5,319 @@ This script loads a trained model and makes predictions on new patient reports.
 
 import pandas as pd
 import numpy as np
-import joblib
 import json
-import os
 import sys
+from admission import DeadlineExceeded, check_deadline
+from drift import DriftMonitor
+from inference_threads import InferencePolicy
+from input_schema import SchemaError, ValidatedBatch
+from model_bundle import load_model_dir
+
+# Streaming batches start with a small chunk so the first results go out
+# quickly, then double the chunk size up to the caller's limit
+FIRST_STREAM_CHUNK_ROWS = 64
+
+def chunk_bounds(n_rows, chunk_rows, first_chunk_rows=FIRST_STREAM_CHUNK_ROWS):
+    """(start, stop) row ranges of a streamed batch"""
+    start, size = 0, max(1, min(first_chunk_rows, chunk_rows))
+    while start < n_rows:
+        yield start, min(start + size, n_rows)
+        start += size
+        size = min(size * 2, chunk_rows)
 
 class ReportPredictor:
-    def __init__(self, model_dir='models'):
-        """Initialize the predictor with trained model"""
+    def __init__(self, model_dir='models', dtype='float64', strict_schema=False,
+                 monitor_drift=False, drift_window=10000, inference_policy=None):
+        """
+        Initialize the predictor with trained model
+        Args:
+            model_dir: directory containing the model bundle
+            dtype: 'float64' (default) or 'float32' for the reduced-precision
+                   inference path (half the feature matrix memory traffic)
+            strict_schema: reject reports with missing fields or unseen
+                           categories instead of imputing them
+            monitor_drift: count validated inputs against the drift
+                           reference saved with the model (see drift.py)
+            drift_window: rows per drift monitoring window
+            inference_policy: InferencePolicy deciding when tree evaluation
+                              runs in parallel (default: single-threaded
+                              below 1024 rows, row chunks on a shared pool above)
+        """
         self.model_dir = model_dir
+        self.strict_schema = strict_schema
+        self.monitor_drift = monitor_drift
+        self.drift_window = drift_window
+        self.drift = None
+        self.inference_policy = inference_policy or InferencePolicy()
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float64, np.float32):
+            raise ValueError(f"Unsupported inference dtype: {dtype}")
+        self.bundle = None
         self.model = None
-        self.scaler = None
+        self.transformer = None
         self.label_encoders = None
+        self.metadata = {}
         self.feature_names = []
+        self.classes = []
         self.load_model()
     
     def load_model(self):
-        """Load the trained model and preprocessors"""
+        """Load the trained model bundle (or legacy model files)"""
         try:
-            # Load model
-            model_path = os.path.join(self.model_dir, 'patient_report_model.joblib')
-            if not os.path.exists(model_path):
-                raise FileNotFoundError(f"Model file not found: {model_path}")
+            self.bundle = load_model_dir(self.model_dir)
+            self.model = self.inference_policy.prepare(self.bundle.model)
+            self.transformer = self.bundle.transformer
+            self.label_encoders = self.bundle.label_encoders
+            self.metadata = self.bundle.metadata
+            self.feature_names = self.bundle.feature_names
+            # Class names are fixed for a loaded model, so build them once
+            self.classes = self.bundle.classes
+            self.schema = self.bundle.schema
+            reference = self.metadata.get('drift_reference')
+            if self.monitor_drift and reference:
+                self.drift = DriftMonitor(reference, window_rows=self.drift_window)
             
-            self.model = joblib.load(model_path)
-            print(f"[OK] Model loaded from {model_path}")
-            
-            # Load scaler
-            scaler_path = os.path.join(self.model_dir, 'scaler.joblib')
-            self.scaler = joblib.load(scaler_path)
-            print(f"[OK] Scaler loaded from {scaler_path}")
-            
-            # Load label encoders
-            encoders_path = os.path.join(self.model_dir, 'label_encoders.joblib')
-            self.label_encoders = joblib.load(encoders_path)
-            print(f"[OK] Label encoders loaded from {encoders_path}")
-            
-            # Load metadata
-            metadata_path = os.path.join(self.model_dir, 'model_metadata.json')
-            if os.path.exists(metadata_path):
-                with open(metadata_path, 'r') as f:
-                    metadata = json.load(f)
-                    self.feature_names = metadata.get('feature_names', [])
-                    print(f"[OK] Metadata loaded: {len(self.feature_names)} features")
+            if self.bundle.bundle_id:
+                print(f"[OK] Model bundle {self.bundle.bundle_id} loaded from {self.bundle.path}")
+            else:
+                print(f"[OK] Legacy model files loaded from {self.model_dir}")
+            print(f"[OK] Metadata loaded: {len(self.feature_names)} features")
             
         except Exception as e:
             print(f"[ERROR] Error loading model: {str(e)}")
             raise
     
+    @property
+    def feature_importance(self):
+        """Sorted feature importances, computed once per loaded model"""
+        return self.bundle.feature_importance
+    
+    def validate(self, data, partial=False):
+        """
+        Check and coerce raw reports against the model's input schema
+        Args:
+            data: dict, list of dicts, DataFrame or structured array
+            partial: return (valid rows, errors) instead of raising
+        Returns:
+            a ValidatedBatch (see input_schema.InputSchema.validate)
+        Raises:
+            SchemaError with per-field errors
+        """
+        return self.schema.validate(data, strict=self.strict_schema, partial=partial)
+    
+    def validate_columns(self, data, columns=None):
+        """Like validate(), for a mapping of feature name -> list of values"""
+        return self.schema.validate_columns(data, columns, strict=self.strict_schema)
+    
     def preprocess_input(self, data):
         """
         Preprocess input data for prediction
         Args:
-            data: dict or DataFrame with patient report data
+            data: a ValidatedBatch, or anything validate() accepts
         Returns:
             Preprocessed numpy array ready for prediction
         """
-        # Convert dict to DataFrame if needed
-        if isinstance(data, dict):
-            df = pd.DataFrame([data])
-        else:
-            df = data.copy()
-        
-        # Feature engineering (same as training)
-        if 'Age' in df.columns and 'BloodPressure' in df.columns:
-            df['Age_BP_Interaction'] = df['Age'] * df['BloodPressure']
-        
-        if 'BMI' in df.columns and 'Cholesterol' in df.columns:
-            df['BMI_Cholesterol_Interaction'] = df['BMI'] * df['Cholesterol']
-        
-        # Create risk score features
-        if all(col in df.columns for col in ['BloodPressure', 'Cholesterol', 'Glucose']):
-            df['Cardiovascular_Risk'] = (
-                (df['BloodPressure'] > 140).astype(int) +
-                (df['Cholesterol'] > 200).astype(int) +
-                (df['Glucose'] > 100).astype(int)
-            )
-        
-        # Ensure all required features are present
-        missing_features = set(self.feature_names) - set(df.columns)
-        if missing_features:
-            # Add missing features with default values
-            for feature in missing_features:
-                df[feature] = 0
+        if not isinstance(data, ValidatedBatch):
+            data = self.validate(data)
+        if self.drift is not None:
+            self.drift.observe(data.columns, len(data), data.unseen)
+        return self.transformer.transform_columns(data.columns, len(data), dtype=self.dtype)
+    
+    def score_frame(self, df, explain=False):
+        """
+        Score every row of a batch in one vectorized pass
+        Args:
+            df: DataFrame with one patient report per row (or a
+                ValidatedBatch / list of report dicts)
+            explain: also compute per-feature contributions to each
+                     predicted class
+        Returns:
+            (labels, confidences, probabilities, explanations) where
+            probabilities is an (n_rows, n_classes) array with columns
+            ordered as self.classes, and explanations is None or a
+            (contributions (n_rows, n_features), bias (n_rows,)) pair
+        """
+        X = self.preprocess_input(df)
+        # Skip the forest if the request's caller has given up meanwhile
+        check_deadline('inference')
         
-        # Reorder columns to match training order
-        df = df[self.feature_names]
+        # predict() is argmax over predict_proba, so one call gives both
+        probabilities = self.inference_policy.predict_proba(self.model, X)
+        best = probabilities.argmax(axis=1)
+        confidences = probabilities[np.arange(len(best)), best]
+        labels = [self.classes[i] for i in best]
         
-        # Handle missing values
-        df = df.fillna(df.median(numeric_only=True))
-        df = df.fillna('Unknown')
+        explanations = self.bundle.explainer.explain(X, best) if explain else None
         
-        # Encode categorical variables
-        for col in df.columns:
-            if col in self.label_encoders and df[col].dtype == 'object':
-                try:
-                    # Transform known values
-                    df[col] = df[col].astype(str)
-                    known_values = set(self.label_encoders[col].classes_)
-                    df[col] = df[col].apply(
-                        lambda x: x if x in known_values else 'Unknown'
-                    )
-                    df[col] = self.label_encoders[col].transform(df[col])
-                except Exception as e:
-                    print(f"Warning: Error encoding {col}: {e}")
-                    df[col] = 0
+        return labels, confidences, probabilities, explanations
+    
+    def format_explanations(self, explanations):
+        """Per-report {'bias', 'contributions'} dicts, largest contributions first"""
+        contributions, bias = explanations
+        formatted = []
+        for row, row_bias in zip(contributions.tolist(), bias.tolist()):
+            ranked = sorted(zip(self.feature_names, row), key=lambda x: abs(x[1]), reverse=True)
+            formatted.append({'bias': row_bias, 'contributions': dict(ranked)})
+        return formatted
+    
+    def predict_frame(self, df, top_k=None, explain=False):
+        """
+        Make predictions for every row of a DataFrame
+        Args:
+            df: DataFrame with one patient report per row
+            top_k: if set, only the top_k most probable classes are
+                   returned in each result's probabilities
+            explain: add per-feature contributions to the predicted class
+        Returns:
+            list of prediction result dicts, one per row
+        """
+        labels, confidences, probabilities, explanations = self.score_frame(df, explain=explain)
         
-        # Scale features
-        X_scaled = self.scaler.transform(df)
+        if top_k is None:
+            rows = [dict(zip(self.classes, row)) for row in probabilities.tolist()]
+        else:
+            top = np.argsort(-probabilities, axis=1, kind='stable')[:, :top_k]
+            top_probs = np.take_along_axis(probabilities, top, axis=1).tolist()
+            rows = [
+                {self.classes[i]: p for i, p in zip(indices, probs)}
+                for indices, probs in zip(top.tolist(), top_probs)
+            ]
         
-        return X_scaled
+        results = [
+            {
+                'prediction': label,
+                'confidence': confidence,
+                'probabilities': row,
+                'status': 'success'
+            }
+            for label, confidence, row in zip(labels, confidences.tolist(), rows)
+        ]
+        if explanations is not None:
+            for result, explanation in zip(results, self.format_explanations(explanations)):
+                result['explanation'] = explanation
+        return results
     
-    def predict(self, data):
+    def predict_matrix(self, df, explain=False):
+        """
+        Make predictions for every row of a DataFrame in column-indexed form
+        The class list is sent once and probabilities are an
+        (n_rows, n_classes) array indexed by it; explanations likewise send
+        the feature list once with an (n_rows, n_features) contribution matrix
+        """
+        if len(df) == 0:
+            return {'classes': self.classes, 'predictions': [], 'confidence': [], 'probabilities': []}
+        labels, confidences, probabilities, explanations = self.score_frame(df, explain=explain)
+        result = {
+            'classes': self.classes,
+            'predictions': labels,
+            'confidence': confidences,
+            'probabilities': probabilities
+        }
+        if explanations is not None:
+            contributions, bias = explanations
+            result['explanations'] = {
+                'features': self.feature_names,
+                'bias': bias,
+                'contributions': contributions
+            }
+        return result
+    
+    def predict(self, data, top_k=None, explain=False):
         """
         Make prediction on patient report data
         Args:
-            data: dict or DataFrame with patient report data
+            data: dict (or a validated single-report batch) with patient
+                  report data
+            top_k: optionally limit probabilities to the top_k classes
+            explain: add per-feature contributions to the predicted class
         Returns:
             dict with prediction results
         """
         try:
-            # Preprocess
-            X = self.preprocess_input(data)
-            
-            # Make prediction
-            prediction = self.model.predict(X)[0]
-            probabilities = self.model.predict_proba(X)[0]
-            
-            # Decode prediction if target was encoded
-            if 'target' in self.label_encoders:
-                prediction_label = self.label_encoders['target'].inverse_transform([prediction])[0]
-            else:
-                prediction_label = str(prediction)
-            
-            # Get class probabilities
-            if 'target' in self.label_encoders:
-                classes = self.label_encoders['target'].classes_
-                prob_dict = {str(cls): float(prob) for cls, prob in zip(classes, probabilities)}
-            else:
-                prob_dict = {f"Class_{i}": float(prob) for i, prob in enumerate(probabilities)}
-            
-            result = {
-                'prediction': prediction_label,
-                'confidence': float(max(probabilities)),
-                'probabilities': prob_dict,
-                'status': 'success'
-            }
-            
-            return result
+            return self.predict_frame(data, top_k=top_k, explain=explain)[0]
             
+        except DeadlineExceeded:
+            raise
+        except SchemaError as e:
+            return dict(self._error_result(str(e)), **e.to_dict())
         except Exception as e:
-            return {
-                'prediction': None,
-                'error': str(e),
-                'status': 'error'
-            }
+            return self._error_result(str(e))
     
-    def predict_batch(self, data_list):
-        """Make predictions on multiple patient reports"""
-        results = []
-        for data in data_list:
-            results.append(self.predict(data))
-        return results
+    @staticmethod
+    def _error_result(message, errors=None):
+        result = {
+            'prediction': None,
+            'error': message,
+            'status': 'error'
+        }
+        if errors is not None:
+            result['errors'] = errors
+        return result
+    
+    def predict_batch(self, data_list, top_k=None, explain=False):
+        """
+        Make predictions on multiple patient reports
+        The whole list is validated in one pass; reports that fail get an
+        error result with their field errors and the rest are scored together
+        """
+        if not data_list:
+            return []
+        batch, errors = self.validate(data_list, partial=True)
+        if not errors:
+            return self.predict_frame(batch, top_k=top_k, explain=explain)
+        
+        row_errors = {}
+        for error in errors:
+            row_errors.setdefault(error['row'], []).append({'field': error['field'], 'message': error['message']})
+        scored = iter(self.predict_frame(batch, top_k=top_k, explain=explain) if len(batch) else [])
+        return [
+            self._error_result(str(SchemaError(row_errors[i])), row_errors[i]) if i in row_errors else next(scored)
+            for i in range(len(data_list))
+        ]
+    
+    def predict_columns(self, data, columns=None, top_k=None, explain=False):
+        """
+        Make predictions on a columnar batch
+        Args:
+            data: mapping of feature name -> list of values (or a
+                  structured numpy array with named fields)
+            columns: optional column order / subset to use from data
+            top_k: optionally limit probabilities to the top_k classes
+            explain: add per-feature contributions to the predicted class
+        Returns:
+            list of prediction result dicts, one per row
+        Raises:
+            SchemaError if any value is invalid
+        """
+        batch = self.validate_columns(data, columns)
+        if len(batch) == 0:
+            return []
+        return self.predict_frame(batch, top_k=top_k, explain=explain)
+    
+    def iter_batch(self, data_list, chunk_rows=1000, top_k=None, explain=False):
+        """
+        Score a list of reports chunk by chunk, as predict_batch() would
+        Yields:
+            lists of result dicts, in report order, at most chunk_rows long
+        """
+        for start, stop in chunk_bounds(len(data_list), chunk_rows):
+            yield self.predict_batch(data_list[start:stop], top_k=top_k, explain=explain)
+    
+    def iter_columns(self, data, columns=None, chunk_rows=1000, top_k=None, explain=False):
+        """
+        Score a columnar batch chunk by chunk, as predict_columns() would
+        The whole batch is validated here, before anything is scored.
+        Returns:
+            an iterator of lists of result dicts, in row order, at most
+            chunk_rows long
+        Raises:
+            SchemaError if any value is invalid
+        """
+        batch = self.validate_columns(data, columns)
+        return (
+            self.predict_frame(batch.rows(start, stop), top_k=top_k, explain=explain)
+            for start, stop in chunk_bounds(len(batch), chunk_rows)
+        )
 
 def main():
     """CLI interface for predictions"""
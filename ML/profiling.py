@@ -0,0 +1,172 @@
+"""
+Request Profiling
+Opt-in profiling of ML service requests: one request in every N, or any
+request carrying the profile header, is profiled and the results are
+aggregated for download as pstats or, when sampling, as collapsed stacks
+(for flamegraphs)
+"""
+
+import cProfile
+import io
+import itertools
+import marshal
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_HEADER = 'X-Profile'
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+
+class _StackSampler:
+    """Samples one thread's Python stack on a background thread"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+
+class RequestProfiler:
+    """
+    Decides which requests to profile and aggregates their profiles.
+
+    mode 'cprofile' runs the deterministic profiler and merges the results
+    into one pstats table; mode 'sampling' samples the request thread's
+    stack every interval_ms and counts collapsed stacks. Only one request is
+    profiled at a time; others that qualify meanwhile run unprofiled and
+    are counted as skipped. When disabled, start() is a single check.
+    """
+
+    def __init__(self, sample_every=0, allow_header=False, mode='cprofile', interval_ms=1.0):
+        if mode not in ('cprofile', 'sampling'):
+            raise ValueError("Profiler mode must be 'cprofile' or 'sampling'")
+        self.sample_every = sample_every
+        self.allow_header = allow_header
+        self.mode = mode
+        self.interval = interval_ms / 1000.0
+        self.enabled = sample_every > 0 or allow_header
+
+        self._counter = itertools.count(1)
+        self._active = threading.Lock()
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Discard everything aggregated so far"""
+        with self._lock:
+            self._stats = None
+            self._stacks = Counter()
+            self.stats = {'profiled': 0, 'skipped': 0, 'seconds': 0.0}
+
+    def start(self, headers):
+        """
+        Start profiling the current request if it is selected
+        Returns:
+            a token to pass to stop(), or None if not profiling
+        """
+        if not self.enabled:
+            return None
+        requested = self.allow_header and headers.get(PROFILE_HEADER, '').lower() in ('1', 'true', 'yes')
+        sampled = self.sample_every > 0 and next(self._counter) % self.sample_every == 0
+        if not (requested or sampled):
+            return None
+        if not self._active.acquire(blocking=False):
+            with self._lock:
+                self.stats['skipped'] += 1
+            return None
+
+        if self.mode == 'sampling':
+            profiler = _StackSampler(threading.get_ident(), self.interval)
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler, time.perf_counter()
+
+    def stop(self, token):
+        """Stop profiling and fold the request's profile into the aggregate"""
+        if token is None:
+            return
+        profiler, start = token
+        try:
+            if self.mode == 'sampling':
+                stacks = profiler.stop()
+            else:
+                profiler.disable()
+            seconds = time.perf_counter() - start
+
+            with self._lock:
+                if self.mode == 'sampling':
+                    self._stacks.update(stacks)
+                elif self._stats is None:
+                    self._stats = pstats.Stats(profiler)
+                else:
+                    self._stats.add(profiler)
+                self.stats['profiled'] += 1
+                self.stats['seconds'] += seconds
+        finally:
+            self._active.release()
+
+    def pstats_bytes(self):
+        """Aggregated profile in the binary pstats format (load with pstats.Stats)"""
+        with self._lock:
+            if self._stats is None:
+                return None
+            return marshal.dumps(self._stats.stats)
+
+    def collapsed(self):
+        """
+        Aggregated profile as collapsed stacks, one 'frame;frame;... count'
+        line per stack (sample counts), as read by flamegraph.pl and speedscope
+        Raises:
+            ValueError in cprofile mode, which only records caller -> callee
+            edges; stacks stitched from them would not be real call stacks
+        """
+        if self.mode != 'sampling':
+            raise ValueError('Collapsed stacks need PROFILER_MODE=sampling')
+        with self._lock:
+            stacks = dict(self._stacks)
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+    def text(self, limit=30):
+        """Top functions by cumulative time, as printed by pstats"""
+        with self._lock:
+            if self._stats is None:
+                return ''
+            stream = io.StringIO()
+            stats = pstats.Stats(stream=stream)
+            stats.add(self._stats)
+            stats.sort_stats('cumulative').print_stats(limit)
+        return stream.getvalue()
+
+    def describe(self):
+        with self._lock:
+            return dict(self.stats, enabled=self.enabled, mode=self.mode,
+                        sample_every=self.sample_every, allow_header=self.allow_header)
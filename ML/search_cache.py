@@ -0,0 +1,75 @@
+"""
+Hyperparameter Search Cache
+On-disk memo of cross-validation scores per (parameters, fold), so an
+interrupted or extended grid search only fits what it has not scored yet
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+def search_key(X, y, sample_weight=None, **config):
+    """
+    Hash of the training matrix, labels, row weights and search settings
+    (folds, seeds, fixed model parameters, preprocessing version). Scores
+    are only reused when all of them match.
+    """
+    digest = hashlib.sha256()
+    for array in (X, y, sample_weight):
+        if array is None:
+            digest.update(b'none')
+            continue
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode('ascii'))
+        digest.update(array.tobytes())
+    digest.update(json.dumps(config, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def params_key(params):
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+class FoldScoreCache:
+    """
+    Fold scores for one search key, stored as JSON lines in
+    <cache_dir>/<key>.jsonl. Each score is appended and flushed as soon as
+    its fit finishes; a line cut short by a crash is ignored on load.
+    """
+
+    def __init__(self, cache_dir, key):
+        self.cache_dir = cache_dir
+        self.key = key
+        self.path = os.path.join(cache_dir, f'{key}.jsonl')
+
+    def load(self):
+        """Scores so far as {(params_key, fold): score}"""
+        scores = {}
+        if not os.path.exists(self.path):
+            return scores
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                scores[(params_key(entry['params']), entry['fold'])] = entry['score']
+        return scores
+
+    def add(self, params, fold, score, seconds=None):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = {'params': params, 'fold': fold, 'score': float(score), 'fit_seconds': seconds}
+        line = json.dumps(entry, default=str) + '\n'
+        with open(self.path, 'a+b') as f:
+            # Start a new line after one cut short by a crash, so this entry
+            # does not get glued onto it and skipped as well
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    line = '\n' + line
+            f.write(line.encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
@@ -0,0 +1,208 @@
+"""
+Synthetic Patient Report Dataset Generator
+Learns per-column and class-conditional distributions from a real dataset
+and streams schema-compatible synthetic datasets of any size to CSV or
+Parquet, for benchmarking training and scoring at production scale
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+from scipy.stats import rankdata
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+class SyntheticPatientGenerator:
+    """
+    Class-conditional Gaussian copula over the feature columns.
+
+    fit() records the target class frequencies and, for every class, each
+    column's empirical distribution, missing rate and the rank correlation
+    between columns. Generated rows pick a class by its frequency, draw
+    correlated normals for that class and map them through each column's
+    empirical inverse CDF, so marginals, per-class structure and the
+    dependence between vitals are all preserved. Values are drawn from those
+    seen in the source, so the schema and category sets match it exactly.
+    """
+
+    def __init__(self, target_column='Disease'):
+        self.target_column = target_column
+
+    def fit(self, df):
+        if self.target_column not in df.columns:
+            raise ValueError(f"Target column {self.target_column} not in dataset")
+        self.columns_ = df.columns.tolist()
+        self.feature_columns_ = [col for col in self.columns_ if col != self.target_column]
+        self.dtypes_ = {col: df[col].dtype for col in self.columns_}
+
+        # Categorical features are modelled through their category codes
+        self.categories_ = {}
+        codes = {}
+        for col in self.feature_columns_:
+            if df[col].dtype == object:
+                categorical = pd.Categorical(df[col])
+                self.categories_[col] = np.asarray(categorical.categories)
+                codes[col] = np.where(categorical.codes < 0, np.nan, categorical.codes).astype(np.float64)
+            else:
+                codes[col] = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+        values = np.column_stack([codes[col] for col in self.feature_columns_])
+
+        counts = df[self.target_column].value_counts()
+        self.classes_ = counts.index.to_numpy()
+        self.class_probs_ = (counts / counts.sum()).to_numpy()
+
+        target = df[self.target_column].to_numpy()
+        self.class_models_ = []
+        for cls in self.classes_:
+            self.class_models_.append(self._fit_class(values[target == cls]))
+        return self
+
+    def _fit_class(self, values):
+        missing = np.isnan(values)
+        sorted_values, scores = [], []
+        for j in range(values.shape[1]):
+            observed = values[~missing[:, j], j]
+            if len(observed) == 0:
+                observed = np.array([np.nan])
+            sorted_values.append(np.sort(observed))
+
+            # Normal scores of the column's ranks (missing rows take the median)
+            column = np.where(missing[:, j], np.nanmedian(observed), values[:, j])
+            scores.append(ndtri((rankdata(column) - 0.5) / len(column)))
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = np.corrcoef(np.column_stack(scores), rowvar=False)
+        corr = np.nan_to_num(np.atleast_2d(corr))
+        np.fill_diagonal(corr, 1.0)
+
+        # Clip to positive definite so the Cholesky factor exists
+        eigenvalues, eigenvectors = np.linalg.eigh(corr)
+        corr = eigenvectors @ np.diag(np.maximum(eigenvalues, 1e-6)) @ eigenvectors.T
+        d = np.sqrt(np.diag(corr))
+        corr = corr / np.outer(d, d)
+
+        return {
+            'sorted_values': sorted_values,
+            'missing_rate': missing.mean(axis=0),
+            'cholesky': np.linalg.cholesky(corr),
+        }
+
+    def _sample_class(self, model, n_rows, rng):
+        normals = rng.standard_normal((n_rows, len(self.feature_columns_))) @ model['cholesky'].T
+        uniforms = ndtr(normals)
+        values = np.empty_like(uniforms)
+        for j, sorted_values in enumerate(model['sorted_values']):
+            index = np.minimum((uniforms[:, j] * len(sorted_values)).astype(np.intp), len(sorted_values) - 1)
+            values[:, j] = sorted_values[index]
+        missing = rng.random(values.shape) < model['missing_rate']
+        values[missing] = np.nan
+        return values
+
+    def sample(self, n_rows, rng):
+        """One DataFrame of n_rows synthetic reports in the source's column order"""
+        class_counts = rng.multinomial(n_rows, self.class_probs_)
+        values = np.empty((n_rows, len(self.feature_columns_)))
+        target = np.empty(n_rows, dtype=object)
+        start = 0
+        for cls, model, count in zip(self.classes_, self.class_models_, class_counts):
+            values[start:start + count] = self._sample_class(model, count, rng)
+            target[start:start + count] = cls
+            start += count
+
+        order = rng.permutation(n_rows)
+        values, target = values[order], target[order]
+
+        data = {}
+        for j, col in enumerate(self.feature_columns_):
+            column = values[:, j]
+            if col in self.categories_:
+                codes = np.nan_to_num(column, nan=-1).astype(np.intp)
+                data[col] = pd.Categorical.from_codes(codes, self.categories_[col]).astype(object)
+            elif np.issubdtype(self.dtypes_[col], np.integer):
+                # Nullable integers keep the column integral when values are missing
+                if np.isnan(column).any():
+                    data[col] = pd.array(column, dtype='Int64')
+                else:
+                    data[col] = column.astype(self.dtypes_[col])
+            else:
+                data[col] = column
+        data[self.target_column] = target
+        return pd.DataFrame(data, columns=self.columns_)
+
+    def generate(self, n_rows, seed=42, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Yield DataFrames of at most chunk_size rows, n_rows in total.
+        The same seed and chunk_size always give the same rows.
+        """
+        rng = np.random.default_rng(seed)
+        for start in range(0, n_rows, chunk_size):
+            yield self.sample(min(chunk_size, n_rows - start), rng)
+
+
+def write_dataset(generator, path, n_rows, seed=42, chunk_size=DEFAULT_CHUNK_SIZE, file_format=None):
+    """
+    Stream n_rows synthetic rows to path as CSV or Parquet, one chunk in
+    memory at a time. The format follows the file extension unless given.
+    """
+    file_format = file_format or ('parquet' if path.endswith('.parquet') else 'csv')
+    if file_format == 'parquet' and not HAS_PYARROW:
+        raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    writer = None
+    try:
+        for i, chunk in enumerate(generator.generate(n_rows, seed=seed, chunk_size=chunk_size)):
+            if file_format == 'parquet':
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+            else:
+                chunk.to_csv(path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
+
+
+def main():
+    """Generate a synthetic dataset from a source CSV"""
+    parser = argparse.ArgumentParser(description='Generate a synthetic patient report dataset')
+    parser.add_argument('--source', type=str, default='New_dataset.csv', help='Real dataset to learn from')
+    parser.add_argument('--target', type=str, default='Disease', help='Name of target column')
+    parser.add_argument('--rows', type=int, required=True, help='Number of rows to generate')
+    parser.add_argument('--output', type=str, required=True, help='Output file (.csv or .parquet)')
+    parser.add_argument('--format', type=str, choices=['csv', 'parquet'], default=None,
+                        help='Output format (default: from the file extension)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows generated per chunk')
+    args = parser.parse_args()
+
+    generator = SyntheticPatientGenerator(target_column=args.target).fit(pd.read_csv(args.source))
+    print(f"[OK] Learned {len(generator.classes_)} classes and {len(generator.feature_columns_)} features "
+          f"from {args.source}")
+
+    start = time.perf_counter()
+    write_dataset(generator, args.output, args.rows, seed=args.seed,
+                  chunk_size=args.chunk_size, file_format=args.format)
+    elapsed = time.perf_counter() - start
+    print(f"[OK] Wrote {args.rows} rows to {args.output} in {elapsed:.1f}s "
+          f"({args.rows / elapsed:,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
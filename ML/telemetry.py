@@ -0,0 +1,197 @@
+"""
+Training Run Telemetry
+Per-stage wall time, CPU time and peak RSS for a training run, plus the
+dataset size and thread counts, recorded in the model metadata and appended
+as JSON lines to a run log
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:  # Windows
+    HAS_RESOURCE = False
+
+# Environment variables that cap BLAS / OpenMP thread pools
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'LOKY_MAX_CPU_COUNT')
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss_bytes():
+    """Resident set size of this process, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def max_rss_bytes():
+    """High-water mark of this process's RSS since it started"""
+    if not HAS_RESOURCE:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def _child_cpu_seconds():
+    if not HAS_RESOURCE:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class _RSSSampler:
+    """Polls RSS on a background thread to find one stage's peak"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = current_rss_bytes() or 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes() or 0)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_bytes() or 0)
+
+
+def thread_info(n_jobs=None):
+    """CPU count, the model's n_jobs, thread-limiting env vars and native thread pools"""
+    info = {
+        'cpu_count': os.cpu_count(),
+        'n_jobs': n_jobs,
+        'env': {var: os.environ[var] for var in THREAD_ENV_VARS if var in os.environ},
+    }
+    try:
+        from threadpoolctl import threadpool_info
+        info['threadpools'] = [
+            {'user_api': pool['user_api'], 'internal_api': pool['internal_api'],
+             'num_threads': pool['num_threads']}
+            for pool in threadpool_info()
+        ]
+    except ImportError:
+        pass
+    return info
+
+
+class RunTelemetry:
+    """
+    Telemetry for one training run.
+
+    Each `with telemetry.stage(name):` block records wall seconds, CPU
+    seconds of this process (all threads), CPU seconds of child processes
+    that exited during the stage, and RSS at start, end and peak. Every
+    record is appended to the run log as soon as it is taken, so a failed
+    run still leaves its completed stages behind.
+    """
+
+    def __init__(self, run_log=None):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.run_log = run_log
+        self.started_at = datetime.now().isoformat()
+        self._start = time.perf_counter()
+        self.stages = {}
+        self.info = {}
+        self.log_event('run_started')
+
+    def log_event(self, event, **fields):
+        """Append one JSON record to the run log"""
+        if not self.run_log:
+            return
+        record = {'run_id': self.run_id, 'event': event, 'time': datetime.now().isoformat()}
+        record.update(fields)
+        directory = os.path.dirname(os.path.abspath(self.run_log))
+        os.makedirs(directory, exist_ok=True)
+        with open(self.run_log, 'a') as f:
+            f.write(json.dumps(record, default=str) + '\n')
+
+    def record(self, key, value):
+        """Attach run-level information (dataset size, threads, artifacts...)"""
+        self.info[key] = value
+        self.log_event('info', key=key, value=value)
+
+    @contextmanager
+    def stage(self, name):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        child_cpu = _child_cpu_seconds()
+        rss_start = current_rss_bytes()
+        status = 'ok'
+        # Created outside the try, so the finally block can always read its peak
+        sampler = _RSSSampler()
+        try:
+            with sampler:
+                yield
+        except BaseException:
+            status = 'failed'
+            raise
+        finally:
+            metrics = {
+                'wall_seconds': round(time.perf_counter() - wall, 4),
+                'cpu_seconds': round(time.process_time() - cpu, 4),
+                'child_cpu_seconds': round(_child_cpu_seconds() - child_cpu, 4),
+                'rss_start_bytes': rss_start,
+                'rss_end_bytes': current_rss_bytes(),
+                'peak_rss_bytes': sampler.peak or max_rss_bytes(),
+                'status': status,
+            }
+            # Stages that run more than once (e.g. per fold) accumulate
+            if name in self.stages:
+                previous = self.stages[name]
+                for key in ('wall_seconds', 'cpu_seconds', 'child_cpu_seconds'):
+                    metrics[key] = round(metrics[key] + previous[key], 4)
+                metrics['peak_rss_bytes'] = max(metrics['peak_rss_bytes'] or 0, previous['peak_rss_bytes'] or 0)
+                metrics['calls'] = previous.get('calls', 1) + 1
+            self.stages[name] = metrics
+            self.log_event('stage', stage=name, **metrics)
+
+    def summary(self):
+        """Stages, run-level information and totals, for the model metadata"""
+        return {
+            'run_id': self.run_id,
+            'started_at': self.started_at,
+            'wall_seconds': round(time.perf_counter() - self._start, 4),
+            'peak_rss_bytes': max_rss_bytes(),
+            'stages': dict(self.stages),
+            **self.info,
+        }
+
+    def finish(self, status='completed', **fields):
+        """Write the closing record with the full summary"""
+        self.log_event(f'run_{status}', summary=self.summary(), **fields)
+
+
+class _NullTelemetry:
+    """Stand-in when no telemetry is being collected"""
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def record(self, key, value):
+        pass
+
+    def summary(self):
+        return {}
+
+
+NULL_TELEMETRY = _NullTelemetry()
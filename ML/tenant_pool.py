@@ -0,0 +1,216 @@
+"""
+Per-Hospital Model Pool
+Hospital-specific models loaded on first use from <root>/<hospital_id>/ and
+kept in a memory-bounded LRU pool, for hospitals whose patient populations
+differ from the one the global model was trained on
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime
+
+from predict import ReportPredictor
+
+logger = logging.getLogger(__name__)
+
+# Hospital ids become directory names, so only plain names are accepted
+TENANT_ID_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_-]{0,127}$')
+
+
+class TenantModelError(RuntimeError):
+    """A hospital's model directory exists but its model could not be loaded"""
+
+
+class TenantModelPool:
+    """
+    Hospital models, loaded lazily and evicted least recently used first.
+
+    get(hospital_id) returns the hospital's ReportPredictor, loading
+    <root_dir>/<hospital_id>/ on first use, or None when the hospital has
+    no model directory (callers then use the global model). Concurrent
+    first requests for the same hospital share one load, and a failed load
+    is not retried for retry_failed_after seconds (requests in between get
+    the same TenantModelError). Least recently used models are dropped
+    until the pool's tree arrays and explainer tables fit in max_bytes (and
+    it holds at most max_models models); the model just used is always
+    kept. Explainer tables are built on a model's first explained request
+    and counted from its next lookup. Requests still scoring with an
+    evicted model keep it alive until they finish.
+    """
+
+    def __init__(self, root_dir, max_bytes=512 * 1024 ** 2, max_models=None,
+                 retry_failed_after=60.0, **predictor_options):
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self.max_models = max_models
+        self.retry_failed_after = retry_failed_after
+        self.predictor_options = predictor_options
+
+        self._models = OrderedDict()
+        self._loading = {}
+        # hospital_id -> (time.monotonic() of the failure, error message)
+        self._failures = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.stats = {
+            'hits': 0,
+            'loads': 0,
+            'load_waits': 0,
+            'load_failures': 0,
+            'failed_load_skips': 0,
+            'evictions': 0,
+            'fallbacks': 0,
+            'load_seconds': 0.0,
+        }
+
+    def model_dir(self, hospital_id):
+        if not TENANT_ID_PATTERN.match(hospital_id):
+            raise ValueError(f"Invalid hospital id: {hospital_id!r}")
+        return os.path.join(self.root_dir, hospital_id)
+
+    def _hit(self, hospital_id):
+        """Cached predictor (marked most recently used), or None; call with the lock held"""
+        entry = self._models.get(hospital_id)
+        if entry is None:
+            return None
+        self._models.move_to_end(hospital_id)
+        self.stats['hits'] += 1
+        # The explainer may have been built since the last lookup
+        size = entry['predictor'].bundle.loaded_bytes
+        if size != entry['memory_bytes']:
+            self.bytes += size - entry['memory_bytes']
+            entry['memory_bytes'] = size
+            for victim in self._evict(keep=hospital_id):
+                logger.info(f"Model for hospital {victim} evicted from the pool")
+        return entry['predictor']
+
+    def get(self, hospital_id):
+        """
+        The hospital's predictor, or None if it has no model of its own
+        Raises:
+            ValueError for an invalid hospital id, TenantModelError if the
+            hospital's model fails to load
+        """
+        with self._lock:
+            predictor = self._hit(hospital_id)
+        if predictor is not None:
+            return predictor
+
+        model_dir = self.model_dir(hospital_id)
+        if not os.path.isdir(model_dir):
+            with self._lock:
+                self.stats['fallbacks'] += 1
+            return None
+
+        with self._lock:
+            predictor = self._hit(hospital_id)
+            if predictor is not None:
+                return predictor
+            failure = self._failures.get(hospital_id)
+            if failure is not None and time.monotonic() - failure[0] < self.retry_failed_after:
+                self.stats['failed_load_skips'] += 1
+                raise TenantModelError(failure[1])
+            future = self._loading.get(hospital_id)
+            loading = future is None
+            if loading:
+                future = self._loading[hospital_id] = Future()
+            else:
+                self.stats['load_waits'] += 1
+
+        if not loading:
+            return future.result()
+
+        try:
+            predictor = self._load(hospital_id, model_dir)
+        except Exception as e:
+            error = TenantModelError(f"Model for hospital {hospital_id} could not be loaded: {e}")
+            with self._lock:
+                self._loading.pop(hospital_id, None)
+                self._failures[hospital_id] = (time.monotonic(), str(error))
+                self.stats['load_failures'] += 1
+            logger.error(f"Loading model for hospital {hospital_id} from {model_dir} failed: {e}")
+            future.set_exception(error)
+            raise error from e
+        future.set_result(predictor)
+        return predictor
+
+    def _load(self, hospital_id, model_dir):
+        start = time.perf_counter()
+        predictor = ReportPredictor(model_dir=model_dir, **self.predictor_options)
+        size = predictor.bundle.loaded_bytes
+        seconds = time.perf_counter() - start
+
+        with self._lock:
+            self._models[hospital_id] = {
+                'predictor': predictor,
+                'memory_bytes': size,
+                'loaded_at': datetime.now().isoformat(),
+            }
+            self.bytes += size
+            self._loading.pop(hospital_id, None)
+            self._failures.pop(hospital_id, None)
+            self.stats['loads'] += 1
+            self.stats['load_seconds'] += seconds
+            evicted = self._evict(keep=hospital_id)
+
+        logger.info(f"Model for hospital {hospital_id} loaded in {seconds:.2f}s ({size} bytes)")
+        for victim in evicted:
+            logger.info(f"Model for hospital {victim} evicted from the pool")
+        return predictor
+
+    def _evict(self, keep):
+        """Drop least recently used models until the pool fits; call with the lock held"""
+        evicted = []
+        while len(self._models) > 1 and (
+            self.bytes > self.max_bytes or
+            (self.max_models is not None and len(self._models) > self.max_models)
+        ):
+            victim = next(iter(self._models))
+            if victim == keep:
+                self._models.move_to_end(victim)
+                continue
+            self.bytes -= self._models.pop(victim)['memory_bytes']
+            self.stats['evictions'] += 1
+            evicted.append(victim)
+        return evicted
+
+    def evict(self, hospital_id):
+        """Drop a hospital's model (or its failed load), e.g. after its directory is replaced"""
+        with self._lock:
+            self._failures.pop(hospital_id, None)
+            entry = self._models.pop(hospital_id, None)
+            if entry is not None:
+                self.bytes -= entry['memory_bytes']
+                self.stats['evictions'] += 1
+        return entry is not None
+
+    def describe(self):
+        """Pooled models in LRU order (least recent first), budget and counters"""
+        with self._lock:
+            models = {
+                hospital_id: {
+                    'bundle_id': entry['predictor'].bundle.bundle_id,
+                    'memory_bytes': entry['memory_bytes'],
+                    'loaded_at': entry['loaded_at'],
+                }
+                for hospital_id, entry in self._models.items()
+            }
+            stats = dict(self.stats)
+            pooled_bytes = self.bytes
+
+        lookups = stats['hits'] + stats['loads'] + stats['load_waits']
+        if lookups:
+            stats['hit_rate'] = stats['hits'] / lookups
+        return {
+            'root_dir': self.root_dir,
+            'max_bytes': self.max_bytes,
+            'max_models': self.max_models,
+            'bytes': pooled_bytes,
+            'models': models,
+            'stats': stats,
+        }
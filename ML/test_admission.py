@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""Test request deadlines and admission control"""
+
+import sys
+import time
+
+import pytest
+
+from admission import (
+    AdmissionController, DeadlineExceeded, check_deadline, parse_deadline, reset_deadline, set_deadline
+)
+
+
+def test_parse_deadline_headers():
+    assert parse_deadline({}) is None
+    assert parse_deadline({'X-Request-Deadline': '1700000000.5'}) == 1700000000.5
+    assert parse_deadline({'X-Request-Timeout-Ms': '250'}, now=100.0) == pytest.approx(100.25)
+    with pytest.raises(ValueError):
+        parse_deadline({'X-Request-Timeout-Ms': 'soon'})
+
+
+@pytest.mark.parametrize('header, value', [
+    ('X-Request-Deadline', 'nan'),
+    ('X-Request-Deadline', 'inf'),
+    ('X-Request-Deadline', '-1'),
+    ('X-Request-Timeout-Ms', 'nan'),
+    ('X-Request-Timeout-Ms', 'Infinity'),
+    ('X-Request-Timeout-Ms', '-inf'),
+    ('X-Request-Timeout-Ms', '0'),
+    ('X-Request-Timeout-Ms', '-250'),
+])
+def test_rejects_non_finite_and_non_positive_deadlines(header, value):
+    with pytest.raises(ValueError, match=header):
+        parse_deadline({header: value}, now=100.0)
+
+
+def test_check_deadline_uses_the_current_request():
+    check_deadline('inference')  # no deadline set
+    token = set_deadline(time.time() - 1)
+    try:
+        with pytest.raises(DeadlineExceeded) as error:
+            check_deadline('inference')
+        assert error.value.stage == 'inference'
+    finally:
+        reset_deadline(token)
+    check_deadline('inference')
+
+
+def test_sheds_beyond_in_flight_limit():
+    admission = AdmissionController(max_in_flight=2)
+    first, second = admission.admit(), admission.admit()
+    assert admission.admit() == ('shed_in_flight', None)
+    admission.release(first[1])
+    assert admission.admit()[0] is None
+    admission.release(second[1])
+    assert admission.describe()['shed_in_flight'] == 1
+
+
+def test_sheds_on_latency_only_while_busy():
+    admission = AdmissionController(max_latency_ms=10)
+    admission.latency_ewma = 0.5
+    # Nothing in flight: admitted, so the average can recover
+    reason, start = admission.admit()
+    assert reason is None
+    assert admission.admit() == ('shed_latency', None)
+    admission.release(start)
+    assert admission.latency_ewma < 0.5
+
+
+def test_expired_on_arrival():
+    admission = AdmissionController()
+    assert admission.admit(deadline=time.time() - 1) == ('expired_on_arrival', None)
+    assert admission.describe()['in_flight'] == 0
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
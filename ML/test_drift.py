@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""Test input drift profiles and the drift monitor"""
+
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from drift import DriftMonitor, DriftProfile, population_stability_index
+from input_schema import InputSchema
+
+
+@pytest.fixture(scope='module')
+def reference():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'Age': rng.normal(50, 10, 5000),
+        'Fever': rng.integers(0, 2, 5000),
+        'Gender': rng.choice(['Female', 'Male'], 5000),
+    })
+    return DriftProfile.from_columns(df, len(df), ['Age', 'Fever'], {'Gender': ['Female', 'Male']})
+
+
+def test_reference_bins(reference):
+    assert reference.n_rows == 5000
+    assert len(reference.numeric_edges['Age']) == 9
+    # Discrete fields get one bin per value
+    assert reference.numeric_edges['Fever'].tolist() == [0.0, 1.0]
+    assert reference.counts['Fever'][0] == 0 and reference.counts['Fever'][1:3].sum() == 5000
+    assert reference.counts['Gender'][:2].sum() == 5000
+
+    restored = DriftProfile.from_dict(json.loads(json.dumps(reference.to_dict())))
+    for col, counts in reference.counts.items():
+        np.testing.assert_array_equal(restored.counts[col], counts)
+
+
+def test_monitor_scores_shifted_traffic(reference):
+    rng = np.random.default_rng(1)
+    monitor = DriftMonitor(reference, window_rows=1000)
+    assert monitor.report()['status'] == 'insufficient_data'
+
+    same = {'Age': rng.normal(50, 10, 2000), 'Fever': rng.integers(0, 2, 2000).astype(float),
+            'Gender': np.array(rng.choice(['Female', 'Male'], 2000), dtype=object)}
+    monitor.observe(same, 2000)
+    report = monitor.report()
+    assert report['status'] == 'stable'
+    assert report['fields']['Age']['ks'] < 0.1
+
+    monitor.reset()
+    shifted = {'Age': same['Age'] + 20, 'Fever': same['Fever'],
+               'Gender': np.array([None] * 2000, dtype=object)}
+    monitor.observe(shifted, 2000)
+    report = monitor.report()
+    assert report['fields']['Age']['status'] == 'significant'
+    assert report['fields']['Fever']['status'] == 'stable'
+    assert report['fields']['Gender']['missing_rate'] == 1.0
+
+
+def test_unseen_categories_count_as_other(reference):
+    schema = InputSchema(['Age', 'Fever'], {'Gender': ['Female', 'Male']})
+    batch = schema.validate([{'Age': 40, 'Gender': 'Robot'}, {'Age': 41, 'Gender': None}, {'Age': 42, 'Gender': 'male'}])
+    assert batch.columns['Gender'].tolist() == [None, None, 'Male']
+    assert batch.unseen['Gender'].tolist() == [True, False, False]
+
+    monitor = DriftMonitor(reference)
+    monitor.observe(batch.columns, len(batch), batch.unseen)
+    # Bins: Female, Male, other, missing
+    assert monitor.window().counts['Gender'].tolist() == [0, 1, 1, 1]
+
+
+def test_window_memory_is_bounded(reference):
+    monitor = DriftMonitor(reference, window_rows=100)
+    batch = {'Age': np.full(30, 50.0)}
+    for _ in range(20):
+        monitor.observe(batch, 30)
+    report = monitor.report()
+    assert report['observed_rows'] == 600
+    assert 100 <= report['window_rows'] < 200
+
+
+def test_psi_is_zero_for_identical_distributions():
+    counts = np.array([10, 20, 30, 0])
+    assert population_stability_index(counts, counts * 3) == pytest.approx(0.0)
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
@@ -0,0 +1,91 @@
+"""Tree-path explanations: bias plus contributions reproduce predict_proba"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+import explain
+from explain import TreeContributionExplainer
+
+
+@pytest.fixture(scope='module')
+def training_data(dataset):
+    from train_model import ImprovedPatientReportAnalyzer
+    analyzer = ImprovedPatientReportAnalyzer()
+    X, y = analyzer.preprocess_data(pd.read_csv(dataset).head(1500), target_column='Disease')
+    return X, y
+
+
+def assert_additive(model, X):
+    explainer = TreeContributionExplainer(model)
+    probabilities = model.predict_proba(X)
+    assert explainer.n_classes == probabilities.shape[1]
+    for cls in range(probabilities.shape[1]):
+        contributions, bias = explainer.explain(X, np.full(len(X), cls))
+        assert contributions.shape == X.shape
+        np.testing.assert_allclose(bias + contributions.sum(axis=1), probabilities[:, cls], rtol=0, atol=1e-9)
+
+
+def test_forest_contributions_sum_to_probabilities(training_data):
+    X, y = training_data
+    model = RandomForestClassifier(n_estimators=15, random_state=0).fit(X, y)
+    assert_additive(model, X[:500])
+
+
+def test_single_tree_contributions_sum_to_probabilities(training_data):
+    X, y = training_data
+    assert_additive(DecisionTreeClassifier(max_depth=6, random_state=0).fit(X, y), X[:500])
+
+
+def test_rows_explained_in_chunks(training_data, monkeypatch):
+    X, y = training_data
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+    best = model.predict_proba(X).argmax(axis=1)
+    whole = TreeContributionExplainer(model).explain(X, best)
+    monkeypatch.setattr(explain, 'EXPLAIN_CHUNK_SIZE', 64)
+    chunked = TreeContributionExplainer(model).explain(X, best)
+    np.testing.assert_allclose(chunked[0], whole[0], rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(chunked[1], whole[1])
+
+
+@pytest.fixture
+def client(ml_service):
+    return ml_service.app.test_client()
+
+
+def assert_explains(result):
+    explanation = result['explanation']
+    total = explanation['bias'] + sum(explanation['contributions'].values())
+    assert total == pytest.approx(result['probabilities'][result['prediction']], abs=1e-9)
+
+
+def test_predict_explains_predicted_class(client, reports):
+    result = client.post('/predict?explain=true', json=reports[0]).get_json()
+    assert_explains(result)
+    assert 'explanation' not in client.post('/predict', json=reports[0]).get_json()
+
+
+def test_batch_explains_each_report(client, reports):
+    body = client.post('/predict/batch?explain=true', json={'reports': reports[:20]}).get_json()
+    assert len(body['results']) == 20
+    for result in body['results']:
+        assert_explains(result)
+
+
+def test_matrix_batch_explains_each_report(client, reports):
+    body = client.post('/predict/batch?explain=true&format=matrix', json={'reports': reports[:20]}).get_json()
+    explanations = body['explanations']
+    contributions = np.asarray(explanations['contributions'])
+    assert contributions.shape == (20, len(explanations['features']))
+    probabilities = np.asarray(body['probabilities'])
+    predicted = [body['classes'].index(label) for label in body['predictions']]
+    np.testing.assert_allclose(np.asarray(explanations['bias']) + contributions.sum(axis=1),
+                               probabilities[np.arange(20), predicted], rtol=0, atol=1e-9)
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
@@ -0,0 +1,105 @@
+"""
+Training / inference parity of the shared PatientFeatureTransformer,
+including transformers rebuilt from legacy scaler / label encoder files,
+and of the float32 inference path against float64
+"""
+
+import json
+import os
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import PatientFeatureTransformer, load_feature_transformer
+from model_bundle import ModelBundle
+
+
+@pytest.fixture(scope='module')
+def frame(dataset):
+    df = pd.read_csv(dataset).head(1500)
+    X = df.drop(columns=['Disease'])
+    # Missing values exercise the fill values learned at fit time
+    X.iloc[::7, 0] = np.nan
+    X.iloc[::11, X.columns.get_loc(X.select_dtypes(include=['object']).columns[0])] = None
+    return X, df['Disease']
+
+
+def test_transform_matches_training_matrix(frame, tmp_path):
+    from predict import ReportPredictor
+    from sklearn.ensemble import RandomForestClassifier
+    from train_model import ImprovedPatientReportAnalyzer
+
+    X, y = frame
+    analyzer = ImprovedPatientReportAnalyzer()
+    X_train, y_train = analyzer.preprocess_data(X.assign(Disease=y), target_column='Disease')
+
+    np.testing.assert_allclose(analyzer.transformer.transform(X), X_train)
+
+    analyzer.model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X_train, y_train)
+    analyzer.save_model(str(tmp_path))
+    predictor = ReportPredictor(model_dir=str(tmp_path))
+    records = X.astype(object).where(X.notna(), None).to_dict(orient='records')
+    np.testing.assert_allclose(predictor.preprocess_input(records), X_train)
+
+
+def test_from_legacy_matches_fitted_transformer(frame):
+    X, _ = frame
+    fitted = PatientFeatureTransformer(cap_outliers=False)
+    X_train = fitted.fit_transform(X)
+
+    legacy = PatientFeatureTransformer.from_legacy(
+        fitted.scaler_, dict(fitted.encoders_), fitted.feature_names_, fitted.fill_values_
+    )
+    np.testing.assert_allclose(legacy.transform(X), X_train)
+
+
+def test_legacy_model_dir_predicts_like_training(frame, tmp_path):
+    from predict import ReportPredictor
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import LabelEncoder
+
+    X, y = frame
+    fitted = PatientFeatureTransformer(cap_outliers=False)
+    X_train = fitted.fit_transform(X)
+    target = LabelEncoder().fit(y)
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X_train, target.transform(y))
+
+    model_dir = str(tmp_path)
+    joblib.dump(model, os.path.join(model_dir, 'patient_report_model.joblib'))
+    joblib.dump(fitted.scaler_, os.path.join(model_dir, 'scaler.joblib'))
+    joblib.dump({**fitted.encoders_, 'target': target}, os.path.join(model_dir, 'label_encoders.joblib'))
+    with open(os.path.join(model_dir, 'model_metadata.json'), 'w') as f:
+        json.dump({
+            'feature_names': fitted.feature_names_,
+            'fill_values': {col: (value.item() if hasattr(value, 'item') else value)
+                            for col, value in fitted.fill_values_.items()},
+        }, f)
+
+    transformer = load_feature_transformer(model_dir, fitted.feature_names_, fitted.fill_values_)
+    np.testing.assert_allclose(transformer.transform(X), X_train)
+
+    bundle = ModelBundle.load_legacy(model_dir)
+    np.testing.assert_allclose(bundle.transformer.transform(X), X_train)
+
+    predictor = ReportPredictor(model_dir=model_dir)
+    records = X.astype(object).where(X.notna(), None).to_dict(orient='records')
+    labels = [result['prediction'] for result in predictor.predict_batch(records)]
+    assert labels == target.inverse_transform(model.predict(X_train)).tolist()
+
+
+def test_float32_path_predicts_same_labels(small_model_dir, dataset):
+    from predict import ReportPredictor
+
+    df = pd.read_csv(dataset).drop(columns=['Disease']).head(3000)
+    labels64, _, proba64, _ = ReportPredictor(model_dir=small_model_dir).score_frame(df)
+    labels32, _, proba32, _ = ReportPredictor(model_dir=small_model_dir, dtype='float32').score_frame(df)
+
+    assert list(labels32) == list(labels64)
+    np.testing.assert_allclose(proba32, proba64, atol=1e-6)
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
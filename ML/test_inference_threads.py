@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""Test the inference threading policy"""
+
+import sys
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from inference_threads import InferencePolicy
+
+
+@pytest.fixture(scope='module')
+def model():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(500, 6))
+    y = (X[:, 0] + X[:, 1] > 0).astype(int)
+    return RandomForestClassifier(n_estimators=10, n_jobs=-1, random_state=0).fit(X, y)
+
+
+def test_prepare_scores_single_threaded(model):
+    InferencePolicy().prepare(model)
+    assert model.n_jobs == 1
+
+
+def test_parallel_chunks_match_a_single_call(model):
+    X = np.random.default_rng(1).normal(size=(3000, 6))
+    expected = model.predict_proba(X)
+    policy = InferencePolicy(parallel_threshold=1000, max_workers=4)
+    np.testing.assert_array_equal(policy.predict_proba(model, X), expected)
+    # Below the threshold the call stays on the caller's thread
+    np.testing.assert_array_equal(policy.predict_proba(model, X[:999]), expected[:999])
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""Test input schema validation and coercion"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from input_schema import InputSchema, SchemaError, check_batch_body
+
+SCHEMA = InputSchema(['Age', 'BMI'], {'Gender': ['Female', 'Male', 'Unknown']})
+
+
+def test_coerces_numbers_strings_and_categories():
+    batch = SCHEMA.validate([
+        {'Age': 50, 'BMI': '31.5', 'Gender': ' male '},
+        {'Age': True, 'BMI': None, 'Gender': 'Female', 'Ignored': [1, 2]},
+        {'Age': '', 'Gender': 'Robot'},
+    ])
+    assert len(batch) == 3
+    np.testing.assert_array_equal(batch.columns['Age'], [50.0, 1.0, np.nan])
+    np.testing.assert_array_equal(batch.columns['BMI'], [31.5, np.nan, np.nan])
+    # Unseen categories are left for the transformer's fallback
+    assert batch.columns['Gender'].tolist() == ['Male', 'Female', None]
+    assert 'Ignored' not in batch.columns
+
+
+def test_reports_every_invalid_field():
+    with pytest.raises(SchemaError) as error:
+        SCHEMA.validate([{'Age': 'old', 'BMI': float('inf')}, {'Gender': {'x': 1}}, 'report'])
+    problems = {(e['row'], e['field']) for e in error.value.errors}
+    assert problems == {(0, 'Age'), (0, 'BMI'), (1, 'Gender'), (2, None)}
+    assert error.value.to_dict()['error_count'] == 4
+
+
+def test_strict_rejects_missing_and_unseen():
+    assert len(SCHEMA.validate({'Age': 1, 'BMI': 2, 'Gender': 'Robot'})) == 1
+    with pytest.raises(SchemaError) as error:
+        SCHEMA.validate({'Age': 1, 'Gender': 'Robot'}, strict=True)
+    assert {e['field'] for e in error.value.errors} == {'BMI', 'Gender'}
+
+
+def test_partial_keeps_valid_rows():
+    batch, errors = SCHEMA.validate(
+        [{'Age': 1}, {'Age': 'x'}, {'Age': 3}], partial=True
+    )
+    assert batch.columns['Age'].tolist() == [1.0, 3.0]
+    assert [e['row'] for e in errors] == [1]
+
+
+def test_columnar_inputs():
+    df = pd.DataFrame({'Age': [1, 2], 'BMI': [20.0, None], 'Gender': ['Male', 'Female']})
+    batch = SCHEMA.validate(df)
+    np.testing.assert_array_equal(batch.columns['BMI'], [20.0, np.nan])
+
+    batch = SCHEMA.validate_columns({'Age': [1, 2], 'Gender': ['female', 'Male']}, columns=['Gender'])
+    assert batch.columns['Gender'].tolist() == ['Female', 'Male']
+    assert np.isnan(batch.columns['Age']).all()
+
+    with pytest.raises(SchemaError):
+        SCHEMA.validate_columns({'Age': [1, 2], 'BMI': [1]})
+
+
+def test_rejects_reports_without_any_known_field():
+    with pytest.raises(SchemaError):
+        SCHEMA.validate({'Foo': 1})
+    with pytest.raises(SchemaError):
+        SCHEMA.validate_columns({'Foo': [1, 2]})
+    batch, errors = SCHEMA.validate([{'Age': 1}, {'Foo': 1}], partial=True)
+    assert len(batch) == 1 and [e['row'] for e in errors] == [1]
+
+
+@pytest.mark.parametrize('body', [
+    None, 'abc', [{'Age': 1}], {}, {'reports': 'abc'}, {'reports': None}, {'reports': {'Age': 1}},
+    {'reports': [{'Age': 1}, 3]}, {'data': [1, 2, 3]}, {'data': 'abc'}, {'data': {'Age': 'x'}},
+    {'data': {'Age': [1]}, 'columns': 'Age'},
+])
+def test_batch_body_shape(body):
+    with pytest.raises(SchemaError):
+        check_batch_body(body)
+
+
+def test_batch_body_accepts_records_and_columns():
+    check_batch_body({'reports': []})
+    check_batch_body({'reports': [{'Age': 1}]})
+    check_batch_body({'columns': ['Age'], 'data': {'Age': [1, 2], 'BMI': [3, 4]}})
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
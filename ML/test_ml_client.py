@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+"""Test the ML service client SDK against an in-process service"""
+
+import asyncio
+import sys
+
+import pandas as pd
+import pytest
+from flask import Flask, jsonify
+
+from ml_client import HAS_MSGPACK, AsyncMLServiceClient, MLServiceClient, MLServiceError
+
+
+def test_sync_predict_matches_service_model(service, reports):
+    ml_service, url = service
+    expected = ml_service.predictor.predict_batch(reports)
+    with MLServiceClient(url) as client:
+        single = client.predict(reports[0])
+        batch = client.predict_batch(reports)
+    assert single['prediction'] == expected[0]['prediction']
+    assert [r['prediction'] for r in batch] == [r['prediction'] for r in expected]
+
+
+def test_sync_columnar_and_matrix(service, reports):
+    _, url = service
+    df = pd.DataFrame.from_records(reports)
+    with MLServiceClient(url) as client:
+        records = client.predict_batch(reports)
+        columns = client.predict_columns(df)
+        matrix = client.predict_columns(df, response_format='matrix')
+    assert [r['prediction'] for r in columns] == [r['prediction'] for r in records]
+    assert matrix['predictions'] == [r['prediction'] for r in records]
+
+
+@pytest.mark.skipif(not HAS_MSGPACK, reason='msgpack not installed')
+def test_sync_columnar_msgpack(service, reports):
+    _, url = service
+    with MLServiceClient(url) as client, MLServiceClient(url, use_msgpack=True) as packed:
+        expected = client.predict_columns(pd.DataFrame.from_records(reports))
+        results = packed.predict_columns(pd.DataFrame.from_records(reports))
+    assert [r['prediction'] for r in results] == [r['prediction'] for r in expected]
+
+
+def test_sync_client_reuses_connection(service, reports):
+    _, url = service
+    with MLServiceClient(url) as client:
+        for report in reports[:5]:
+            client.predict(report)
+        pools = client.session.get_adapter(url).poolmanager.pools
+        assert sum(pool.num_connections for pool in pools._container.values()) == 1
+
+
+def test_iter_predictions_streams_in_chunks(service, reports):
+    _, url = service
+    with MLServiceClient(url) as client:
+        results = list(client.iter_predictions(iter(reports), chunk_size=16))
+    assert len(results) == len(reports)
+
+
+def test_stream_batch_matches_records(service, reports):
+    ml_service, url = service
+    expected = ml_service.predictor.predict_batch(reports)
+    df = pd.DataFrame.from_records(reports)
+    with MLServiceClient(url) as client:
+        streamed = list(client.stream_batch(reports))
+        columns = list(client.stream_columns(df))
+    assert [r['prediction'] for r in streamed] == [r['prediction'] for r in expected]
+    assert [r['prediction'] for r in columns] == [r['prediction'] for r in expected]
+
+    bad = [dict(reports[0]), dict(reports[1], Age='old')]
+    with MLServiceClient(url) as client:
+        results = list(client.stream_batch(bad))
+    assert results[0]['status'] == 'success' and results[1]['status'] == 'error'
+
+
+def test_unknown_model_version_raises(service, reports):
+    _, url = service
+    with MLServiceClient(url) as client:
+        with pytest.raises(MLServiceError) as error:
+            client.predict(reports[0], model_version='missing')
+    assert error.value.status_code == 404
+
+
+def test_retries_503_with_backoff(serve_app):
+    calls = {'count': 0}
+    app = Flask('flaky')
+
+    @app.route('/health')
+    def health():
+        calls['count'] += 1
+        if calls['count'] < 3:
+            return jsonify({'status': 'error', 'message': 'loading'}), 503
+        return jsonify({'status': 'healthy'})
+
+    url = serve_app(app)
+    with MLServiceClient(url, max_retries=3, backoff_factor=0.01) as client:
+        assert client.health()['status'] == 'healthy'
+    assert calls['count'] == 3
+
+    calls['count'] = -10
+    with MLServiceClient(url, max_retries=2, backoff_factor=0.01) as client:
+        with pytest.raises(MLServiceError) as error:
+            client.health()
+    assert error.value.status_code == 503
+
+
+def test_async_predict_coalesces_into_batches(service, reports):
+    ml_service, url = service
+    expected = [r['prediction'] for r in ml_service.predictor.predict_batch(reports)]
+
+    async def run(max_batch_size):
+        async with AsyncMLServiceClient(url, max_concurrency=4, max_batch_size=max_batch_size) as client:
+            results = await asyncio.gather(*(client.predict(report) for report in reports))
+            return results, client.stats
+
+    results, stats = asyncio.run(run(max_batch_size=256))
+    assert [r['prediction'] for r in results] == expected
+    assert stats == {'predict_calls': len(reports), 'batch_requests': 1}
+
+    results, stats = asyncio.run(run(max_batch_size=16))
+    assert [r['prediction'] for r in results] == expected
+    assert stats['batch_requests'] == 4
+
+
+def test_async_batches_by_options(service, reports):
+    _, url = service
+
+    async def run():
+        async with AsyncMLServiceClient(url) as client:
+            plain = [client.predict(report) for report in reports[:10]]
+            top = [client.predict(report, top_k=1) for report in reports[:10]]
+            results = await asyncio.gather(*plain, *top)
+            return results, client.stats
+
+    results, stats = asyncio.run(run())
+    assert stats['batch_requests'] == 2
+    assert all(len(r['probabilities']) == 1 for r in results[10:])
+
+
+def test_async_errors_reach_every_caller(service, reports):
+    _, url = service
+
+    async def run():
+        async with AsyncMLServiceClient(url) as client:
+            return await asyncio.gather(
+                *(client.predict(report, model_version='missing') for report in reports[:3]),
+                return_exceptions=True
+            )
+
+    errors = asyncio.run(run())
+    assert all(isinstance(e, MLServiceError) and e.status_code == 404 for e in errors)
+
+
+def test_async_columnar_and_matrix(service, reports):
+    _, url = service
+    df = pd.DataFrame.from_records(reports)
+
+    async def run():
+        async with AsyncMLServiceClient(url) as client:
+            return await asyncio.gather(
+                client.predict_batch(reports),
+                client.predict_columns(df),
+                client.predict_columns(df, response_format='matrix'),
+            )
+
+    records, columns, matrix = asyncio.run(run())
+    assert [r['prediction'] for r in columns] == [r['prediction'] for r in records]
+    assert matrix['predictions'] == [r['prediction'] for r in records]
+
+
+def test_async_stream_batch_and_columns(service, reports):
+    ml_service, url = service
+    expected = [r['prediction'] for r in ml_service.predictor.predict_batch(reports)]
+    bad = [dict(reports[0]), dict(reports[1], Age='old')]
+
+    async def run():
+        async with AsyncMLServiceClient(url) as client:
+            streamed = [result async for result in client.stream_batch(reports)]
+            columns = [result async for result in client.stream_columns(pd.DataFrame.from_records(reports))]
+            mixed = [result async for result in client.stream_batch(bad)]
+            return streamed, columns, mixed
+
+    streamed, columns, mixed = asyncio.run(run())
+    assert [r['prediction'] for r in streamed] == expected
+    assert [r['prediction'] for r in columns] == expected
+    assert [r['status'] for r in mixed] == ['success', 'error']
+
+
+def test_async_stream_closed_early_frees_its_slot(service, reports):
+    _, url = service
+
+    async def run():
+        async with AsyncMLServiceClient(url, max_concurrency=1) as client:
+            stream = client.stream_batch(reports)
+            first = await stream.__anext__()
+            await stream.aclose()
+            # With the only slot released, the next request can run
+            return first, await asyncio.wait_for(client.health(), timeout=10)
+
+    first, health = asyncio.run(run())
+    assert first['status'] == 'success'
+    assert health['status'] == 'healthy'
+
+
+def test_async_stream_errors(service, reports):
+    _, url = service
+
+    async def run():
+        async with AsyncMLServiceClient(url) as client:
+            return [result async for result in client.stream_batch(reports, model_version='missing')]
+
+    with pytest.raises(MLServiceError) as error:
+        asyncio.run(run())
+    assert error.value.status_code == 404
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
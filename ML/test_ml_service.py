@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""Test the ML service endpoints through the Flask test client"""
+
+import json
+import sys
+import time
+
+import pytest
+
+
+@pytest.fixture
+def client(ml_service):
+    return ml_service.app.test_client()
+
+
+def test_invalid_report_rejected_with_field_errors(client, reports):
+    response = client.post('/predict', json=dict(reports[0], Age='old'))
+    assert response.status_code == 400
+    assert response.get_json()['errors'][0]['field'] == 'Age'
+
+    response = client.post('/predict/batch', json={'reports': [reports[0], dict(reports[1], BMI=[1])]})
+    results = response.get_json()['results']
+    assert [r['status'] for r in results] == ['success', 'error']
+    assert results[1]['errors'][0]['field'] == 'BMI'
+
+
+@pytest.mark.parametrize('format_query', ['', '?format=ndjson'])
+@pytest.mark.parametrize('body', [
+    {'reports': 'abc'}, {'reports': None}, {'reports': {'Age': 50}}, {'data': [1, 2, 3]}, {'data': 'abc'},
+    {'data': {'Foo': [1]}}, 'abc',
+])
+def test_malformed_batches_are_rejected(client, body, format_query):
+    response = client.post('/predict/batch' + format_query, json=body)
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
+
+
+def test_report_without_known_fields_is_rejected(client):
+    assert client.post('/predict', json={'Foo': 1}).status_code == 400
+
+
+def test_drift_report_counts_traffic(client, reports):
+    before = client.get('/drift').get_json()['observed_rows']
+    client.post('/predict/batch', json={'reports': reports})
+    report = client.get('/drift').get_json()
+    assert report['observed_rows'] == before + len(reports)
+    assert set(report['fields']) >= {'Age', 'Gender'}
+
+
+def test_expired_deadlines_are_dropped(ml_service, client, reports):
+    before = ml_service.admission.describe()
+    expired = client.post('/predict', json=reports[0], headers={'X-Request-Deadline': str(time.time() - 1)})
+    assert expired.status_code == 504
+    in_time = client.post('/predict', json=reports[0], headers={'X-Request-Timeout-Ms': '30000'})
+    assert in_time.status_code == 200
+    after = ml_service.admission.describe()
+    assert after['expired_on_arrival'] == before['expired_on_arrival'] + 1
+    assert after['in_flight'] == 0
+
+
+@pytest.mark.parametrize('headers', [
+    {'X-Request-Deadline': 'nan'},
+    {'X-Request-Timeout-Ms': 'inf'},
+    {'X-Request-Timeout-Ms': '0'},
+])
+def test_invalid_deadlines_are_rejected(client, reports, headers):
+    response = client.post('/predict', json=reports[0], headers=headers)
+    assert response.status_code == 400
+
+
+def test_stream_sends_chunks_as_they_are_scored(ml_service, client, reports, monkeypatch):
+    monkeypatch.setattr(ml_service, 'STREAM_CHUNK_ROWS', 16)
+    response = client.post('/predict/batch', json={'reports': reports * 4},
+                           headers={'Accept': 'application/x-ndjson'})
+    assert response.mimetype == 'application/x-ndjson'
+    chunks = [chunk for chunk in response.response if chunk]
+    # Chunks are capped at 16 rows, so 200 rows go out in 13
+    assert len(chunks) == 13
+    assert sum(chunk.count(b'\n') for chunk in chunks) == 200
+
+    def failing():
+        yield [{'prediction': 'Flu'}]
+        raise RuntimeError('scoring failed')
+    lines = [json.loads(line) for line in b''.join(ml_service.ndjson_stream(failing())).splitlines()]
+    assert lines[-1]['aborted'] and lines[-1]['completed'] == 1
+
+    expired = client.post('/predict/batch?format=ndjson', json={'reports': reports},
+                          headers={'X-Request-Deadline': str(time.time() - 1)})
+    assert expired.status_code == 504
+
+
+def test_profile_endpoint_needs_admin_token(ml_service, client, monkeypatch):
+    monkeypatch.setattr(ml_service, 'PROFILE_ADMIN_TOKEN', None)
+    assert client.get('/admin/profile').status_code == 404
+
+    monkeypatch.setattr(ml_service, 'PROFILE_ADMIN_TOKEN', 's3cret')
+    assert client.get('/admin/profile').status_code == 403
+    assert client.get('/admin/profile', headers={'X-Admin-Token': 's3cre'}).status_code == 403
+    # Past the token check, the unprofiled service reports profiling as off
+    response = client.get('/admin/profile', headers={'X-Admin-Token': 's3cret'})
+    assert response.status_code == 404
+    assert 'PROFILE_SAMPLE_EVERY' in response.get_json()['message']
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
@@ -0,0 +1,102 @@
+"""Model bundle integrity checks and atomic writes"""
+
+import json
+import os
+import sys
+import zipfile
+
+import pytest
+
+from model_bundle import (BUNDLE_FILE, MANIFEST_MEMBER, METADATA_MEMBER, MODEL_MEMBER,
+                          ModelBundle, write_bundle)
+
+
+def rewrite(path, **replace):
+    """Copy a bundle with some members replaced, as a corrupted or edited file would be"""
+    with zipfile.ZipFile(path) as archive:
+        members = {name: archive.read(name) for name in archive.namelist()}
+    members.update(replace)
+    with zipfile.ZipFile(path, 'w') as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+
+
+@pytest.fixture
+def bundle_path(small_model_dir, tmp_path):
+    path = str(tmp_path / BUNDLE_FILE)
+    with open(os.path.join(small_model_dir, BUNDLE_FILE), 'rb') as src, open(path, 'wb') as dst:
+        dst.write(src.read())
+    return path
+
+
+def test_loads_untouched_bundle(bundle_path):
+    bundle = ModelBundle.load(bundle_path)
+    assert bundle.bundle_id and bundle.classes
+
+
+def test_rejects_tampered_member(bundle_path):
+    with zipfile.ZipFile(bundle_path) as archive:
+        metadata = json.loads(archive.read(METADATA_MEMBER))
+    metadata['accuracy'] = 1.0
+    rewrite(bundle_path, **{METADATA_MEMBER: json.dumps(metadata).encode('utf-8')})
+
+    with pytest.raises(ValueError, match=f'Checksum mismatch for {METADATA_MEMBER}'):
+        ModelBundle.load(bundle_path)
+
+
+def test_rejects_tampered_manifest_checksum(bundle_path):
+    with zipfile.ZipFile(bundle_path) as archive:
+        manifest = json.loads(archive.read(MANIFEST_MEMBER))
+    manifest['files'][MODEL_MEMBER]['sha256'] = '0' * 64
+    rewrite(bundle_path, **{MANIFEST_MEMBER: json.dumps(manifest).encode('utf-8')})
+
+    with pytest.raises(ValueError, match=f'Checksum mismatch for {MODEL_MEMBER}'):
+        ModelBundle.load(bundle_path)
+
+
+def test_rejects_newer_schema_version(bundle_path):
+    with zipfile.ZipFile(bundle_path) as archive:
+        manifest = json.loads(archive.read(MANIFEST_MEMBER))
+    manifest['schema_version'] += 1
+    rewrite(bundle_path, **{MANIFEST_MEMBER: json.dumps(manifest).encode('utf-8')})
+
+    with pytest.raises(ValueError, match='newer than supported'):
+        ModelBundle.load(bundle_path)
+
+
+def test_failed_write_keeps_previous_bundle(bundle_path, monkeypatch):
+    bundle = ModelBundle.load(bundle_path)
+    with open(bundle_path, 'rb') as f:
+        before = f.read()
+
+    original = zipfile.ZipFile.writestr
+
+    def fail_after_manifest(archive, name, data, *args, **kwargs):
+        if name != MANIFEST_MEMBER:
+            raise OSError('disk full')
+        return original(archive, name, data, *args, **kwargs)
+
+    monkeypatch.setattr(zipfile.ZipFile, 'writestr', fail_after_manifest)
+    with pytest.raises(OSError, match='disk full'):
+        write_bundle(bundle_path, bundle.model, bundle.transformer, bundle.label_encoders, bundle.metadata)
+    monkeypatch.undo()
+
+    with open(bundle_path, 'rb') as f:
+        assert f.read() == before
+    assert os.listdir(os.path.dirname(bundle_path)) == [BUNDLE_FILE]
+    assert ModelBundle.load(bundle_path).bundle_id == bundle.bundle_id
+
+
+def test_write_replaces_bundle(bundle_path):
+    bundle = ModelBundle.load(bundle_path)
+    metadata = {**bundle.metadata, 'note': 'retrained'}
+    manifest = write_bundle(bundle_path, bundle.model, bundle.transformer, bundle.label_encoders, metadata)
+
+    reloaded = ModelBundle.load(bundle_path)
+    assert reloaded.bundle_id == manifest['bundle_id'] != bundle.bundle_id
+    assert reloaded.metadata['note'] == 'retrained'
+    assert os.listdir(os.path.dirname(bundle_path)) == [BUNDLE_FILE]
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
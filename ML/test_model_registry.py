@@ -0,0 +1,147 @@
+"""Model version routing, canary split and shadow comparison"""
+
+import random
+import sys
+import threading
+import time
+
+import pytest
+
+from model_registry import ModelRegistry
+
+
+@pytest.fixture(scope='module')
+def registry(small_model_dir):
+    registry = ModelRegistry(max_pending_shadow=2)
+    registry.load('v1', small_model_dir)
+    registry.load('v2', small_model_dir)
+    return registry
+
+
+def flush_shadow(registry):
+    """Wait for queued shadow work; the shadow executor runs one job at a time, in order"""
+    registry._shadow_executor.submit(lambda: None).result(timeout=30)
+
+
+def test_first_version_is_primary(registry):
+    registry.set_routing(primary='v1')
+    assert registry.route() == ('v1', registry.get('v1'))
+
+
+def test_canary_gets_its_share(registry):
+    registry.set_routing(primary='v1', canary='v2', canary_percent=20)
+    random.seed(0)
+    routed = [registry.route()[0] for _ in range(5000)]
+    assert routed.count('v2') / len(routed) == pytest.approx(0.2, abs=0.02)
+    assert set(routed) == {'v1', 'v2'}
+
+
+def test_requested_version_is_pinned(registry):
+    registry.set_routing(primary='v1', canary='v2', canary_percent=100)
+    assert {registry.route('v1')[0] for _ in range(50)} == {'v1'}
+    registry.set_routing(primary='v1')
+    assert registry.route('v2') == ('v2', registry.get('v2'))
+    with pytest.raises(KeyError):
+        registry.route('v3')
+
+
+def test_routing_rejects_unknown_versions(registry):
+    with pytest.raises(KeyError):
+        registry.set_routing(canary='v3', canary_percent=10)
+    with pytest.raises(ValueError):
+        registry.set_routing(canary='v2', canary_percent=150)
+
+
+def test_shadow_stats(registry):
+    registry.set_routing(primary='v1', shadow='v2')
+    before = dict(registry.shadow_stats)
+    primary = [{'prediction': 'Flu'}, {'prediction': 'Healthy'}, {'prediction': 'Diabetes'}]
+    shadow = [{'prediction': 'Flu'}, {'prediction': 'Obesity'}, {'prediction': 'Diabetes'}]
+
+    registry.submit_shadow(lambda predictor: shadow, 'v1', primary, 0.01)
+    registry.submit_shadow(lambda predictor: 1 / 0, 'v1', primary, 0.01)
+    # Requests served by the shadow version itself are not compared
+    registry.submit_shadow(lambda predictor: shadow, 'v2', primary, 0.01)
+    flush_shadow(registry)
+
+    stats = registry.shadow_stats
+    assert stats['compared'] - before['compared'] == 3
+    assert stats['agreed'] - before['agreed'] == 2
+    assert stats['errors'] - before['errors'] == 1
+    assert registry.describe()['shadow_stats']['agreement'] == stats['agreed'] / stats['compared']
+
+
+def test_shadow_backlog_drops_without_blocking(registry):
+    registry.set_routing(primary='v1', shadow='v2')
+    release = threading.Event()
+    before = dict(registry.shadow_stats)
+
+    def slow(predictor):
+        release.wait(timeout=30)
+        return [{'prediction': 'Flu'}]
+
+    start = time.perf_counter()
+    for _ in range(5):
+        registry.submit_shadow(slow, 'v1', [{'prediction': 'Flu'}], 0.01)
+    assert time.perf_counter() - start < 1.0
+    assert registry.shadow_stats['dropped'] - before['dropped'] == 3
+
+    release.set()
+    flush_shadow(registry)
+    assert registry.shadow_stats['compared'] - before['compared'] == 2
+    assert registry._pending_shadow == 0
+
+
+@pytest.fixture
+def two_versions(ml_service, small_model_dir):
+    """The service with a second version loaded; routing is restored afterwards"""
+    registry = ml_service.registry
+    primary = registry.primary
+    registry.load('candidate', small_model_dir, **ml_service.PREDICTOR_OPTIONS)
+    yield registry
+    flush_shadow(registry)
+    registry.set_routing(primary=primary)
+    registry.unload('candidate')
+
+
+def test_service_pins_version_from_header(ml_service, two_versions, reports):
+    client = ml_service.app.test_client()
+    response = client.post('/predict', json=reports[0], headers={'X-Model-Version': 'candidate'})
+    assert response.status_code == 200
+    assert response.headers['X-Model-Version'] == 'candidate'
+    assert client.post('/predict', json=reports[0]).headers['X-Model-Version'] == two_versions.primary
+    unknown = client.post('/predict', json=reports[0], headers={'X-Model-Version': 'nope'})
+    assert unknown.status_code == 404
+
+
+def test_service_shadow_is_not_counted_as_served_drift(ml_service, two_versions, reports, monkeypatch):
+    registry = two_versions
+    registry.set_routing(primary=registry.primary, shadow='candidate')
+    client = ml_service.app.test_client()
+    candidate = registry.get('candidate')
+    served_before = candidate.drift.observed_rows
+
+    before = dict(registry.shadow_stats)
+    for report in reports[:5]:
+        assert client.post('/predict', json=report).status_code == 200
+    flush_shadow(registry)
+    assert registry.shadow_stats['compared'] - before['compared'] == 5
+    assert registry.shadow_stats['agreed'] - before['agreed'] == 5
+    assert candidate.drift.observed_rows == served_before
+
+    # A stuck shadow model costs comparisons, not /predict latency
+    release = threading.Event()
+    monkeypatch.setattr(registry._versions['candidate']['shadow_predictor'], 'predict',
+                        lambda *args, **kwargs: release.wait(timeout=30))
+    monkeypatch.setattr(registry, 'max_pending_shadow', 1)
+    dropped = registry.shadow_stats['dropped']
+    start = time.perf_counter()
+    for report in reports[:5]:
+        assert client.post('/predict', json=report).status_code == 200
+    assert time.perf_counter() - start < 5.0
+    assert registry.shadow_stats['dropped'] - dropped == 4
+    release.set()
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
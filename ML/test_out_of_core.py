@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""Test out-of-core preprocessing and training"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from out_of_core import build_memmap_dataset, fit_streaming_transformer
+
+# Several chunks of the smallest size chunk_rows() hands out
+N_ROWS = 3500
+CHUNK_ROWS = 1000
+
+
+@pytest.fixture(scope='module')
+def csv_path(dataset):
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'reports.csv')
+        pd.read_csv(dataset).head(N_ROWS).to_csv(path, index=False)
+        yield path
+
+
+def test_memmap_matrix_matches_in_memory_transform(csv_path):
+    transformer, target_encoder, target_column, n_rows, _ = fit_streaming_transformer(
+        csv_path, 'Disease', CHUNK_ROWS
+    )
+    assert n_rows == N_ROWS
+    with tempfile.TemporaryDirectory() as workdir:
+        X_train, y_train, X_test, y_test = build_memmap_dataset(
+            csv_path, transformer, target_encoder, target_column, n_rows, CHUNK_ROWS, workdir
+        )
+        assert len(X_train) + len(X_test) == N_ROWS
+        assert X_train.shape[1] == len(transformer.feature_names_)
+
+        # Rows go to the test split by the same seeded draw
+        df = pd.read_csv(csv_path)
+        is_test = np.random.default_rng(42).random(N_ROWS) < 0.2
+        expected = transformer.transform(df[is_test].drop(columns=['Disease']))
+        np.testing.assert_allclose(X_test, expected, rtol=1e-5, atol=1e-5)
+        np.testing.assert_array_equal(y_test, target_encoder.transform(df['Disease'][is_test].astype(str)))
+        del X_train, y_train, X_test, y_test
+
+
+def test_train_out_of_core_end_to_end(csv_path, reports):
+    from predict import ReportPredictor
+    from train_model import ImprovedPatientReportAnalyzer
+
+    analyzer = ImprovedPatientReportAnalyzer()
+    with tempfile.TemporaryDirectory() as workdir:
+        # The smallest budget still streams in CHUNK_ROWS chunks
+        results = analyzer.train_out_of_core(csv_path, 'Disease', memory_budget_mb=1, workdir=workdir)
+        assert 0.0 <= results['test_metrics']['accuracy'] <= 1.0
+        analyzer.save_model(os.path.join(workdir, 'model'))
+        predictor = ReportPredictor(model_dir=os.path.join(workdir, 'model'))
+    assert predictor.metadata['drift_reference']['n_rows'] == N_ROWS
+    results = predictor.predict_batch(reports)
+    assert all(result['status'] == 'success' for result in results)
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""Test inference performance baselines and the regression comparison"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+import pytest
+
+import benchmark
+import perf_baseline
+from perf_baseline import SCHEMA_VERSION, compare, load_baseline, measure_model, print_comparison, save_baseline
+
+
+def document(**metrics):
+    return {'schema_version': SCHEMA_VERSION, 'environment': {}, 'metrics': metrics}
+
+
+def test_compare_flags_regressions_in_either_direction():
+    baseline = document(**{'batch_32.p50_ms': 10.0, 'batch_32.rows_per_s': 1000.0, 'rss_bytes': 100.0})
+    current = document(**{'batch_32.p50_ms': 13.0, 'batch_32.rows_per_s': 700.0, 'rss_bytes': 90.0})
+    rows = {row['metric']: row for row in compare(baseline, current, threshold=0.2)}
+    assert rows['batch_32.p50_ms']['change'] == pytest.approx(0.3)
+    assert rows['batch_32.p50_ms']['regressed']
+    # Lower throughput is worse
+    assert rows['batch_32.rows_per_s']['change'] == pytest.approx(0.3)
+    assert rows['batch_32.rows_per_s']['regressed']
+    assert not rows['rss_bytes']['regressed']
+    assert not any(row['regressed'] for row in compare(baseline, current, threshold=0.5))
+
+
+def test_metric_missing_from_current_run_fails(capsys):
+    baseline = document(**{'batch_32.p50_ms': 10.0, 'batch_64.p50_ms': 20.0})
+    current = document(**{'batch_32.p50_ms': 10.0, 'batch_128.p50_ms': 40.0})
+    rows = {row['metric']: row for row in compare(baseline, current)}
+    assert rows['batch_64.p50_ms'] == {
+        'metric': 'batch_64.p50_ms', 'baseline': 20.0, 'current': None, 'change': None, 'regressed': True,
+    }
+    # Metrics new in this run have nothing to compare against
+    assert 'batch_128.p50_ms' not in rows
+
+    assert not print_comparison(list(rows.values()), 0.2)
+    output = capsys.readouterr().out
+    assert 'MISSING' in output and '[ERROR] 1 baseline metric(s) missing from this run: batch_64.p50_ms' in output
+    assert '[OK]' not in output
+
+
+def run_compare(path):
+    args = argparse.Namespace(baseline=path, dataset='unused.csv', output=None, threshold=0.2)
+    with pytest.raises(SystemExit) as exit_info:
+        benchmark.benchmark_compare(args)
+    return exit_info.value.code
+
+
+def test_compare_command_rejects_unreadable_baselines(capsys, monkeypatch):
+    def not_measured(dataset):
+        raise AssertionError('measured despite an unusable baseline')
+    monkeypatch.setattr(perf_baseline, 'run_benchmark', not_measured)
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'inference.json')
+        assert run_compare(path) == 1
+        assert f'[ERROR] Baseline {path} not found' in capsys.readouterr().out
+
+        save_baseline(dict(document(), schema_version=SCHEMA_VERSION + 1), path)
+        assert run_compare(path) == 1
+        assert f'[ERROR] Baseline {path} has schema version {SCHEMA_VERSION + 1}' in capsys.readouterr().out
+
+        with open(path, 'w') as f:
+            f.write('{not json')
+        assert run_compare(path) == 1
+        assert '[ERROR]' in capsys.readouterr().out
+
+
+def test_baselines_are_versioned():
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'baselines', 'inference.json')
+        save_baseline(document(**{'rss_bytes': 100.0}), path)
+        assert load_baseline(path)['metrics'] == {'rss_bytes': 100.0}
+
+        save_baseline(dict(document(), schema_version=SCHEMA_VERSION + 1), path)
+        with pytest.raises(ValueError):
+            load_baseline(path)
+
+
+def test_measure_model_reports_every_workload(small_model_dir, dataset, monkeypatch):
+    monkeypatch.setattr(perf_baseline, 'WORKLOADS', (('single_row', 1, 3), ('batch_32', 32, 2)))
+    monkeypatch.setattr(perf_baseline, 'ROUNDS', 1)
+    metrics = measure_model(small_model_dir, dataset)
+    assert set(metrics) == {
+        'single_row.p50_ms', 'single_row.p95_ms', 'single_row.rows_per_s',
+        'batch_32.p50_ms', 'batch_32.p95_ms', 'batch_32.rows_per_s',
+        'model_bytes', 'rss_bytes',
+    }
+    assert metrics['batch_32.rows_per_s'] > 0 and metrics['model_bytes'] > 0
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
@@ -0,0 +1,161 @@
+"""Request profiling: selection, aggregation across requests and download formats"""
+
+import io
+import marshal
+import pstats
+import sys
+import threading
+import time
+
+import pytest
+
+from profiling import RequestProfiler
+
+
+def busy_handler(seconds=0.02):
+    """Stands in for a request's work; shows up in every profile"""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def profile_requests(profiler, n_requests, headers=None, work=busy_handler):
+    for _ in range(n_requests):
+        token = profiler.start(headers or {})
+        try:
+            work()
+        finally:
+            profiler.stop(token)
+
+
+def load_pstats(body):
+    stats = pstats.Stats(stream=io.StringIO())
+    stats.stats = marshal.loads(body)
+    return stats
+
+
+def calls_of(stats, name):
+    return sum(ncalls for (_, _, func), (_, ncalls, _, _, _) in stats.stats.items() if func == name)
+
+
+def test_disabled_profiler_selects_nothing():
+    profiler = RequestProfiler()
+    assert not profiler.enabled
+    assert profiler.start({'X-Profile': '1'}) is None
+
+
+def test_sample_every_profiles_one_in_n():
+    profiler = RequestProfiler(sample_every=3)
+    profile_requests(profiler, 9, work=lambda: busy_handler(0.001))
+    assert profiler.stats['profiled'] == 3
+
+
+def test_header_selects_requests_only_when_allowed():
+    profiler = RequestProfiler(allow_header=True)
+    profile_requests(profiler, 2, headers={'X-Profile': '1'}, work=lambda: busy_handler(0.001))
+    profile_requests(profiler, 2, headers={'X-Profile': '0'}, work=lambda: busy_handler(0.001))
+    assert profiler.stats['profiled'] == 2
+
+    profiler = RequestProfiler(sample_every=1000, allow_header=False)
+    profile_requests(profiler, 2, headers={'X-Profile': '1'}, work=lambda: busy_handler(0.001))
+    assert profiler.stats['profiled'] == 0
+
+
+def test_cprofile_aggregates_requests_into_one_table():
+    profiler = RequestProfiler(sample_every=1)
+    profile_requests(profiler, 4)
+
+    assert profiler.stats['profiled'] == 4
+    assert profiler.stats['seconds'] >= 4 * 0.02
+    stats = load_pstats(profiler.pstats_bytes())
+    assert calls_of(stats, 'busy_handler') == 4
+    assert 'busy_handler' in profiler.text()
+
+    profiler.reset()
+    assert profiler.pstats_bytes() is None and profiler.stats['profiled'] == 0
+
+
+def test_cprofile_has_no_collapsed_stacks():
+    profiler = RequestProfiler(sample_every=1)
+    profile_requests(profiler, 1)
+    with pytest.raises(ValueError, match='sampling'):
+        profiler.collapsed()
+
+
+def test_sampling_aggregates_whole_stacks():
+    profiler = RequestProfiler(sample_every=1, mode='sampling', interval_ms=1.0)
+
+    def handler():
+        busy_handler(0.05)
+
+    def busy_samples():
+        lines = profiler.collapsed().splitlines()
+        stacks = {line.rsplit(' ', 1)[0]: int(line.rsplit(' ', 1)[1]) for line in lines}
+        return {stack: count for stack, count in stacks.items()
+                if stack.split(';')[-1].startswith('busy_handler ')}
+
+    profile_requests(profiler, 1, work=handler)
+    first = sum(busy_samples().values())
+    profile_requests(profiler, 2, work=handler)
+    assert profiler.stats['profiled'] == 3
+    assert profiler.pstats_bytes() is None
+
+    busy = busy_samples()
+    assert first > 0 and sum(busy.values()) > first
+    # Whole stacks, outermost frame first, through the caller into the handler
+    for stack in busy:
+        frames = [frame.split(' ')[0] for frame in stack.split(';')]
+        assert frames[-3:] == ['profile_requests', 'handler', 'busy_handler']
+
+
+def test_one_profile_at_a_time():
+    profiler = RequestProfiler(sample_every=1)
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_request():
+        profile_requests(profiler, 1, work=lambda: (entered.set(), release.wait(timeout=10)))
+
+    thread = threading.Thread(target=slow_request)
+    thread.start()
+    assert entered.wait(timeout=10)
+    # Selected while another request is being profiled: runs unprofiled
+    assert profiler.start({}) is None
+    release.set()
+    thread.join()
+
+    assert profiler.stats == {'profiled': 1, 'skipped': 1, 'seconds': profiler.stats['seconds']}
+    assert profiler.start({}) is not None
+
+
+@pytest.fixture
+def admin(ml_service, monkeypatch):
+    """The service's /admin/profile with a token set, and a way to swap in a profiler"""
+    monkeypatch.setattr(ml_service, 'PROFILE_ADMIN_TOKEN', 'token')
+    client = ml_service.app.test_client()
+
+    def get(profiler, profile_format):
+        monkeypatch.setattr(ml_service, 'profiler', profiler)
+        return client.get(f'/admin/profile?format={profile_format}', headers={'X-Admin-Token': 'token'})
+    return get
+
+
+def test_admin_profile_downloads(ml_service, admin, reports):
+    predictor = ml_service.registry.get(ml_service.registry.primary)
+    profiler = RequestProfiler(sample_every=1)
+    profile_requests(profiler, 3, work=lambda: predictor.predict(reports[0]))
+
+    response = admin(profiler, 'pstats')
+    assert response.status_code == 200
+    assert calls_of(load_pstats(response.data), 'predict') == 3
+    assert admin(profiler, 'collapsed').status_code == 400
+    assert admin(profiler, 'summary').get_json()['profiler']['profiled'] == 3
+
+    sampling = RequestProfiler(sample_every=1, mode='sampling')
+    profile_requests(sampling, 3, work=lambda: predictor.predict(reports[0]))
+    response = admin(sampling, 'collapsed')
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    assert admin(sampling, 'pstats').status_code == 404
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
@@ -0,0 +1,91 @@
+"""Grid search checkpointing: resumed and extended searches only fit what is missing"""
+
+import sys
+
+import pandas as pd
+import pytest
+
+from search_cache import FoldScoreCache, params_key
+
+CV_FOLDS = 3
+GRID = {'n_estimators': [3], 'max_depth': [2, 4]}
+
+
+@pytest.fixture(scope='module')
+def training_data(dataset):
+    from train_model import ImprovedPatientReportAnalyzer
+    analyzer = ImprovedPatientReportAnalyzer()
+    return analyzer.preprocess_data(pd.read_csv(dataset).head(600), target_column='Disease')
+
+
+def search(training_data, cache_dir, param_grid):
+    from train_model import ImprovedPatientReportAnalyzer
+    analyzer = ImprovedPatientReportAnalyzer()
+    analyzer.search_cache_dir = str(cache_dir)
+    X, y = training_data
+    analyzer.tune_hyperparameters(X, y, cv_folds=CV_FOLDS, param_grid=param_grid)
+    return analyzer
+
+
+def cache_lines(analyzer):
+    cache = FoldScoreCache(analyzer.search_cache_dir, analyzer.search_stats['cache_key'])
+    with open(cache.path) as f:
+        return f.read().splitlines()
+
+
+def test_rerun_fits_nothing(training_data, tmp_path):
+    first = search(training_data, tmp_path, GRID)
+    assert first.search_stats['fits_from_cache'] == 0
+    assert len(cache_lines(first)) == 2 * CV_FOLDS
+
+    second = search(training_data, tmp_path, GRID)
+    assert second.search_stats['fits_from_cache'] == 2 * CV_FOLDS
+    assert len(cache_lines(second)) == 2 * CV_FOLDS
+    assert second.best_params == first.best_params
+
+
+def test_extended_grid_fits_only_new_candidates(training_data, tmp_path):
+    search(training_data, tmp_path, GRID)
+    extended = search(training_data, tmp_path, {**GRID, 'max_depth': [2, 4, 6]})
+
+    assert extended.search_stats['fits'] == 3 * CV_FOLDS
+    assert extended.search_stats['fits_from_cache'] == 2 * CV_FOLDS
+    new_entries = cache_lines(extended)[2 * CV_FOLDS:]
+    assert len(new_entries) == CV_FOLDS
+    assert all('"max_depth": 6' in line for line in new_entries)
+
+
+def test_truncated_last_line_is_refit(training_data, tmp_path):
+    first = search(training_data, tmp_path, GRID)
+    path = FoldScoreCache(str(tmp_path), first.search_stats['cache_key']).path
+    with open(path) as f:
+        content = f.read()
+    # A crash mid-write leaves the last entry cut short
+    with open(path, 'w') as f:
+        f.write(content[:-20])
+
+    resumed = search(training_data, tmp_path, GRID)
+    assert resumed.search_stats['fits_from_cache'] == 2 * CV_FOLDS - 1
+    assert resumed.best_params == first.best_params
+
+    scores = FoldScoreCache(str(tmp_path), resumed.search_stats['cache_key']).load()
+    assert len(scores) == 2 * CV_FOLDS
+
+
+def test_load_skips_partial_line_and_add_starts_a_new_one(tmp_path):
+    cache = FoldScoreCache(str(tmp_path), 'key')
+    cache.add({'max_depth': 2}, 0, 0.5)
+    with open(cache.path, 'a') as f:
+        f.write('{"params": {"max_depth": 2}, "fold": 1, "sco')
+
+    assert cache.load() == {(params_key({'max_depth': 2}), 0): 0.5}
+
+    cache.add({'max_depth': 2}, 1, 0.75)
+    assert cache.load() == {
+        (params_key({'max_depth': 2}), 0): 0.5,
+        (params_key({'max_depth': 2}), 1): 0.75,
+    }
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
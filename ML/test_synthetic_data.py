@@ -0,0 +1,105 @@
+"""Synthetic dataset generator: reproducibility and schema compatibility"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import synthetic_data
+from synthetic_data import SyntheticPatientGenerator, write_dataset
+
+
+@pytest.fixture(scope='module')
+def source(dataset):
+    return pd.read_csv(dataset).head(5000)
+
+
+@pytest.fixture(scope='module')
+def generator(source):
+    return SyntheticPatientGenerator().fit(source)
+
+
+@pytest.fixture(scope='module')
+def synthetic(generator):
+    return pd.concat(generator.generate(20000, seed=7, chunk_size=6000), ignore_index=True)
+
+
+def test_same_seed_and_chunk_size_give_same_rows(generator):
+    first = pd.concat(generator.generate(3000, seed=1, chunk_size=1000), ignore_index=True)
+    second = pd.concat(generator.generate(3000, seed=1, chunk_size=1000), ignore_index=True)
+    pd.testing.assert_frame_equal(first, second)
+    other = pd.concat(generator.generate(3000, seed=2, chunk_size=1000), ignore_index=True)
+    assert not first.equals(other)
+
+
+def test_chunks_add_up_to_rows(generator):
+    chunks = list(generator.generate(2500, chunk_size=1000))
+    assert [len(chunk) for chunk in chunks] == [1000, 1000, 500]
+
+
+def test_schema_matches_source(source, synthetic):
+    assert synthetic.columns.tolist() == source.columns.tolist()
+    assert synthetic.dtypes.to_dict() == source.dtypes.to_dict()
+    for col in source.select_dtypes(include=['object']).columns:
+        assert set(synthetic[col]) == set(source[col])
+    # Numeric values are drawn from those seen in the source
+    for col in source.select_dtypes(include=[np.number]).columns:
+        assert set(synthetic[col]) <= set(source[col])
+
+
+def test_class_frequencies_match_source(source, synthetic):
+    expected = source['Disease'].value_counts(normalize=True)
+    observed = synthetic['Disease'].value_counts(normalize=True).reindex(expected.index, fill_value=0)
+    np.testing.assert_allclose(observed, expected, atol=0.02)
+
+
+def test_missing_values_keep_integer_columns_integral():
+    source = pd.DataFrame({
+        'Age': np.arange(200) % 80,
+        'Gender': np.where(np.arange(200) % 3, 'Male', None),
+        'Glucose': np.where(np.arange(200) % 5, np.arange(200) + 70.0, np.nan),
+        'Disease': np.where(np.arange(200) % 4, 'Healthy', 'Diabetes'),
+    })
+    synthetic = next(SyntheticPatientGenerator().fit(source).generate(2000, seed=0))
+    assert synthetic['Gender'].isna().any() and set(synthetic['Gender'].dropna()) == {'Male'}
+    assert synthetic['Glucose'].isna().mean() == pytest.approx(0.2, abs=0.05)
+    assert synthetic['Age'].dtype == source['Age'].dtype
+
+
+def test_csv_written_across_chunks_has_one_header(generator, tmp_path):
+    path = str(tmp_path / 'synthetic.csv')
+    write_dataset(generator, path, 2500, seed=3, chunk_size=1000)
+
+    with open(path) as f:
+        lines = f.read().splitlines()
+    header = ','.join(generator.columns_)
+    assert lines[0] == header and lines.count(header) == 1
+    assert len(lines) == 2501
+
+    expected = pd.concat(generator.generate(2500, seed=3, chunk_size=1000), ignore_index=True)
+    pd.testing.assert_frame_equal(pd.read_csv(path), expected)
+
+
+def test_parquet_round_trip(generator, tmp_path):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / 'synthetic.parquet')
+    write_dataset(generator, path, 2500, seed=3, chunk_size=1000)
+
+    expected = pd.concat(generator.generate(2500, seed=3, chunk_size=1000), ignore_index=True)
+    pd.testing.assert_frame_equal(pd.read_parquet(path), expected)
+
+
+def test_parquet_without_pyarrow_is_an_error(generator, tmp_path, monkeypatch):
+    monkeypatch.setattr(synthetic_data, 'HAS_PYARROW', False)
+    with pytest.raises(RuntimeError, match='pyarrow'):
+        write_dataset(generator, str(tmp_path / 'synthetic.parquet'), 10)
+
+
+def test_fit_requires_target(source):
+    with pytest.raises(ValueError, match='Diagnosis'):
+        SyntheticPatientGenerator(target_column='Diagnosis').fit(source)
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
@@ -0,0 +1,71 @@
+"""Training run telemetry, in the run log and in the saved bundle"""
+
+import json
+import sys
+
+import pytest
+
+import telemetry
+from telemetry import RunTelemetry
+
+
+def test_stage_records_failures(tmp_path):
+    run = RunTelemetry(run_log=str(tmp_path / 'runs.jsonl'))
+    with run.stage('fit'):
+        pass
+    with pytest.raises(KeyError):
+        with run.stage('fit'):
+            raise KeyError('boom')
+
+    assert run.stages['fit']['status'] == 'failed'
+    assert run.stages['fit']['calls'] == 2
+    with open(run.run_log) as f:
+        events = [json.loads(line)['event'] for line in f]
+    assert events == ['run_started', 'stage', 'stage']
+
+
+def test_sampler_that_fails_to_start_is_reported(monkeypatch):
+    def no_thread(self):
+        raise RuntimeError("can't start new thread")
+
+    monkeypatch.setattr(telemetry._RSSSampler, '__enter__', no_thread)
+    run = RunTelemetry()
+    with pytest.raises(RuntimeError, match="can't start new thread"):
+        with run.stage('fit'):
+            pass
+    assert run.stages['fit']['status'] == 'failed'
+
+
+def test_bundle_metadata_includes_save_stage_and_artifacts(dataset, tmp_path):
+    import pandas as pd
+    from sklearn.ensemble import RandomForestClassifier
+    from model_bundle import BUNDLE_FILE, METADATA_MEMBER, ModelBundle
+    from train_model import ImprovedPatientReportAnalyzer
+
+    run = RunTelemetry(run_log=str(tmp_path / 'runs.jsonl'))
+    analyzer = ImprovedPatientReportAnalyzer(telemetry=run)
+    X, y = analyzer.preprocess_data(pd.read_csv(dataset).head(500), target_column='Disease')
+    analyzer.model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y)
+    analyzer.save_model(str(tmp_path / 'model'))
+
+    bundle = ModelBundle.load(str(tmp_path / 'model' / BUNDLE_FILE))
+    saved = bundle.metadata['telemetry']
+    assert saved['stages']['save']['status'] == 'ok'
+    files = bundle.manifest['files']
+    assert saved['artifacts']['member_bytes'] == {
+        name: f['size'] for name, f in files.items() if name != METADATA_MEMBER
+    }
+
+    # Writing the file is measured after the metadata, so only the run log has it
+    with open(run.run_log) as f:
+        records = [json.loads(line) for line in f]
+    assert 'write_bundle' in [r['stage'] for r in records if r['event'] == 'stage']
+    bundle_info = [r['value'] for r in records if r['event'] == 'info' and r['key'] == 'bundle']
+    assert bundle_info == [{
+        'bundle_id': bundle.bundle_id,
+        'bundle_bytes': (tmp_path / 'model' / BUNDLE_FILE).stat().st_size
+    }]
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
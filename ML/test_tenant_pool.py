@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""Test the per-hospital model pool"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+import pytest
+
+from tenant_pool import TenantModelError, TenantModelPool
+
+
+@pytest.fixture(scope='module')
+def root_dir(small_model_dir):
+    with tempfile.TemporaryDirectory() as root:
+        for hospital_id in ('hospital-a', 'hospital-b', 'hospital-c'):
+            shutil.copytree(small_model_dir, os.path.join(root, hospital_id))
+        os.makedirs(os.path.join(root, 'broken'))
+        yield root
+
+
+def test_loads_on_first_use_and_falls_back(root_dir):
+    pool = TenantModelPool(root_dir)
+    assert pool.describe()['models'] == {}
+    model = pool.get('hospital-a')
+    assert pool.get('hospital-a') is model
+    assert pool.get('no-such-hospital') is None
+    assert pool.stats['loads'] == 1
+    assert pool.stats['hits'] == 1
+    assert pool.stats['fallbacks'] == 1
+
+
+def test_concurrent_first_requests_share_one_load(root_dir):
+    pool = TenantModelPool(root_dir)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def request():
+        barrier.wait()
+        results.append(pool.get('hospital-b'))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert pool.stats['loads'] == 1
+    assert len(results) == 8 and all(model is results[0] for model in results)
+
+
+def test_evicts_least_recently_used(root_dir):
+    size = TenantModelPool(root_dir).get('hospital-a').bundle.memory_bytes
+    pool = TenantModelPool(root_dir, max_bytes=int(size * 2.5))
+    pool.get('hospital-a')
+    pool.get('hospital-b')
+    pool.get('hospital-a')  # b is now least recently used
+    pool.get('hospital-c')
+    assert list(pool.describe()['models']) == ['hospital-a', 'hospital-c']
+    assert pool.stats['evictions'] == 1
+    assert pool.bytes == 2 * size
+
+    pool = TenantModelPool(root_dir, max_models=1)
+    pool.get('hospital-a')
+    pool.get('hospital-b')
+    assert list(pool.describe()['models']) == ['hospital-b']
+
+
+def test_invalid_ids_and_failed_loads(root_dir):
+    pool = TenantModelPool(root_dir)
+    with pytest.raises(ValueError):
+        pool.get('../hospital-a')
+    for _ in range(3):
+        with pytest.raises(TenantModelError):
+            pool.get('broken')
+    # The failure is remembered rather than reloaded on every request
+    assert pool.stats['load_failures'] == 1
+    assert pool.stats['failed_load_skips'] == 2
+    assert pool.describe()['models'] == {}
+
+    retrying = TenantModelPool(root_dir, retry_failed_after=0)
+    for _ in range(2):
+        with pytest.raises(TenantModelError):
+            retrying.get('broken')
+    assert retrying.stats['load_failures'] == 2
+
+
+def test_explainer_tables_count_towards_the_budget(root_dir, reports):
+    pool = TenantModelPool(root_dir)
+    model = pool.get('hospital-a')
+    trees = pool.bytes
+    model.predict(reports[0], explain=True)
+    pool.get('hospital-a')
+    assert pool.bytes == trees + model.bundle.explainer.memory_bytes
+    assert pool.describe()['models']['hospital-a']['memory_bytes'] == pool.bytes
+
+    # Growing past the budget on a lookup evicts the other models
+    pool = TenantModelPool(root_dir, max_bytes=int(trees * 2.5))
+    pool.get('hospital-b')
+    explained = pool.get('hospital-c')
+    explained.predict(reports[0], explain=True)
+    pool.get('hospital-c')
+    assert list(pool.describe()['models']) == ['hospital-c']
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
@@ -0,0 +1,184 @@
+"""Training: duplicate collapsing, feature pruning and the target leak guard"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import f1_score
+from sklearn.model_selection import PredefinedSplit
+
+from train_model import ImprovedPatientReportAnalyzer, balanced_sample_weight, collapse_duplicates, fit_model
+
+
+@pytest.fixture(scope='module')
+def frame(dataset):
+    return pd.read_csv(dataset).head(1500)
+
+
+@pytest.fixture
+def fitted(frame):
+    """An analyzer with a fitted transformer and a first model, ready for pruning"""
+    analyzer = ImprovedPatientReportAnalyzer()
+    X, y = analyzer.preprocess_data(frame, target_column='Disease')
+    analyzer.model = RandomForestClassifier(n_estimators=20, random_state=0).fit(X, y)
+    return analyzer, X, y
+
+
+@pytest.fixture(scope='module')
+def repeated(dataset):
+    """
+    36 unique reports per class, repeated 1-4 times, and 3 folds over them.
+    Every class has the same row total in the whole set and in each fold,
+    so 'balanced' class weights are exactly 1 and weighted and repeated fits
+    see bit-identical impurities; otherwise rounding in n * w versus
+    w + ... + w may break ties between equal splits differently.
+    """
+    df = pd.read_csv(dataset).drop_duplicates()
+    unique = df.groupby('Disease', sort=False).head(36).sort_values('Disease', kind='stable')
+    n_classes = unique['Disease'].nunique()
+    counts = np.tile([1, 2, 3, 4], 9 * n_classes)
+    folds = np.tile(np.repeat(np.arange(9) % 3, 4), n_classes)
+
+    expanded = unique.loc[unique.index.repeat(counts)].sample(frac=1, random_state=0)
+    analyzer = ImprovedPatientReportAnalyzer()
+    X, y = analyzer.preprocess_data(expanded, target_column='Disease')
+    X_unique = analyzer.transformer.transform(unique.drop(columns=['Disease']))
+    y_unique = analyzer.label_encoders['target'].transform(unique['Disease'])
+    probe = analyzer.transformer.transform(df.tail(2000).drop(columns=['Disease']))
+    return (X, y), (X_unique, y_unique, counts, folds), probe
+
+
+DEDUP_MODEL = RandomForestClassifier(n_estimators=10, bootstrap=False, random_state=0, class_weight='balanced')
+
+
+def test_collapse_duplicates_counts_rows(repeated):
+    (X, y), (X_unique, y_unique, counts, _), _ = repeated
+    collapsed_X, collapsed_y, collapsed_counts = collapse_duplicates(X, y)
+
+    # Same unique rows with the same counts, in collapse_duplicates' sorted order
+    order = np.lexsort(np.column_stack([X_unique, y_unique]).T[::-1])
+    np.testing.assert_array_equal(collapsed_X, X_unique[order])
+    np.testing.assert_array_equal(collapsed_y, y_unique[order])
+    np.testing.assert_array_equal(collapsed_counts, counts[order])
+
+
+def test_weighted_fit_matches_repeated_fit(repeated):
+    (X, y), (X_unique, y_unique, counts, _), probe = repeated
+    expanded = clone(DEDUP_MODEL).fit(X, y)
+    weighted = fit_model(clone(DEDUP_MODEL), X_unique, y_unique, counts)
+
+    np.testing.assert_array_equal(weighted.predict(probe), expanded.predict(probe))
+    np.testing.assert_array_equal(weighted.predict_proba(probe), expanded.predict_proba(probe))
+
+
+def test_weighted_cv_scores_match_repeated_folds(repeated):
+    (_, _), (X_unique, y_unique, counts, folds), _ = repeated
+    cv = PredefinedSplit(folds)
+    weighted = ImprovedPatientReportAnalyzer()._weighted_cv_scores(DEDUP_MODEL, X_unique, y_unique, cv, counts)
+
+    # The same folds with every row repeated count times, fitted and scored unweighted
+    expanded = []
+    for train_idx, test_idx in cv.split():
+        train_idx, test_idx = np.repeat(train_idx, counts[train_idx]), np.repeat(test_idx, counts[test_idx])
+        model = clone(DEDUP_MODEL).fit(X_unique[train_idx], y_unique[train_idx])
+        expanded.append(f1_score(y_unique[test_idx], model.predict(X_unique[test_idx]),
+                                 average='weighted', zero_division=0))
+    np.testing.assert_allclose(weighted, expanded, rtol=1e-12)
+
+
+def test_balanced_weights_follow_row_counts():
+    from sklearn.utils.class_weight import compute_sample_weight
+
+    y_unique = np.array([0, 0, 0, 1, 1, 2])
+    counts = np.array([5, 1, 4, 2, 3, 1])
+    weights = balanced_sample_weight(y_unique, counts)
+
+    # Each unique row weighs what its repeated rows weigh under class_weight='balanced'
+    y = np.repeat(y_unique, counts)
+    expected = compute_sample_weight('balanced', y)
+    np.testing.assert_allclose(weights, np.add.reduceat(expected, np.r_[0, np.cumsum(counts)[:-1]]))
+    # so every class carries the same total weight
+    np.testing.assert_allclose(np.bincount(y_unique, weights=weights), len(y) / 3)
+
+
+def assert_transformer_narrowed(analyzer, frame, X, keep):
+    assert analyzer.feature_names == analyzer.feature_selection['kept']
+    assert analyzer.transformer.feature_names_ == analyzer.feature_names
+    np.testing.assert_allclose(analyzer.transformer.transform(frame.drop(columns=['Disease'])), X[:, keep])
+
+
+def test_cumulative_selection_keeps_most_important(fitted, frame):
+    analyzer, X, y = fitted
+    importance = analyzer.model.feature_importances_
+    keep = analyzer.select_features(X, y, method='cumulative', threshold=0.8)
+
+    assert list(keep) == sorted(keep) and 0 < len(keep) < X.shape[1]
+    # The kept features reach the threshold, and none dropped is more important than one kept
+    assert importance[keep].sum() >= 0.8 * importance.sum()
+    dropped = np.setdiff1d(np.arange(X.shape[1]), keep)
+    assert importance[dropped].max() <= importance[keep].min()
+    assert_transformer_narrowed(analyzer, frame, X, keep)
+
+
+def test_permutation_selection_keeps_features_above_threshold(fitted, frame):
+    analyzer, X, y = fitted
+    keep = analyzer.select_features(X, y, method='permutation', threshold=0.001)
+
+    selection = analyzer.feature_selection
+    assert selection['method'] == 'permutation'
+    assert sorted(selection['kept'] + selection['dropped']) == sorted(selection['importance'])
+    assert all(selection['importance'][name] > 0.001 for name in selection['kept'])
+    assert_transformer_narrowed(analyzer, frame, X, keep)
+
+
+def test_unknown_selection_method(fitted):
+    analyzer, X, y = fitted
+    with pytest.raises(ValueError, match='cumulative'):
+        analyzer.select_features(X, y, method='gain')
+
+
+def test_pruned_model_serves_on_narrowed_features(frame, tmp_path):
+    from predict import ReportPredictor
+
+    analyzer = ImprovedPatientReportAnalyzer()
+    X, y = analyzer.preprocess_data(frame, target_column='Disease')
+    analyzer.train(X, y, use_cv=False, tune_hyperparams=False,
+                   prune_features='cumulative', prune_threshold=0.8)
+    assert analyzer.model.n_features_in_ == len(analyzer.feature_names) < X.shape[1]
+
+    analyzer.save_model(str(tmp_path))
+    predictor = ReportPredictor(model_dir=str(tmp_path))
+    results = predictor.predict_batch(frame.drop(columns=['Disease']).head(20).to_dict(orient='records'))
+    assert all(result['prediction'] for result in results)
+
+
+def test_wrong_target_leaves_label_in_features(frame):
+    with pytest.raises(ValueError, match="'Disease'"):
+        ImprovedPatientReportAnalyzer().preprocess_data(frame, target_column='Age')
+
+
+def test_copy_of_target_is_a_leak(frame):
+    leaked = frame.assign(Diagnosis=frame['Disease']).rename(columns={'Disease': 'Label'})
+    with pytest.raises(ValueError, match='Diagnosis'):
+        ImprovedPatientReportAnalyzer().preprocess_data(leaked, target_column='Label')
+
+
+def test_missing_target_is_an_error(frame):
+    with pytest.raises(ValueError, match="'Diagnosis' not found"):
+        ImprovedPatientReportAnalyzer().preprocess_data(frame, target_column='Diagnosis')
+
+
+def test_guard_runs_before_fitting(fitted):
+    analyzer, X, y = fitted
+    analyzer.feature_names.append('Disease')
+    analyzer.model = None
+    with pytest.raises(ValueError, match='leak'):
+        analyzer.train(X, y, use_cv=False, tune_hyperparams=False)
+    assert analyzer.model is None
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-v']))
@@ -5,43 +5,108 @@ Includes cross-validation, hyperparameter tuning, and comprehensive evaluation
 
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, cross_val_score, StratifiedKFold, GridSearchCV
+from sklearn.model_selection import (
+    train_test_split, cross_val_score, StratifiedKFold, ParameterGrid
+)
+from sklearn.base import clone
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder, RobustScaler
+from sklearn.preprocessing import LabelEncoder
+from sklearn.inspection import permutation_importance
 from sklearn.metrics import (
     accuracy_score, classification_report, confusion_matrix,
     precision_score, recall_score, f1_score, roc_auc_score
 )
-from sklearn.impute import SimpleImputer
 import joblib
+from joblib import Parallel, delayed
 import os
 import json
 import logging
+import time
 from datetime import datetime
 from typing import Tuple, Dict, Any
+from drift import DriftProfile
+from features import PREPROCESSING_VERSION, PatientFeatureTransformer
+from model_bundle import BUNDLE_FILE, serialize_payload, write_bundle_members
+from search_cache import FoldScoreCache, params_key, search_key
+from telemetry import NULL_TELEMETRY, RunTelemetry, thread_info
 import warnings
 warnings.filterwarnings('ignore')
 
-# Setup logging
+# Setup logging (console only; the JSON-lines run log is the record of a run)
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('training.log'),
-        logging.StreamHandler()
-    ]
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
+# Label columns of the datasets this script trains on; never valid as
+# features, even when --target names a different column
+LABEL_COLUMNS = ('Disease',)
+
+
+def collapse_duplicates(X: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Collapse identical (feature row, label) pairs into unique rows
+    Returns:
+        (X_unique, y_unique, counts)
+    """
+    rows = np.column_stack([X, y])
+    unique, counts = np.unique(rows, axis=0, return_counts=True)
+    return unique[:, :-1], unique[:, -1].astype(np.asarray(y).dtype), counts
+
+
+def balanced_sample_weight(y: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Row counts times class_weight='balanced' weights, with class frequencies
+    taken from the counts so collapsed rows balance like the full dataset
+    """
+    classes, y_index = np.unique(y, return_inverse=True)
+    class_totals = np.bincount(y_index, weights=counts)
+    class_weight = class_totals.sum() / (len(classes) * class_totals)
+    return counts * class_weight[y_index]
+
+
+def fit_model(model: RandomForestClassifier, X: np.ndarray, y: np.ndarray,
+              sample_weight: np.ndarray = None) -> RandomForestClassifier:
+    """Fit a model, folding row counts into the class balancing when given"""
+    if sample_weight is None:
+        return model.fit(X, y)
+    model.set_params(class_weight=None)
+    return model.fit(X, y, sample_weight=balanced_sample_weight(y, sample_weight))
+
+
+def score_fold(model: RandomForestClassifier, X: np.ndarray, y: np.ndarray,
+               train_idx: np.ndarray, test_idx: np.ndarray,
+               sample_weight: np.ndarray = None) -> Tuple[float, float]:
+    """
+    Fit a copy of model on one CV fold and score it (weighted F1)
+    Returns:
+        (score, fit and score seconds)
+    """
+    start = time.perf_counter()
+    w_train = None if sample_weight is None else sample_weight[train_idx]
+    w_test = None if sample_weight is None else sample_weight[test_idx]
+    fold_model = fit_model(clone(model), X[train_idx], y[train_idx], w_train)
+    y_pred = fold_model.predict(X[test_idx])
+    score = f1_score(y[test_idx], y_pred, average='weighted', sample_weight=w_test, zero_division=0)
+    return float(score), time.perf_counter() - start
+
 
 class ImprovedPatientReportAnalyzer:
-    def __init__(self):
+    def __init__(self, telemetry: RunTelemetry = None):
         self.model = None
-        self.scaler = RobustScaler()  # More robust to outliers than StandardScaler
-        self.label_encoders = {}
+        self.telemetry = telemetry or NULL_TELEMETRY
+        self.transformer = PatientFeatureTransformer()
+        self.label_encoders = {}  # Target encoder; feature encoders live in the transformer
         self.feature_names = []
+        self.target_column = None
+        self.feature_selection = {}
+        self.drift_reference = None  # Raw input histograms for the service's drift monitor
         self.best_params = {}
         self.cv_scores = {}
+        self.dedup_stats = {}
+        self.search_stats = {}
+        self.search_cache_dir = '.search_cache'
         
     def load_data(self, csv_path: str) -> pd.DataFrame:
         """Load dataset from CSV file with validation"""
@@ -50,7 +115,15 @@ class ImprovedPatientReportAnalyzer:
         if not os.path.exists(csv_path):
             raise FileNotFoundError(f"Dataset file not found: {csv_path}")
         
-        df = pd.read_csv(csv_path)
+        with self.telemetry.stage('load'):
+            df = pd.read_csv(csv_path)
+        self.telemetry.record('dataset', {
+            'path': csv_path,
+            'rows': int(df.shape[0]),
+            'columns': int(df.shape[1]),
+            'file_bytes': os.path.getsize(csv_path),
+            'memory_bytes': int(df.memory_usage(deep=True).sum())
+        })
         logger.info(f"Dataset shape: {df.shape}")
         logger.info(f"Columns: {df.columns.tolist()}")
         
@@ -59,152 +132,122 @@ class ImprovedPatientReportAnalyzer:
         
         return df
     
-    def detect_outliers(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Detect and cap outliers using IQR method"""
-        logger.info("Detecting and handling outliers...")
-        df_clean = df.copy()
-        
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
-        
-        for col in numeric_cols:
-            Q1 = df[col].quantile(0.25)
-            Q3 = df[col].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-            
-            # Cap outliers instead of removing (preserve data)
-            df_clean[col] = df_clean[col].clip(lower=lower_bound, upper=upper_bound)
-        
-        return df_clean
+    def split_target(self, df: pd.DataFrame, 
+                     target_column: str = None) -> Tuple[pd.DataFrame, pd.Series]:
+        """Separate raw features from the target column (the last column if none is given)"""
+        if target_column is None:
+            return df.iloc[:, :-1], df.iloc[:, -1]
+        if target_column not in df.columns:
+            raise ValueError(f"Target column '{target_column}' not found in dataset columns {df.columns.tolist()}")
+        return df.drop(columns=[target_column]), df[target_column]
     
-    def engineer_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Create additional features"""
-        logger.info("Engineering features...")
-        df_fe = df.copy()
-        
-        # Create interaction features
-        if 'Age' in df_fe.columns and 'BloodPressure' in df_fe.columns:
-            df_fe['Age_BP_Interaction'] = df_fe['Age'] * df_fe['BloodPressure']
-        
-        if 'BMI' in df_fe.columns and 'Cholesterol' in df_fe.columns:
-            df_fe['BMI_Cholesterol_Interaction'] = df_fe['BMI'] * df_fe['Cholesterol']
-        
-        # Create risk score features
-        if all(col in df_fe.columns for col in ['BloodPressure', 'Cholesterol', 'Glucose']):
-            df_fe['Cardiovascular_Risk'] = (
-                (df_fe['BloodPressure'] > 140).astype(int) +
-                (df_fe['Cholesterol'] > 200).astype(int) +
-                (df_fe['Glucose'] > 100).astype(int)
+    def check_target_leak(self, X: pd.DataFrame = None, y: pd.Series = None):
+        """
+        Refuse to train when the label is among the features: the target
+        column itself, a known label column (left in by a wrong --target),
+        or a raw feature column that is a copy of the target values.
+        Checks X's columns when given, else the fitted feature_names.
+        """
+        features = list(X.columns) if X is not None else list(self.feature_names)
+        leaked = [col for col in features if col == self.target_column or col in LABEL_COLUMNS]
+        if X is not None and y is not None:
+            target = y.reset_index(drop=True)
+            leaked += [
+                col for col in X.columns
+                if col not in leaked and X[col].reset_index(drop=True).equals(target)
+            ]
+        if leaked:
+            raise ValueError(
+                f"Feature(s) {leaked} would leak the label '{self.target_column}'; check --target"
             )
-        
-        return df_fe
     
     def preprocess_data(self, df: pd.DataFrame, target_column: str = None, 
                        fit: bool = True) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Improved preprocessing with outlier handling and feature engineering
+        Outlier capping, feature engineering, imputation, encoding and
+        scaling through the shared PatientFeatureTransformer
         """
         logger.info("Preprocessing data...")
         
-        # Make a copy
-        data = df.copy()
-        
-        # Detect and handle outliers
-        data = self.detect_outliers(data)
-        
-        # Feature engineering
-        data = self.engineer_features(data)
+        # Separate features and target before engineering features, so
+        # engineered columns can never be mistaken for the target
+        X, y = self.split_target(df, target_column)
+        self.target_column = y.name
         
-        # Separate features and target
-        if target_column and target_column in data.columns:
-            X = data.drop(columns=[target_column])
-            y = data[target_column]
+        if fit:
+            self.check_target_leak(X, y)
+            logger.info("Fitting feature transformer (outliers, features, imputation, encoding, scaling)...")
+            X_scaled = self.transformer.fit_transform(X, telemetry=self.telemetry)
+            self.feature_names = list(self.transformer.feature_names_)
+            with self.telemetry.stage('drift_reference'):
+                self.drift_reference = DriftProfile.from_columns(
+                    X, len(X), self.transformer.numeric_inputs_,
+                    {col: enc.classes_.tolist() for col, enc in self.transformer.encoders_.items()}
+                ).to_dict()
         else:
-            X = data.iloc[:, :-1]
-            y = data.iloc[:, -1]
-        
-        # Handle missing values
-        numeric_cols = X.select_dtypes(include=[np.number]).columns
-        categorical_cols = X.select_dtypes(include=['object']).columns
-        
-        if len(numeric_cols) > 0:
-            imputer = SimpleImputer(strategy='median')
-            X[numeric_cols] = imputer.fit_transform(X[numeric_cols])
-        
-        # Fill categorical missing values
-        for col in categorical_cols:
-            X[col] = X[col].fillna('Unknown')
-        
-        # Encode categorical variables
-        for col in categorical_cols:
-            if fit:
-                if col not in self.label_encoders:
-                    le = LabelEncoder()
-                    X[col] = le.fit_transform(X[col].astype(str))
-                    self.label_encoders[col] = le
-                else:
-                    X[col] = self.label_encoders[col].transform(X[col].astype(str))
-            else:
-                # Transform with existing encoder
-                X[col] = X[col].astype(str)
-                known_values = set(self.label_encoders[col].classes_)
-                X[col] = X[col].apply(
-                    lambda x: x if x in known_values else 'Unknown'
-                )
-                # Handle unknown values
-                if 'Unknown' not in self.label_encoders[col].classes_:
-                    le = LabelEncoder()
-                    classes = list(self.label_encoders[col].classes_) + ['Unknown']
-                    le.fit(classes)
-                    self.label_encoders[col] = le
-                X[col] = self.label_encoders[col].transform(X[col])
+            X_scaled = self.transformer.transform(X)
         
         # Encode target variable
         if y.dtype == 'object':
-            if fit:
-                if 'target' not in self.label_encoders:
-                    le = LabelEncoder()
-                    y = le.fit_transform(y)
-                    self.label_encoders['target'] = le
-                else:
-                    y = self.label_encoders['target'].transform(y)
+            if fit and 'target' not in self.label_encoders:
+                le = LabelEncoder()
+                y = le.fit_transform(y)
+                self.label_encoders['target'] = le
             else:
                 y = self.label_encoders['target'].transform(y)
         
-        # Store feature names
-        if fit:
-            self.feature_names = X.columns.tolist()
-        
-        # Scale features
-        if fit:
-            X_scaled = self.scaler.fit_transform(X)
-        else:
-            X_scaled = self.scaler.transform(X)
-        
         return X_scaled, y
     
+    def collapse_duplicates(self, X: np.ndarray, 
+                            y: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Collapse duplicate preprocessed rows into unique rows with counts,
+        to be trained with the counts as sample_weight
+        """
+        with self.telemetry.stage('dedup'):
+            X_unique, y_unique, counts = collapse_duplicates(X, y)
+        self.dedup_stats = {
+            'rows': int(len(X)),
+            'unique_rows': int(len(X_unique)),
+            'compression_ratio': float(len(X) / len(X_unique))
+        }
+        logger.info(
+            f"Collapsed {len(X)} rows into {len(X_unique)} unique rows "
+            f"(compression ratio {self.dedup_stats['compression_ratio']:.2f})"
+        )
+        return X_unique, y_unique, counts
+    
+    def _weighted_cv_scores(self, model: RandomForestClassifier, X: np.ndarray, y: np.ndarray,
+                            cv: StratifiedKFold, sample_weight: np.ndarray) -> np.ndarray:
+        """Weighted F1 per fold, fitting and scoring with row counts"""
+        return np.array([
+            score_fold(model, X, y, train_idx, test_idx, sample_weight)[0]
+            for train_idx, test_idx in cv.split(X, y)
+        ])
+    
     def evaluate_model(self, y_true: np.ndarray, y_pred: np.ndarray, 
-                      y_proba: np.ndarray = None) -> Dict[str, float]:
+                      y_proba: np.ndarray = None, 
+                      sample_weight: np.ndarray = None) -> Dict[str, float]:
         """Comprehensive model evaluation"""
+        w = sample_weight
         metrics = {
-            'accuracy': accuracy_score(y_true, y_pred),
-            'precision': precision_score(y_true, y_pred, average='weighted', zero_division=0),
-            'recall': recall_score(y_true, y_pred, average='weighted', zero_division=0),
-            'f1_score': f1_score(y_true, y_pred, average='weighted', zero_division=0)
+            'accuracy': accuracy_score(y_true, y_pred, sample_weight=w),
+            'precision': precision_score(y_true, y_pred, average='weighted', sample_weight=w, zero_division=0),
+            'recall': recall_score(y_true, y_pred, average='weighted', sample_weight=w, zero_division=0),
+            'f1_score': f1_score(y_true, y_pred, average='weighted', sample_weight=w, zero_division=0)
         }
         
         # Per-class metrics
         unique_classes = np.unique(y_true)
         if len(unique_classes) <= 10:
-            metrics['precision_macro'] = precision_score(y_true, y_pred, average='macro', zero_division=0)
-            metrics['recall_macro'] = recall_score(y_true, y_pred, average='macro', zero_division=0)
-            metrics['f1_macro'] = f1_score(y_true, y_pred, average='macro', zero_division=0)
+            metrics['precision_macro'] = precision_score(y_true, y_pred, average='macro', sample_weight=w, zero_division=0)
+            metrics['recall_macro'] = recall_score(y_true, y_pred, average='macro', sample_weight=w, zero_division=0)
+            metrics['f1_macro'] = f1_score(y_true, y_pred, average='macro', sample_weight=w, zero_division=0)
         
         return metrics
     
     def train_with_cv(self, X: np.ndarray, y: np.ndarray, 
-                      cv_folds: int = 5) -> Dict[str, Any]:
+                      cv_folds: int = 5, sample_weight: np.ndarray = None) -> Dict[str, Any]:
         """Train model with cross-validation"""
         logger.info(f"Training with {cv_folds}-fold cross-validation...")
         
@@ -219,12 +262,16 @@ class ImprovedPatientReportAnalyzer:
         )
         
         # Cross-validation scores
-        cv_scores = cross_val_score(
-            base_model, X, y, 
-            cv=cv, 
-            scoring='f1_weighted',
-            n_jobs=-1
-        )
+        with self.telemetry.stage('cv'):
+            if sample_weight is not None:
+                cv_scores = self._weighted_cv_scores(base_model, X, y, cv, sample_weight)
+            else:
+                cv_scores = cross_val_score(
+                    base_model, X, y, 
+                    cv=cv, 
+                    scoring='f1_weighted',
+                    n_jobs=-1
+                )
         
         self.cv_scores = {
             'mean': float(cv_scores.mean()),
@@ -237,12 +284,19 @@ class ImprovedPatientReportAnalyzer:
         return self.cv_scores
     
     def tune_hyperparameters(self, X: np.ndarray, y: np.ndarray, 
-                            cv_folds: int = 5) -> Dict[str, Any]:
-        """Hyperparameter tuning using GridSearchCV"""
+                            cv_folds: int = 5, sample_weight: np.ndarray = None,
+                            param_grid: Dict[str, list] = None) -> Dict[str, Any]:
+        """
+        Grid search with every (parameters, fold) score checkpointed to the
+        search cache. Scores already cached for this data, preprocessing
+        version and CV setup are reused, so an interrupted or extended search
+        only fits the missing combinations. The best parameters are chosen
+        from the cache.
+        """
         logger.info("Tuning hyperparameters...")
         
         # Define parameter grid (reduced for faster training)
-        param_grid = {
+        param_grid = param_grid or {
             'n_estimators': [100, 200],
             'max_depth': [15, 20, 25, None],
             'min_samples_split': [2, 5],
@@ -257,38 +311,80 @@ class ImprovedPatientReportAnalyzer:
             class_weight='balanced'
         )
         
-        # Grid search
         cv = StratifiedKFold(n_splits=cv_folds, shuffle=True, random_state=42)
-        grid_search = GridSearchCV(
-            base_model,
-            param_grid,
-            cv=cv,
-            scoring='f1_weighted',
-            n_jobs=-1,
-            verbose=1
+        folds = list(cv.split(X, y))
+        candidates = list(ParameterGrid(param_grid))
+        
+        cache = FoldScoreCache(self.search_cache_dir, search_key(
+            X, y, sample_weight,
+            preprocessing_version=PREPROCESSING_VERSION,
+            cv_folds=cv_folds, cv_random_state=42,
+            base_params=base_model.get_params(),
+            scoring='f1_weighted'
+        ))
+        scores = cache.load()
+        missing = [
+            (params, fold) for params in candidates for fold in range(cv_folds)
+            if (params_key(params), fold) not in scores
+        ]
+        n_fits = len(candidates) * cv_folds
+        logger.info(
+            f"{n_fits - len(missing)} of {n_fits} fits loaded from {cache.path}; "
+            f"fitting {len(missing)}"
         )
         
-        grid_search.fit(X, y)
-        
-        self.best_params = grid_search.best_params_
+        # Results arrive as each fit finishes and are written straight to disk
+        results = Parallel(n_jobs=-1, return_as='generator')(
+            delayed(score_fold)(clone(base_model).set_params(**params), X, y,
+                                folds[fold][0], folds[fold][1], sample_weight)
+            for params, fold in missing
+        )
+        for (params, fold), (score, seconds) in zip(missing, results):
+            cache.add(params, fold, score, seconds)
+        
+        # Select from the cache, in grid order like GridSearchCV
+        scores = cache.load()
+        best_score = -np.inf
+        for params in candidates:
+            mean_score = np.mean([scores[(params_key(params), fold)] for fold in range(cv_folds)])
+            if mean_score > best_score:
+                best_score, self.best_params = mean_score, params
+        
+        self.search_stats = {
+            'cache_key': cache.key,
+            'candidates': len(candidates),
+            'fits': n_fits,
+            'fits_from_cache': n_fits - len(missing),
+            'best_score': float(best_score)
+        }
         logger.info(f"Best parameters: {self.best_params}")
-        logger.info(f"Best CV score: {grid_search.best_score_:.4f}")
+        logger.info(f"Best CV score: {best_score:.4f}")
         
-        return grid_search.best_params_
+        return self.best_params
     
     def train(self, X: np.ndarray, y: np.ndarray, 
              use_cv: bool = True, tune_hyperparams: bool = True,
-             test_size: float = 0.2, random_state: int = 42) -> Dict[str, Any]:
-        """Train the model with improved methodology"""
+             test_size: float = 0.2, random_state: int = 42,
+             sample_weight: np.ndarray = None, prune_features: str = None,
+             prune_threshold: float = None) -> Dict[str, Any]:
+        """
+        Train the model with improved methodology
+        sample_weight holds row counts when duplicates have been collapsed;
+        fitting, CV and test metrics are then weighted by them.
+        prune_features ('cumulative' or 'permutation') drops low-importance
+        features after the first fit and retrains on the reduced set.
+        """
         logger.info("Starting model training...")
+        self.check_target_leak()
         
         # Cross-validation
         if use_cv:
-            self.train_with_cv(X, y)
+            self.train_with_cv(X, y, sample_weight=sample_weight)
         
         # Hyperparameter tuning
         if tune_hyperparams:
-            self.tune_hyperparameters(X, y)
+            with self.telemetry.stage('grid_search'):
+                self.tune_hyperparameters(X, y, sample_weight=sample_weight)
             # Use best parameters
             self.model = RandomForestClassifier(
                 **self.best_params,
@@ -306,20 +402,166 @@ class ImprovedPatientReportAnalyzer:
             )
         
         # Train/test split
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=test_size, random_state=random_state, stratify=y
-        )
+        if sample_weight is not None:
+            X_train, X_test, y_train, y_test, w_train, w_test = train_test_split(
+                X, y, sample_weight, test_size=test_size, random_state=random_state, stratify=y
+            )
+        else:
+            X_train, X_test, y_train, y_test = train_test_split(
+                X, y, test_size=test_size, random_state=random_state, stratify=y
+            )
+            w_train = w_test = None
+        
+        results = self.fit_and_evaluate(X_train, X_test, y_train, y_test, w_train, w_test)
+        
+        # Drop low-importance features and retrain on the rest
+        if prune_features:
+            keep = self.select_features(
+                X_train, y_train, w_train, method=prune_features,
+                threshold=prune_threshold, random_state=random_state
+            )
+            if len(keep) < X_train.shape[1]:
+                self.feature_selection['test_metrics_before'] = {
+                    metric: float(value) for metric, value in results['test_metrics'].items()
+                }
+                logger.info(f"Retraining on {len(keep)} features...")
+                results = self.fit_and_evaluate(
+                    X_train[:, keep], X_test[:, keep], y_train, y_test, w_train, w_test
+                )
+            results['feature_selection'] = self.feature_selection
+        
+        return results
+    
+    def select_features(self, X_train: np.ndarray, y_train: np.ndarray,
+                        w_train: np.ndarray = None, method: str = 'cumulative',
+                        threshold: float = None, random_state: int = 42) -> np.ndarray:
+        """
+        Choose the features to keep after a first fit of self.model, and
+        narrow the transformer and feature_names to them
+          cumulative:  the most important features (impurity importance) that
+                       together reach threshold of the total (default 0.99)
+          permutation: features whose permutation importance on a validation
+                       split of the training data exceeds threshold (default 0.0);
+                       the test split is never used for selection
+        Returns:
+            indices of the kept columns, in their original order
+        """
+        logger.info(f"Selecting features by {method} importance...")
+        with self.telemetry.stage('feature_selection'):
+            if method == 'cumulative':
+                threshold = 0.99 if threshold is None else threshold
+                importance = self.model.feature_importances_
+                order = np.argsort(importance)[::-1]
+                cumulative = np.cumsum(importance[order])
+                n_keep = int(np.searchsorted(cumulative, threshold * cumulative[-1])) + 1
+                keep = np.sort(order[:n_keep])
+            elif method == 'permutation':
+                threshold = 0.0 if threshold is None else threshold
+                arrays = (X_train, y_train) if w_train is None else (X_train, y_train, w_train)
+                split = train_test_split(*arrays, test_size=0.2, random_state=random_state, stratify=y_train)
+                X_fit, X_val, y_fit, y_val = split[:4]
+                w_fit, w_val = split[4:] if w_train is not None else (None, None)
+                probe = fit_model(clone(self.model), X_fit, y_fit, w_fit)
+                importance = permutation_importance(
+                    probe, X_val, y_val, scoring='f1_weighted', n_repeats=5,
+                    random_state=random_state, n_jobs=-1, sample_weight=w_val
+                ).importances_mean
+                keep = np.flatnonzero(importance > threshold)
+                if len(keep) == 0:
+                    keep = np.array([int(np.argmax(importance))])
+            else:
+                raise ValueError("method must be 'cumulative' or 'permutation'")
+        
+        names = list(self.feature_names)
+        kept = [names[i] for i in keep]
+        self.feature_selection = {
+            'method': method,
+            'threshold': threshold,
+            'importance': {name: float(value) for name, value in zip(names, importance)},
+            'n_features_before': len(names),
+            'n_features_after': len(kept),
+            'kept': kept,
+            'dropped': [name for name in names if name not in kept]
+        }
+        logger.info(f"Keeping {len(kept)} of {len(names)} features; dropped: {self.feature_selection['dropped']}")
+        
+        self.transformer.select_features(kept)
+        self.feature_names = list(self.transformer.feature_names_)
+        self.check_target_leak()
+        return keep
+    
+    def train_out_of_core(self, csv_path: str, target_column: str = None,
+                          memory_budget_mb: int = 1024, workdir: str = None,
+                          test_size: float = 0.2, random_state: int = 42) -> Dict[str, Any]:
+        """
+        Train from a CSV larger than RAM. The transformer is fitted from
+        streaming quantile sketches and the scaled matrix is written in
+        chunks to memory-mapped train / test files, which the forest reads
+        directly. Cross-validation and tuning need fold copies of the whole
+        matrix, so this path trains with the default parameters only.
+        memory_budget_mb bounds the chunked preprocessing passes only. The
+        forest fit pages the whole training matrix in from the memmap (page
+        cache the OS can reclaim), and its own working memory (bootstrap
+        indices, tree nodes) still grows with the number of rows.
+        """
+        from out_of_core import build_memmap_dataset, chunk_rows, fit_streaming_transformer
         
+        if not os.path.exists(csv_path):
+            raise FileNotFoundError(f"Dataset file not found: {csv_path}")
+        
+        rows = chunk_rows(csv_path, memory_budget_mb)
+        workdir = workdir or os.path.join(os.path.dirname(os.path.abspath(csv_path)), '.out_of_core')
+        logger.info(f"Out-of-core training: {memory_budget_mb} MB budget, {rows} rows per chunk")
+        
+        with self.telemetry.stage('streaming_stats'):
+            self.transformer, target_encoder, target_column, n_rows, reference = fit_streaming_transformer(
+                csv_path, target_column, rows
+            )
+        self.drift_reference = reference.to_dict()
+        self.label_encoders['target'] = target_encoder
+        self.target_column = target_column
+        self.feature_names = list(self.transformer.feature_names_)
+        self.check_target_leak()
+        logger.info(f"Dataset rows: {n_rows}, features: {len(self.feature_names)}")
+        self.telemetry.record('dataset', {
+            'path': csv_path,
+            'rows': int(n_rows),
+            'file_bytes': os.path.getsize(csv_path),
+            'memory_budget_mb': memory_budget_mb
+        })
+        
+        with self.telemetry.stage('memmap_build'):
+            X_train, y_train, X_test, y_test = build_memmap_dataset(
+                csv_path, self.transformer, target_encoder, target_column, n_rows, rows,
+                workdir, test_size=test_size, random_state=random_state
+            )
+        
+        self.model = RandomForestClassifier(
+            n_estimators=200,
+            max_depth=20,
+            random_state=random_state,
+            n_jobs=-1,
+            class_weight='balanced'
+        )
+        return self.fit_and_evaluate(X_train, X_test, y_train, y_test)
+    
+    def fit_and_evaluate(self, X_train: np.ndarray, X_test: np.ndarray,
+                         y_train: np.ndarray, y_test: np.ndarray,
+                         w_train: np.ndarray = None, w_test: np.ndarray = None) -> Dict[str, Any]:
+        """Fit self.model on the training split and report test metrics"""
         logger.info("Training final model...")
-        self.model.fit(X_train, y_train)
+        self.telemetry.record('threads', thread_info(self.model.n_jobs))
+        with self.telemetry.stage('final_fit'):
+            fit_model(self.model, X_train, y_train, w_train)
         
         # Evaluate on test set
         logger.info("Evaluating model...")
-        y_pred = self.model.predict(X_test)
-        y_proba = self.model.predict_proba(X_test)
+        with self.telemetry.stage('evaluate'):
+            y_pred = self.model.predict(X_test)
+            y_proba = self.model.predict_proba(X_test)
         
         # Comprehensive metrics
-        test_metrics = self.evaluate_model(y_test, y_pred, y_proba)
+        test_metrics = self.evaluate_model(y_test, y_pred, y_proba, sample_weight=w_test)
         
         logger.info("\n" + "="*60)
         logger.info("Test Set Metrics:")
@@ -328,7 +570,7 @@ class ImprovedPatientReportAnalyzer:
         logger.info("="*60)
         
         logger.info("\nClassification Report:")
-        logger.info("\n" + classification_report(y_test, y_pred))
+        logger.info("\n" + classification_report(y_test, y_pred, sample_weight=w_test))
         
         # Feature importance
         feature_importance = dict(zip(
@@ -353,25 +595,23 @@ class ImprovedPatientReportAnalyzer:
         }
     
     def save_model(self, model_dir: str = 'models') -> str:
-        """Save the trained model and preprocessors"""
+        """
+        Save the trained model, transformer and metadata as one versioned bundle.
+        The payload is serialized first so the metadata's telemetry includes
+        the save stage and the payload sizes; writing the file and its final
+        size and bundle id are only in the run log.
+        """
         os.makedirs(model_dir, exist_ok=True)
+        bundle_path = os.path.join(model_dir, BUNDLE_FILE)
         
-        # Save model
-        model_path = os.path.join(model_dir, 'patient_report_model.joblib')
-        joblib.dump(self.model, model_path)
-        logger.info(f"Model saved to {model_path}")
-        
-        # Save scaler
-        scaler_path = os.path.join(model_dir, 'scaler.joblib')
-        joblib.dump(self.scaler, scaler_path)
-        logger.info(f"Scaler saved to {scaler_path}")
-        
-        # Save label encoders
-        encoders_path = os.path.join(model_dir, 'label_encoders.joblib')
-        joblib.dump(self.label_encoders, encoders_path)
-        logger.info(f"Label encoders saved to {encoders_path}")
+        with self.telemetry.stage('save'):
+            payload = serialize_payload(self.model, self.transformer, self.label_encoders)
+        self.telemetry.record('artifacts', {
+            'bundle_path': bundle_path,
+            'member_bytes': {name: len(data) for name, data in payload.items()}
+        })
         
-        # Save comprehensive metadata
+        # Comprehensive metadata
         metadata = {
             'feature_names': self.feature_names,
             'model_type': 'RandomForestClassifier',
@@ -379,15 +619,23 @@ class ImprovedPatientReportAnalyzer:
             'n_features': len(self.feature_names),
             'best_params': self.best_params,
             'cv_scores': self.cv_scores,
+            'dedup_stats': self.dedup_stats,
+            'search_stats': self.search_stats,
+            'feature_selection': self.feature_selection,
+            'drift_reference': self.drift_reference,
+            'telemetry': self.telemetry.summary(),
             'feature_importance': {k: float(v) for k, v in dict(list(
                 zip(self.feature_names, self.model.feature_importances_)
             )).items()}
         }
         
-        metadata_path = os.path.join(model_dir, 'model_metadata.json')
-        with open(metadata_path, 'w') as f:
-            json.dump(metadata, f, indent=2)
-        logger.info(f"Metadata saved to {metadata_path}")
+        with self.telemetry.stage('write_bundle'):
+            manifest = write_bundle_members(bundle_path, payload, metadata)
+        self.telemetry.record('bundle', {
+            'bundle_id': manifest['bundle_id'],
+            'bundle_bytes': os.path.getsize(bundle_path)
+        })
+        logger.info(f"Model bundle {manifest['bundle_id']} saved to {bundle_path}")
         
         return model_dir
 
@@ -403,25 +651,62 @@ def main():
     parser.add_argument('--cv', action='store_true', help='Use cross-validation')
     parser.add_argument('--tune', action='store_true', help='Tune hyperparameters')
     parser.add_argument('--cv-folds', type=int, default=5, help='Number of CV folds')
+    parser.add_argument('--search-cache', type=str, default='.search_cache',
+                        help='Directory for checkpointed (parameters, fold) grid search scores')
+    parser.add_argument('--run-log', type=str, default='training_runs.jsonl',
+                        help='JSON-lines file that per-stage run telemetry is appended to')
+    parser.add_argument('--prune-features', type=str, choices=['cumulative', 'permutation'], default=None,
+                        help='Drop low-importance features and retrain on the rest')
+    parser.add_argument('--prune-threshold', type=float, default=None,
+                        help='Cumulative importance to keep (default 0.99) or minimum permutation importance (default 0.0)')
+    parser.add_argument('--dedup', action='store_true',
+                        help='Collapse duplicate rows and train with counts as sample weights')
+    parser.add_argument('--out-of-core', action='store_true',
+                        help='Stream the dataset in chunks instead of loading it into memory')
+    parser.add_argument('--memory-budget', type=int, default=1024,
+                        help='Memory budget in MB for out-of-core preprocessing (the forest fit '
+                             'itself still needs memory growing with the row count)')
+    parser.add_argument('--workdir', type=str, default=None,
+                        help='Directory for out-of-core memory-mapped matrices')
     
     args = parser.parse_args()
     
     # Initialize analyzer
-    analyzer = ImprovedPatientReportAnalyzer()
+    telemetry = RunTelemetry(run_log=args.run_log)
+    analyzer = ImprovedPatientReportAnalyzer(telemetry=telemetry)
+    analyzer.search_cache_dir = args.search_cache
     
     try:
-        # Load data
-        df = analyzer.load_data(args.dataset)
-        
-        # Preprocess
-        X, y = analyzer.preprocess_data(df, target_column=args.target, fit=True)
-        
-        # Train
-        results = analyzer.train(
-            X, y,
-            use_cv=args.cv,
-            tune_hyperparams=args.tune
-        )
+        if args.out_of_core:
+            if args.cv or args.tune or args.dedup:
+                logger.warning("--cv, --tune and --dedup are ignored with --out-of-core")
+            results = analyzer.train_out_of_core(
+                args.dataset,
+                target_column=args.target,
+                memory_budget_mb=args.memory_budget,
+                workdir=args.workdir
+            )
+        else:
+            # Load data
+            df = analyzer.load_data(args.dataset)
+            
+            # Preprocess
+            X, y = analyzer.preprocess_data(df, target_column=args.target, fit=True)
+            
+            # Collapse duplicate rows into weighted unique rows
+            sample_weight = None
+            if args.dedup:
+                X, y, sample_weight = analyzer.collapse_duplicates(X, y)
+            
+            # Train
+            results = analyzer.train(
+                X, y,
+                use_cv=args.cv,
+                tune_hyperparams=args.tune,
+                sample_weight=sample_weight,
+                prune_features=args.prune_features,
+                prune_threshold=args.prune_threshold
+            )
         
         # Save model
         analyzer.save_model(model_dir=args.output)
@@ -432,8 +717,14 @@ def main():
         logger.info(f"Test F1 Score: {results['test_metrics']['f1_score']:.4f}")
         logger.info("="*60)
         
+        telemetry.finish('completed', test_metrics={
+            metric: float(value) for metric, value in results['test_metrics'].items()
+        })
+        logger.info(f"Run {telemetry.run_id} telemetry appended to {args.run_log}")
+        
     except Exception as e:
         logger.error(f"Error during training: {str(e)}", exc_info=True)
+        telemetry.finish('failed', error=str(e))
         raise
 
 